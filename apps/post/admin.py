@@ -9,6 +9,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('created_at', 'author')  # TODO: add published
     actions = ['list_recent_with_comments', 'filter_by_author_action', 'filter_by_date_range_action']
 
+    def get_search_results(self, request, queryset, search_term):
+        # Uses the GIN-indexed search vector instead of ILIKE over content.
+        if not search_term:
+            return queryset, False
+        return queryset.search(search_term), False
+
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         if 'recent' in request.GET:
@@ -54,4 +60,10 @@ class PostAdmin(admin.ModelAdmin):
 class CommentAdmin(admin.ModelAdmin):
     list_display = ('author', 'post', 'content', 'created_at')
     search_fields = ('content',)
-    list_filter = ('created_at', 'post')
\ No newline at end of file
+    list_filter = ('created_at', 'post')
+
+    def get_search_results(self, request, queryset, search_term):
+        # Uses the GIN-indexed search vector instead of ILIKE over content.
+        if not search_term:
+            return queryset, False
+        return queryset.search(search_term), False
\ No newline at end of file
@@ -0,0 +1,440 @@
+"""
+In-process API benchmarks (``manage.py bench``).
+
+Every named route in ``core/urls.py`` (the admin aside) has a scenario below.
+The runner calls each one repeatedly through Django's test client, against
+whatever database is configured (usually one filled by ``seed_bench``), and
+reports latency percentiles, sequential throughput and the number of
+database queries per request. Writes run inside a transaction that is rolled
+back, so the dataset stays the same between runs.
+
+By default every cache is cleared before each request, so the numbers (and
+the query counts in particular) describe the work an endpoint does on a
+miss; ``warm=True`` measures the cached path instead.
+
+Results are plain dicts that can be saved as a JSON baseline and compared
+against a later run with ``compare``.
+"""
+import io
+import json
+import platform
+import statistics
+import time
+import zlib
+from contextlib import nullcontext
+from dataclasses import dataclass
+
+import django
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.user.models import Follow, User, UserStats
+from apps.user.serializers import UserSerializer
+from utils import compression
+from utils.renderers import ORJSONParser, ORJSONRenderer
+from .export import export_rows, iter_ndjson
+from .models import Comment, Post
+from .serializers import CommentSerializer, PostSerializer, comment_rows, post_rows
+
+SKIPPED_NAMESPACES = {'admin'}
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    # ``request(context, iteration)`` returns ``(path, data)``.
+    request: object
+    status: int = 200
+    write: bool = False
+
+    @property
+    def key(self):
+        return f'{self.method} {self.name}'
+
+
+@dataclass
+class Context:
+    user: User
+    password: str
+    refresh_token: str
+    popular_user_id: int
+    post_id: int
+    follow_target_id: int
+    followed_id: int
+    search_term: str = 'café'
+
+
+SCENARIOS = [
+    Scenario('token_obtain_pair', 'POST', lambda ctx, i: (
+        reverse('token_obtain_pair'), {'username': ctx.user.username, 'password': ctx.password},
+    )),
+    Scenario('token_refresh', 'POST', lambda ctx, i: (reverse('token_refresh'), {'refresh': ctx.refresh_token})),
+    Scenario('user-list', 'GET', lambda ctx, i: (reverse('user-list'), None)),
+    Scenario('user-list', 'POST', lambda ctx, i: (
+        reverse('user-list'), {'username': f'bench-new-{i}', 'email': f'bench-new-{i}@example.com', 'password': 'x'},
+    ), status=201, write=True),
+    Scenario('user-detail', 'GET', lambda ctx, i: (reverse('user-detail', args=[ctx.popular_user_id]), None)),
+    Scenario('user-followers', 'GET', lambda ctx, i: (reverse('user-followers', args=[ctx.popular_user_id]), None)),
+    Scenario('user-following', 'GET', lambda ctx, i: (reverse('user-following', args=[ctx.user.pk]), None)),
+    Scenario('follow-user', 'POST', lambda ctx, i: (
+        reverse('follow-user', args=[ctx.user.pk, ctx.follow_target_id]), None,
+    ), write=True),
+    Scenario('follow-user', 'DELETE', lambda ctx, i: (
+        reverse('follow-user', args=[ctx.user.pk, ctx.followed_id]), None,
+    ), write=True),
+    Scenario('follow-batch', 'POST', lambda ctx, i: (
+        reverse('follow-batch'), {'ids': [ctx.follow_target_id]},
+    ), write=True),
+    Scenario('user-relationships', 'GET', lambda ctx, i: (
+        f"{reverse('user-relationships')}?ids={ctx.popular_user_id},{ctx.follow_target_id},{ctx.followed_id}", None,
+    )),
+    Scenario('user-mutual-followers', 'GET', lambda ctx, i: (
+        reverse('user-mutual-followers', args=[ctx.popular_user_id]), None,
+    )),
+    Scenario('follow-bulk', 'POST', lambda ctx, i: (
+        reverse('follow-bulk'), [{'follower_id': ctx.user.pk, 'followed_id': ctx.follow_target_id}],
+    ), status=201, write=True),
+    Scenario('post-list', 'GET', lambda ctx, i: (reverse('post-list'), None)),
+    Scenario('post-list', 'POST', lambda ctx, i: (reverse('post-list'), {'content': f'Benchmark post {i}'}),
+             status=201, write=True),
+    Scenario('post-feed', 'GET', lambda ctx, i: (reverse('post-feed'), None)),
+    Scenario('post-search', 'GET', lambda ctx, i: (f"{reverse('post-search')}?q={ctx.search_term}", None)),
+    Scenario('post-bulk', 'POST', lambda ctx, i: (
+        reverse('post-bulk'), [{'author_id': ctx.user.pk, 'content': f'Benchmark post {i}'}],
+    ), status=201, write=True),
+    Scenario('comment-bulk', 'POST', lambda ctx, i: (
+        reverse('comment-bulk'), [{'author_id': ctx.user.pk, 'post_id': ctx.post_id, 'content': f'Comment {i}'}],
+    ), status=201, write=True),
+    Scenario('post-export', 'GET', lambda ctx, i: (
+        f"{reverse('post-export')}?author_id={ctx.popular_user_id}", None,
+    )),
+    Scenario('post-detail', 'GET', lambda ctx, i: (reverse('post-detail', args=[ctx.post_id]), None)),
+    Scenario('comment-list', 'GET', lambda ctx, i: (reverse('comment-list', args=[ctx.post_id]), None)),
+    Scenario('comment-list', 'POST', lambda ctx, i: (
+        reverse('comment-list', args=[ctx.post_id]), {'content': f'Comment {i}'},
+    ), status=201, write=True),
+    Scenario('metrics', 'GET', lambda ctx, i: (reverse('metrics'), None)),
+]
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def endpoint_names(resolver=None, namespace=None):
+    """Names of every route, namespaced like ``reverse`` expects them."""
+    names = set()
+    for pattern in (resolver or get_resolver()).url_patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace in SKIPPED_NAMESPACES:
+                continue
+            inner = ':'.join(filter(None, [namespace, pattern.namespace])) or None
+            names |= endpoint_names(pattern, inner)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(f'{namespace}:{pattern.name}' if namespace else pattern.name)
+    return names
+
+
+def uncovered_endpoints(scenarios=SCENARIOS):
+    return sorted(endpoint_names() - {scenario.name for scenario in scenarios})
+
+
+def build_context(username, password):
+    try:
+        user = User.objects.get(username=username)
+    except User.DoesNotExist:
+        raise BenchmarkError(f"User '{username}' does not exist; run `manage.py seed_bench` first.")
+
+    popular = UserStats.objects.order_by('-total_followers').values_list('user_id', flat=True).first()
+    post_id = (
+        Comment.objects.values('post_id').annotate(total=Count('pk')).order_by('-total')
+        .values_list('post_id', flat=True).first()
+    ) or Post.objects.values_list('pk', flat=True).first()
+    if post_id is None:
+        raise BenchmarkError("There are no posts to benchmark; run `manage.py seed_bench` first.")
+    followed = Follow.objects.filter(follower_id=user.pk).values('followed_id')
+    target = User.objects.exclude(pk=user.pk).exclude(pk__in=followed).values_list('pk', flat=True).first()
+    if target is None:
+        raise BenchmarkError(f"User '{username}' already follows everybody.")
+
+    return Context(
+        user=user,
+        password=password,
+        refresh_token=str(RefreshToken.for_user(user)),
+        popular_user_id=popular or user.pk,
+        post_id=post_id,
+        follow_target_id=target,
+        followed_id=Follow.objects.filter(follower_id=user.pk).values_list('followed_id', flat=True).first() or target,
+    )
+
+
+def run(context, scenarios=SCENARIOS, iterations=20, warmup=2, warm=False, log=None):
+    log = log or (lambda message: None)
+    client = Client(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(context.user).access_token}')
+    results = {}
+    # Throttling is off: the bench hits each endpoint far above its limit.
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], THROTTLE_ENABLED=False):
+        for scenario in scenarios:
+            results[scenario.key] = _run_scenario(client, context, scenario, iterations, warmup, warm)
+            log(format_row(scenario.key, results[scenario.key]))
+    return results
+
+
+def _run_scenario(client, context, scenario, iterations, warmup, warm):
+    latencies, query_counts = [], []
+    for i in range(warmup + iterations):
+        if not warm:
+            for alias in settings.CACHES:
+                caches[alias].clear()
+        path, data = scenario.request(context, i)
+        queries = []
+
+        def count_query(execute, sql, params, many, query_context):
+            queries.append(sql)
+            return execute(sql, params, many, query_context)
+
+        with transaction.atomic() if scenario.write else nullcontext():
+            with connection.execute_wrapper(count_query):
+                started = time.perf_counter()
+                response = _call(client, scenario.method, path, data)
+                elapsed = time.perf_counter() - started
+            if scenario.write:
+                transaction.set_rollback(True)
+
+        if response.status_code != scenario.status:
+            raise BenchmarkError(
+                f"{scenario.key} ({path}) returned {response.status_code}, expected {scenario.status}."
+            )
+        if i >= warmup:
+            latencies.append(elapsed)
+            query_counts.append(len(queries))
+
+    return summarize(latencies, query_counts)
+
+
+def _call(client, method, path, data):
+    if method == 'GET':
+        response = client.get(path)
+    else:
+        response = client.generic(method, path, _json(data), content_type='application/json')
+    if response.streaming:
+        # Generating the body is part of the work.
+        b''.join(response.streaming_content)
+    return response
+
+
+def _json(data):
+    return json.dumps(data) if data is not None else ''
+
+
+def summarize(latencies, query_counts):
+    ordered = sorted(latencies)
+
+    def percentile(p):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 3)
+
+    return {
+        'iterations': len(ordered),
+        'mean_ms': round(statistics.mean(ordered) * 1000, 3),
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'rps': round(len(ordered) / sum(ordered), 1),
+        'queries': max(query_counts),
+    }
+
+
+def report(results, iterations, warm):
+    return {
+        'meta': {
+            'created_at': timezone.now().isoformat(),
+            'iterations': iterations,
+            'warm': warm,
+            'dataset': {
+                'users': User.objects.count(),
+                'follows': Follow.objects.count(),
+                'posts': Post.objects.count(),
+                'comments': Comment.objects.count(),
+            },
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+        },
+        'results': results,
+    }
+
+
+def compare(results, baseline, threshold=0.25, min_delta_ms=2.0):
+    """
+    Lists the regressions of ``results`` against a saved baseline: any extra
+    query, or a p50/p95 latency more than ``threshold`` (a fraction) and
+    ``min_delta_ms`` above the baseline's.
+    """
+    regressions = []
+    for key, base in sorted(baseline['results'].items()):
+        current = results.get(key)
+        if current is None:
+            continue
+        if current['queries'] > base['queries']:
+            regressions.append(f"{key}: {base['queries']} -> {current['queries']} queries")
+        for metric in ('p50_ms', 'p95_ms'):
+            delta = current[metric] - base[metric]
+            if current[metric] > base[metric] * (1 + threshold) and delta > min_delta_ms:
+                regressions.append(f"{key}: {metric} {base[metric]:.1f} -> {current[metric]:.1f}")
+    return regressions
+
+
+HEADER = f"{'endpoint':<24}  {'queries':>7}  {'mean ms':>8}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}  {'req/s':>7}"
+
+
+def format_row(key, result):
+    return (
+        f"{key:<24}  {result['queries']:>7}  {result['mean_ms']:>8.1f}  {result['p50_ms']:>8.1f}  "
+        f"{result['p95_ms']:>8.1f}  {result['p99_ms']:>8.1f}  {result['rps']:>7.1f}"
+    )
+
+
+# Serializer micro-benchmark (``manage.py bench_serializers``): each path
+# loads ``limit`` rows and renders them, as PostList and CommentList do.
+SERIALIZER_PATHS = {
+    ('posts', 'drf'): lambda limit: PostSerializer(
+        Post.objects.with_nested_relations().order_by('-created_at')[:limit], many=True
+    ).data,
+    ('posts', 'fast'): lambda limit: post_rows.represent(post_rows.rows(Post.objects.order_by('-created_at')[:limit])),
+    ('comments', 'drf'): lambda limit: CommentSerializer(
+        Comment.objects.select_related('author__stats').order_by('-created_at')[:limit], many=True
+    ).data,
+    ('comments', 'fast'): lambda limit: comment_rows.represent(
+        comment_rows.rows(Comment.objects.order_by('-created_at')[:limit])
+    ),
+}
+
+
+def serializer_throughput(limit=1000, repeat=5):
+    """``{(kind, path): rows per second}``, from the best of ``repeat`` runs."""
+    results = {}
+    for key, serialize in SERIALIZER_PATHS.items():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = len(serialize(limit))
+            timings.append(time.perf_counter() - started)
+        results[key] = round(rows / min(timings), 1) if rows else 0.0
+    return results
+
+
+# JSON encoding micro-benchmark (``manage.py bench_json``): the API's
+# renderer and parser classes over payloads shaped like the listings.
+def json_payloads(limit=1000):
+    posts = post_rows.represent(post_rows.rows(Post.objects.order_by('-created_at')[:limit]))
+    comments = comment_rows.represent(comment_rows.rows(Comment.objects.order_by('-created_at')[:limit]))
+    users = UserSerializer(User.objects.select_related('stats').order_by('id')[:100], many=True).data
+
+    def page(results):
+        return {'count': 1000000, 'next': 'http://testserver/api/posts/?page_number=2', 'previous': None, 'results': results}
+
+    return {
+        'post-page': page(posts[:20]),
+        'post-page-100': page(posts[:100]),
+        'comment-page-100': page(comments[:100]),
+        'user-list': users,
+        f'posts-{len(posts)}': posts,
+    }
+
+
+JSON_CLASSES = {
+    'render': {'json': JSONRenderer, 'orjson': ORJSONRenderer},
+    'parse': {'json': JSONParser, 'orjson': ORJSONParser},
+}
+
+
+def json_throughput(limit=1000, repeat=20):
+    """
+    ``{payload: {'bytes', 'same', (operation, backend): µs per call}}``, from
+    the best of ``repeat`` runs; ``same`` tells whether both renderers wrote
+    the same bytes and both parsers read back the same data.
+    """
+    results = {}
+    for name, data in json_payloads(limit).items():
+        body = JSONRenderer().render(data)
+        rendered = {cls().render(data) for cls in JSON_CLASSES['render'].values()}
+        parsed = [cls().parse(io.BytesIO(body)) for cls in JSON_CLASSES['parse'].values()]
+        result = {'bytes': len(body), 'same': len(rendered) == 1 and parsed[0] == parsed[1]}
+        for operation, classes in JSON_CLASSES.items():
+            for backend, cls in classes.items():
+                instance = cls()
+                if operation == 'render':
+                    call = lambda: instance.render(data)
+                else:
+                    call = lambda: instance.parse(io.BytesIO(body))
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    call()
+                    timings.append(time.perf_counter() - started)
+                result[(operation, backend)] = round(min(timings) * 1e6, 1)
+        results[name] = result
+    return results
+
+
+# Compression benchmark (``manage.py bench_compression``): wire size and
+# latency of the rendered listings and of an export, uncompressed and with
+# each available encoding at its configured level.
+DECOMPRESSORS = {
+    'gzip': lambda data: zlib.decompress(data, 16 + zlib.MAX_WBITS),
+    'br': lambda data: compression.brotli.decompress(data),
+    'zstd': lambda data: compression.zstandard.ZstdDecompressor().decompressobj().decompress(data),
+}
+
+
+def compression_payloads(limit=1000):
+    payloads = {name: ('application/json', JSONRenderer().render(data)) for name, data in json_payloads(limit).items()}
+    payloads[f'export-{limit}'] = ('application/x-ndjson', b''.join(iter_ndjson(export_rows('posts')[:limit])))
+    return payloads
+
+
+def _best_ms(call, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def compression_results(limit=1000, repeat=5, mbps=(10, 100)):
+    """
+    ``{payload: {encoding: {'bytes', 'encode_ms', 'decode_ms', 'total_ms': {mbps: ms}}}}``,
+    ``identity`` being the uncompressed baseline. ``total_ms`` adds encoding,
+    transfer at ``mbps`` megabits per second and decoding.
+    """
+    results = {}
+    for name, (content_type, body) in compression_payloads(limit).items():
+        levels = compression.compression_levels(content_type) or {}
+        result = {'identity': {'bytes': len(body), 'encode_ms': 0.0, 'decode_ms': 0.0}}
+        for encoding in settings.COMPRESSION_ENCODINGS:
+            if encoding not in compression.CODECS or encoding not in levels:
+                continue
+            data = compression.compress(body, encoding, levels[encoding])
+            assert DECOMPRESSORS[encoding](data) == body
+            result[encoding] = {
+                'bytes': len(data),
+                'encode_ms': _best_ms(lambda: compression.compress(body, encoding, levels[encoding]), repeat),
+                'decode_ms': _best_ms(lambda: DECOMPRESSORS[encoding](data), repeat),
+            }
+        for measured in result.values():
+            measured['total_ms'] = {
+                speed: measured['encode_ms'] + measured['bytes'] * 8 / (speed * 1000) + measured['decode_ms']
+                for speed in mbps
+            }
+        results[name] = result
+    return results
@@ -0,0 +1,59 @@
+"""
+Streaming NDJSON export of posts and comments.
+
+Rows are read with ``.values()`` through a server-side cursor
+(``.iterator(chunk_size=...)``) and encoded one line at a time, so memory use
+does not depend on how many rows are exported. The cursor is read inside a
+transaction so it also works behind a transaction-mode pooler (pgbouncer),
+which may hand the next statement outside a transaction to another server
+connection.
+"""
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .models import Comment, Post
+
+CHUNK_SIZE = 2000
+LINES_PER_WRITE = 500
+
+EXPORTS = {
+    'posts': (Post, ('id', 'author_id', 'content', 'created_at')),
+    'comments': (Comment, ('id', 'author_id', 'post_id', 'content', 'created_at')),
+}
+
+
+def parse_listing_filters(params):
+    """
+    Reads PostList's ``author_id``/``from_date``/``to_date`` filters from a
+    QueryDict (or any mapping), raising ValueError with a client-facing message.
+    """
+    filters = {'author_id': params.get('author_id') or None}
+    for name in ('from_date', 'to_date'):
+        value = params.get(name)
+        if value:
+            try:
+                value = datetime.strptime(value, '%Y-%m-%d').date()
+            except ValueError:
+                raise ValueError(f'Invalid {name} format, should be YYYY-MM-DD')
+        filters[name] = value or None
+    return filters
+
+
+def export_rows(kind, author_id=None, from_date=None, to_date=None):
+    model, fields = EXPORTS[kind]
+    return model.objects.filter_listing(author_id, from_date, to_date).order_by('pk').values(*fields)
+
+
+def iter_ndjson(rows, chunk_size=CHUNK_SIZE):
+    encoder = DjangoJSONEncoder()
+    lines = []
+    with transaction.atomic(using=rows.db):
+        for row in rows.iterator(chunk_size=chunk_size):
+            lines.append(encoder.encode(row))
+            if len(lines) >= LINES_PER_WRITE:
+                yield ('\n'.join(lines) + '\n').encode()
+                lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
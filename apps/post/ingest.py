@@ -0,0 +1,83 @@
+"""
+Bulk ingestion loaders for posts and comments (see ``utils.ingest``).
+
+``bulk_create`` does not send model signals, so each chunk also updates the
+user counters, the response cache and (for posts) the follower timelines
+itself.
+"""
+from collections import Counter
+
+from apps.user.models import User, UserStats
+from utils.cache import COMMENTS_TABLE, POSTS_TABLE, response_cache
+from utils.ingest import existing_ids, parse_content, parse_created_at, positive_int
+from .models import Comment, Post, TimelineEntry
+
+
+def load_posts(chunk, fan_out=True):
+    errors, candidates = [], []
+    for line, row in chunk:
+        row_errors = {}
+        author_id = positive_int(row, 'author_id', row_errors)
+        content = parse_content(row, row_errors)
+        created_at = parse_created_at(row, row_errors)
+        if row_errors:
+            errors.append({'row': line, 'errors': row_errors})
+        else:
+            candidates.append((line, Post(author_id=author_id, content=content, created_at=created_at)))
+
+    users = existing_ids(User, {post.author_id for _, post in candidates})
+    posts = []
+    for line, post in candidates:
+        if post.author_id in users:
+            posts.append(post)
+        else:
+            errors.append({'row': line, 'errors': {'author_id': ['User does not exist.']}})
+
+    Post.objects.bulk_create(posts)
+    authors = Counter(post.author_id for post in posts)
+    UserStats.objects.increment_many(authors, 'total_posts')
+    if fan_out:
+        TimelineEntry.objects.fan_out_many(posts)
+    if posts:
+        response_cache.invalidate(POSTS_TABLE, *[('user', pk) for pk in authors])
+    return len(posts), errors
+
+
+def load_comments(chunk, fan_out=True):
+    errors, candidates = [], []
+    for line, row in chunk:
+        row_errors = {}
+        author_id = positive_int(row, 'author_id', row_errors)
+        post_id = positive_int(row, 'post_id', row_errors)
+        content = parse_content(row, row_errors)
+        created_at = parse_created_at(row, row_errors)
+        if row_errors:
+            errors.append({'row': line, 'errors': row_errors})
+        else:
+            comment = Comment(author_id=author_id, post_id=post_id, content=content, created_at=created_at)
+            candidates.append((line, comment))
+
+    users = existing_ids(User, {comment.author_id for _, comment in candidates})
+    posts = existing_ids(Post, {comment.post_id for _, comment in candidates})
+    comments = []
+    for line, comment in candidates:
+        row_errors = {}
+        if comment.author_id not in users:
+            row_errors['author_id'] = ['User does not exist.']
+        if comment.post_id not in posts:
+            row_errors['post_id'] = ['Post does not exist.']
+        if row_errors:
+            errors.append({'row': line, 'errors': row_errors})
+        else:
+            comments.append(comment)
+
+    Comment.objects.bulk_create(comments)
+    authors = Counter(comment.author_id for comment in comments)
+    UserStats.objects.increment_many(authors, 'total_comments')
+    if comments:
+        response_cache.invalidate(
+            COMMENTS_TABLE,
+            *[('user', pk) for pk in authors],
+            *[('post', pk) for pk in {comment.post_id for comment in comments}],
+        )
+    return len(comments), errors
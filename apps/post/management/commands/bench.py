@@ -0,0 +1,88 @@
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.post.bench import (
+    HEADER,
+    SCENARIOS,
+    BenchmarkError,
+    build_context,
+    compare,
+    report,
+    run,
+    uncovered_endpoints,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every API endpoint in process: latency percentiles, throughput and queries per request. '
+        'Save the results as a JSON baseline with --save, and fail on regressions against one with --baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help='Measured requests per endpoint.')
+        parser.add_argument('--warmup', type=int, default=2, help='Unmeasured requests per endpoint.')
+        parser.add_argument('--username', default='bench', help='Staff user to authenticate as (see seed_bench).')
+        parser.add_argument('--password', default='bench')
+        parser.add_argument('--only', action='append', help='Only run this endpoint (URL name, repeatable).')
+        parser.add_argument('--warm', action='store_true', help='Keep the caches between requests.')
+        parser.add_argument('--save', help='Write the results to this JSON file.')
+        parser.add_argument('--baseline', help='Compare against this JSON file and fail on regressions.')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Allowed latency increase over the baseline, as a fraction (default 0.25).')
+        parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                            help='Ignore latency increases smaller than this, whatever the threshold.')
+
+    def handle(self, *args, **options):
+        scenarios = SCENARIOS
+        if options['only']:
+            scenarios = [scenario for scenario in SCENARIOS if scenario.name in options['only']]
+            if not scenarios:
+                raise CommandError(f"No scenario for {', '.join(options['only'])}.")
+        else:
+            uncovered = uncovered_endpoints()
+            if uncovered:
+                raise CommandError(f"Endpoints without a benchmark scenario: {', '.join(uncovered)}.")
+
+        baseline = self._load(options['baseline']) if options['baseline'] else None
+        if options['iterations'] < 1:
+            raise CommandError("--iterations must be at least 1.")
+
+        # The views log every request; keep the table readable unless asked.
+        if options['verbosity'] < 2:
+            logging.disable(logging.WARNING)
+        try:
+            context = build_context(options['username'], options['password'])
+            self.stdout.write(HEADER)
+            results = run(
+                context, scenarios, options['iterations'], options['warmup'], options['warm'], log=self.stdout.write,
+            )
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+        finally:
+            logging.disable(logging.NOTSET)
+
+        if options['save']:
+            with open(options['save'], 'w') as f:
+                json.dump(report(results, options['iterations'], options['warm']), f, indent=2, sort_keys=True)
+                f.write('\n')
+            self.stdout.write(f"Results saved to {options['save']}.")
+
+        if baseline is not None:
+            if baseline['meta'].get('warm', False) != options['warm']:
+                raise CommandError("The baseline was recorded with a different --warm setting.")
+            regressions = compare(results, baseline, options['threshold'], options['min_delta_ms'])
+            if regressions:
+                for regression in regressions:
+                    self.stderr.write(regression)
+                raise CommandError(f"{len(regressions)} regressions against {options['baseline']}.")
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['baseline']}."))
+
+    def _load(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read baseline {path}: {e}")
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from apps.post.bench import compression_results
+
+
+class Command(BaseCommand):
+    help = (
+        'Wire size and latency of the rendered listings and of an export, uncompressed and with each available '
+        'encoding at the levels in COMPRESSION_LEVELS, built from the latest rows of the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=1000, help='Rows in the largest payload and the export.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per encoding; the best one counts.')
+        parser.add_argument('--mbps', type=float, action='append',
+                            help='Link speed in megabits per second (repeatable, default 10 and 100).')
+
+    def handle(self, *args, **options):
+        mbps = options['mbps'] or [10, 100]
+        results = compression_results(options['limit'], options['repeat'], mbps)
+        self.stdout.write(
+            f"{'payload':<18}  {'encoding':<8}  {'bytes':>9}  {'ratio':>6}  {'encode ms':>9}  {'decode ms':>9}"
+            + ''.join(f"  {f'ms @{speed:g}Mbps':>12}" for speed in mbps)
+        )
+        for name, result in results.items():
+            identity = result['identity']['bytes']
+            for encoding, measured in result.items():
+                self.stdout.write(
+                    f"{name:<18}  {encoding:<8}  {measured['bytes']:>9}  {identity / measured['bytes']:>5.1f}x  "
+                    f"{measured['encode_ms']:>9.2f}  {measured['decode_ms']:>9.2f}"
+                    + ''.join(f"  {measured['total_ms'][speed]:>12.2f}" for speed in mbps)
+                )
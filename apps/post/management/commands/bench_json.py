@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from apps.post.bench import json_throughput
+
+
+class Command(BaseCommand):
+    help = (
+        "Microseconds per payload of DRF's JSON renderer and parser and of the orjson ones in utils/renderers.py, "
+        'over listing-shaped payloads built from the latest rows of the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=1000, help='Rows in the largest payload.')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per payload; the best one counts.')
+
+    def handle(self, *args, **options):
+        results = json_throughput(options['limit'], options['repeat'])
+        self.stdout.write(
+            f"{'payload':<18}  {'bytes':>9}  {'render json':>11}  {'orjson':>8}  {'speedup':>7}  "
+            f"{'parse json':>10}  {'orjson':>8}  {'speedup':>7}  same"
+        )
+        for name, result in results.items():
+            row = f"{name:<18}  {result['bytes']:>9}"
+            for operation, width in (('render', 11), ('parse', 10)):
+                json, fast = result[(operation, 'json')], result[(operation, 'orjson')]
+                row += f"  {json:>{width}.0f}  {fast:>8.0f}  {json / fast if fast else 0:>6.1f}x"
+            self.stdout.write(f"{row}  {'yes' if result['same'] else 'NO'}")
+        self.stdout.write('Times in microseconds per payload.')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from apps.post.bench import serializer_throughput
+
+
+class Command(BaseCommand):
+    help = (
+        'Rows per second of the DRF serializers and of the values_list fast path used by PostList and '
+        'CommentList, loading and rendering the latest rows of the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=1000, help='Rows per run.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per path; the best one counts.')
+
+    def handle(self, *args, **options):
+        results = serializer_throughput(options['limit'], options['repeat'])
+        self.stdout.write(f"{'rows':<10}  {'drf rows/s':>12}  {'fast rows/s':>12}  {'speedup':>8}")
+        for kind in ('posts', 'comments'):
+            drf, fast = results[(kind, 'drf')], results[(kind, 'fast')]
+            speedup = fast / drf if drf else 0
+            self.stdout.write(f"{kind:<10}  {drf:>12.0f}  {fast:>12.0f}  {speedup:>7.1f}x")
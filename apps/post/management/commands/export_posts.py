@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.compression import compress_stream
+from apps.post.export import CHUNK_SIZE, EXPORTS, export_rows, iter_ndjson, parse_listing_filters
+
+
+class Command(BaseCommand):
+    help = 'Stream posts (or comments) as NDJSON, with the same filters as GET /api/posts/.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', choices=sorted(EXPORTS), default='posts')
+        parser.add_argument('--author-id', type=int)
+        parser.add_argument('--from-date', help='YYYY-MM-DD')
+        parser.add_argument('--to-date', help='YYYY-MM-DD')
+        parser.add_argument('--output', default='-', help="Output file, or '-' for stdout.")
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            filters = parse_listing_filters(options)
+        except ValueError as err:
+            raise CommandError(str(err))
+
+        stream = iter_ndjson(export_rows(options['type'], **filters), options['chunk_size'])
+        if options['gzip']:
+            stream = compress_stream(stream, 'gzip', 6)
+
+        output = sys.stdout.buffer if options['output'] == '-' else open(options['output'], 'wb')
+        try:
+            for chunk in stream:
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
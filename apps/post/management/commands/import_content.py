@@ -0,0 +1,61 @@
+import csv
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.ingest import CHUNK_SIZE, LOADERS, iter_ingest
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream posts, comments or follow edges from a JSONL or CSV file into the database. '
+        'Rows: posts {author_id, content, created_at?}, comments {author_id, post_id, content, created_at?}, '
+        'follows {follower_id, followed_id}.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(LOADERS))
+        parser.add_argument('path', help="Input file, or '-' for stdin.")
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--no-fan-out', action='store_true', help='Do not copy imported posts into follower timelines, nor backfill them for imported follows.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        stream = sys.stdin if path == '-' else self._open(path)
+
+        created = rejected = 0
+        try:
+            rows = self._read_csv(stream) if file_format == 'csv' else self._read_jsonl(stream)
+            chunks = iter_ingest(options['kind'], rows, options['chunk_size'], fan_out=not options['no_fan_out'])
+            for chunk_created, errors in chunks:
+                created += chunk_created
+                rejected += len(errors)
+                for error in errors:
+                    self.stderr.write(json.dumps(error))
+                self.stdout.write(f"{created} created, {rejected} rejected so far...")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(f"Imported {created} {options['kind']} ({rejected} rejected)."))
+
+    def _open(self, path):
+        try:
+            return open(path, newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f"Cannot open {path}: {e}")
+
+    def _read_jsonl(self, stream):
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+    def _read_csv(self, stream):
+        yield from csv.DictReader(stream)
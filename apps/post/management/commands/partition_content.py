@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.post.partitions import (
+    PARTITIONED_TABLES,
+    add_months,
+    archive_before,
+    convert,
+    ensure_partitions,
+    is_partitioned,
+    month_start,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Maintain the monthly partitions of posts and comments: create the coming months ahead of time and '
+        'detach old months into an archive schema (or drop them). Run it periodically, e.g. daily.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true', help='Partition the tables first if they are not yet.')
+        parser.add_argument('--ahead', type=int, default=settings.CONTENT_PARTITIONS_AHEAD,
+                            help='Months after the current one to create partitions for.')
+        parser.add_argument('--retain-months', type=int,
+                            help='Detach the months that ended more than this many months before the current one.')
+        parser.add_argument('--archive-schema', default='archive', help='Schema detached partitions are moved to.')
+        parser.add_argument('--drop', action='store_true', help='Drop detached partitions instead of archiving them.')
+        parser.add_argument('--list', action='store_true', help='Only list the partitions and their estimated rows.')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        for table in PARTITIONED_TABLES:
+            if is_partitioned(connection, table):
+                continue
+            if not options['convert']:
+                raise CommandError(
+                    f"{table} is not partitioned; pass --convert (or set CONTENT_PARTITIONING before migrating)."
+                )
+            with transaction.atomic():
+                convert(connection, table, now, options['ahead'])
+            self.stdout.write(f"Partitioned {table} by month.")
+
+        if options['list']:
+            self._list()
+            return
+
+        with transaction.atomic():
+            for table in PARTITIONED_TABLES:
+                for name in ensure_partitions(connection, table, now, add_months(month_start(now), options['ahead'])):
+                    self.stdout.write(f"Created {name}.")
+
+        if options['retain_months'] is not None:
+            if options['retain_months'] < 0:
+                raise CommandError("--retain-months cannot be negative.")
+            cutoff = add_months(month_start(now), -options['retain_months'])
+            archive_schema = None if options['drop'] else options['archive_schema']
+            with transaction.atomic():
+                detached = archive_before(connection, cutoff, archive_schema)
+            action = 'Dropped' if archive_schema is None else f'Moved to schema {archive_schema}'
+            for name in detached:
+                self.stdout.write(f"{action}: {name}.")
+
+        self.stdout.write(self.style.SUCCESS("Partitions are up to date."))
+
+    def _list(self):
+        with connection.cursor() as cursor:
+            for table in PARTITIONED_TABLES:
+                cursor.execute(
+                    'SELECT c.relname, GREATEST(c.reltuples, 0)::bigint FROM pg_inherits i '
+                    'JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(%s) ORDER BY c.relname',
+                    [table],
+                )
+                for name, rows in cursor.fetchall():
+                    self.stdout.write(f"{name:<28} ~{rows} rows")
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.post.seed import seed
+from apps.user.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a synthetic dataset for benchmarks: users with a power-law follower graph, posts and comments. '
+        'The first user is a staff account named after --prefix.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument('--follows-per-user', type=int, default=20, help='Average number of accounts each user follows.')
+        parser.add_argument('--days', type=int, default=90, help='Spread post dates over this many past days.')
+        parser.add_argument('--prefix', default='bench', help='Username prefix of the generated users.')
+        parser.add_argument('--password', default='bench', help='Password of every generated user.')
+        parser.add_argument('--seed', type=int, help='Random seed, for reproducible datasets.')
+        parser.add_argument('--no-fan-out', action='store_true', help='Do not fill the follower timelines.')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError("--users must be at least 1.")
+        prefix = options['prefix']
+        if User.objects.filter(username=prefix).exists():
+            raise CommandError(f"Users with prefix '{prefix}' already exist; pass another --prefix.")
+
+        counts = seed(
+            users=options['users'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows_per_user=options['follows_per_user'],
+            days=options['days'],
+            prefix=prefix,
+            password=options['password'],
+            seed=options['seed'],
+            fan_out=not options['no_fan_out'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {counts['users']} users, {counts['follows']} follows, "
+            f"{counts['posts']} posts and {counts['comments']} comments."
+        ))
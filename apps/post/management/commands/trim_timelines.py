@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.post.models import TimelineEntry
+
+
+class Command(BaseCommand):
+    help = 'Drop timeline entries beyond the per-user cap (FEED_TIMELINE_MAX_LENGTH).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-length', type=int, default=settings.FEED_TIMELINE_MAX_LENGTH)
+
+    def handle(self, *args, **options):
+        deleted = TimelineEntry.objects.trim(max_length=options['max_length'])
+        self.stdout.write(self.style.SUCCESS(f"Removed {deleted} timeline entries."))
@@ -1,6 +1,62 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
 from django.db import models
+from django.db.models.functions import Cast, RowNumber
+
+LATEST_COMMENTS_LIMIT = 3
+
+
+class ContentQuerySet(models.QuerySet):
+    def filter_listing(self, author_id=None, from_date=None, to_date=None):
+        # The author/date filters accepted by PostList and the exports.
+        queryset = self
+        if author_id:
+            queryset = queryset.filter(author_id=author_id)
+        if from_date:
+            queryset = queryset.filter(created_at__gte=from_date)
+        if to_date:
+            queryset = queryset.filter(created_at__lte=to_date)
+        return queryset
+
+    def window(self, since=None, before=None):
+        queryset = self
+        if since:
+            queryset = queryset.filter(created_at__gte=since)
+        if before:
+            queryset = queryset.filter(created_at__lt=before)
+        return queryset
 
-class PostManager(models.Manager):
+    def search(self, terms):
+        # Matches against the trigger-maintained ``search_vector`` column, so
+        # the filter is served by its GIN index. ts_rank() is a ``real``; as
+        # double precision it round-trips exactly through pagination cursors.
+        query = SearchQuery(terms, config=settings.SEARCH_CONFIG, search_type='websearch')
+        rank = Cast(SearchRank(models.F('search_vector'), query), models.FloatField())
+        return self.filter(search_vector=query).annotate(rank=rank)
+
+
+class PostQuerySet(ContentQuerySet):
+    def with_nested_relations(self):
+        # Loads everything PostSerializer nests in a fixed number of queries:
+        # authors with their counters, and the latest comments of every post
+        # through a sliced prefetch (ROW_NUMBER() OVER (PARTITION BY post_id
+        # ...)) instead of one query per post.
+        from apps.user.models import User
+        from .models import Comment
+
+        authors = User.objects.with_activity_counts()
+        latest_comments = Comment.objects.order_by('-created_at').prefetch_related(
+            models.Prefetch('author', queryset=User.objects.with_activity_counts())
+        )[:LATEST_COMMENTS_LIMIT]
+        return self.prefetch_related(
+            models.Prefetch('author', queryset=authors),
+            models.Prefetch('comments', queryset=latest_comments, to_attr='latest_comments'),
+        )
+
+
+class PostManager(models.Manager.from_queryset(PostQuerySet)):
     def published(self):
         return self.get_queryset().order_by('-created_at')
 
@@ -12,6 +68,76 @@ class PostManager(models.Manager):
 
     def recent_with_comments(self):
         queryset = self.published().select_related('author').prefetch_related(
-            'comments_set'
+            'comments'
         )
         return queryset
+
+
+class CommentManager(models.Manager.from_queryset(ContentQuerySet)):
+    def latest_per_post(self, post_ids, limit=LATEST_COMMENTS_LIMIT):
+        # The same ranking as the sliced prefetch in with_nested_relations.
+        rank = models.Window(RowNumber(), partition_by=models.F('post_id'), order_by=models.F('created_at').desc())
+        return self.filter(post_id__in=post_ids).annotate(rank=rank).filter(rank__lte=limit).order_by('-created_at')
+
+
+class TimelineManager(models.Manager):
+    def fan_out(self, post):
+        self.fan_out_many([post])
+
+    def fan_out_many(self, posts):
+        # Fan-out-on-write: copy each post into the timeline of its author and
+        # every follower. Authors above FEED_FANOUT_MAX_FOLLOWERS only get their
+        # own entry and are merged into their followers' feeds at read time.
+        from apps.user.models import Follow, UserStats
+
+        author_ids = {post.author_id for post in posts}
+        large_accounts = set(
+            UserStats.objects.filter(
+                user_id__in=author_ids, total_followers__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+            ).values_list('user_id', flat=True)
+        )
+        followers = defaultdict(list)
+        edges = Follow.objects.filter(followed_id__in=author_ids - large_accounts)
+        for author_id, follower_id in edges.values_list('followed_id', 'follower_id'):
+            followers[author_id].append(follower_id)
+
+        self.bulk_create(
+            [
+                self.model(owner_id=owner_id, post_id=post.pk, created_at=post.created_at)
+                for post in posts
+                for owner_id in (post.author_id, *followers[post.author_id])
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+    def backfill(self, owner_id, author_ids):
+        # Seeds a timeline with the latest posts of newly followed authors.
+        from .models import Post
+
+        posts = Post.objects.filter(author_id__in=author_ids).order_by('-created_at').values_list('pk', 'created_at')
+        self.bulk_create(
+            [self.model(owner_id=owner_id, post_id=pk, created_at=created_at)
+             for pk, created_at in posts[:settings.FEED_TIMELINE_MAX_LENGTH]],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+    def unfeed(self, owner_id, author_ids):
+        # Drops the posts of unfollowed authors from a timeline.
+        return self.filter(owner_id=owner_id, post__author_id__in=author_ids).delete()[0]
+
+    def trim(self, owner_ids=None, max_length=None):
+        max_length = max_length or settings.FEED_TIMELINE_MAX_LENGTH
+        queryset = self.get_queryset()
+        if owner_ids is not None:
+            queryset = queryset.filter(owner_id__in=owner_ids)
+        stale = queryset.annotate(
+            position=models.Window(
+                expression=RowNumber(),
+                partition_by=models.F('owner_id'),
+                order_by=[models.F('created_at').desc(), models.F('post_id').desc()],
+            )
+        ).filter(position__gt=max_length).values('pk')
+        deleted, _ = self.filter(pk__in=stale).delete()
+        return deleted
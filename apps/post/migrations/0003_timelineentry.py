@@ -0,0 +1,52 @@
+# Generated by Django 4.2.16 on 2026-10-18 08:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('post', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='post.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', '-created_at', '-post'], name='post_timeline_owner_feed_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('owner', 'post'), name='post_timeline_owner_post_uniq'),
+        ),
+        migrations.RunSQL(
+            sql=[(
+                """
+                INSERT INTO post_timelineentry (owner_id, post_id, created_at)
+                SELECT owner_id, post_id, created_at FROM (
+                    SELECT owner_id, post_id, created_at,
+                           ROW_NUMBER() OVER (PARTITION BY owner_id ORDER BY created_at DESC, post_id DESC) AS position
+                    FROM (
+                        SELECT f.to_user_id AS owner_id, p.id AS post_id, p.created_at
+                        FROM post_post p JOIN user_user_followers f ON f.from_user_id = p.author_id
+                        UNION
+                        SELECT p.author_id, p.id, p.created_at FROM post_post p
+                    ) edges
+                ) ranked
+                WHERE position <= %s
+                """,
+                [settings.FEED_TIMELINE_MAX_LENGTH],
+            )],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
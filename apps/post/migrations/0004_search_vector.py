@@ -0,0 +1,53 @@
+# Generated by Django 4.2.16 on 2026-10-18 08:20
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+SEARCH_TRIGGER_SQL = """
+    CREATE TRIGGER {table}_search_vector_update
+    BEFORE INSERT OR UPDATE OF content ON {table}
+    FOR EACH ROW EXECUTE FUNCTION tsvector_update_trigger(search_vector, 'pg_catalog.{config}', content);
+    UPDATE {table} SET search_vector = to_tsvector('pg_catalog.{config}', content);
+"""
+
+DROP_SEARCH_TRIGGER_SQL = 'DROP TRIGGER IF EXISTS {table}_search_vector_update ON {table};'
+
+
+def search_trigger(table):
+    return migrations.RunSQL(
+        sql=SEARCH_TRIGGER_SQL.format(table=table, config=settings.SEARCH_CONFIG),
+        reverse_sql=DROP_SEARCH_TRIGGER_SQL.format(table=table),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0003_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='post_comment_search_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='post_post_search_gin'),
+        ),
+        search_trigger('post_post'),
+        search_trigger('post_comment'),
+    ]
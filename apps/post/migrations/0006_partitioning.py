@@ -0,0 +1,50 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:04
+
+import copy
+
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+from apps.post import partitions
+
+
+def partition_tables(apps, schema_editor):
+    # Optional: with CONTENT_PARTITIONING off this is a no-op, and
+    # `manage.py partition_content --convert` can do it later. Converting
+    # drops the foreign key constraints pointing at posts.
+    if not settings.CONTENT_PARTITIONING:
+        return
+    for table in partitions.PARTITIONED_TABLES:
+        if not partitions.is_partitioned(schema_editor.connection, table):
+            partitions.convert(schema_editor.connection, table, timezone.now(), settings.CONTENT_PARTITIONS_AHEAD)
+
+
+def unpartition_tables(apps, schema_editor):
+    for table in partitions.PARTITIONED_TABLES:
+        if partitions.is_partitioned(schema_editor.connection, table):
+            partitions.unconvert(schema_editor.connection, table)
+
+    # Back to the constraints the models declare.
+    introspection = schema_editor.connection.introspection
+    for model_name in ('comment', 'timelineentry'):
+        model = apps.get_model('post', model_name)
+        field = model._meta.get_field('post')
+        with schema_editor.connection.cursor() as cursor:
+            constraints = introspection.get_constraints(cursor, model._meta.db_table).values()
+        if any(constraint['foreign_key'] and constraint['columns'] == [field.column] for constraint in constraints):
+            continue
+        unconstrained = copy.copy(field)
+        unconstrained.db_constraint = False
+        schema_editor.alter_field(model, unconstrained, field)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0005_index_review'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tables, unpartition_tables),
+    ]
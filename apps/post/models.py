@@ -1,20 +1,28 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.utils import timezone
 from apps.user.models import User
-from .managers import PostManager
+from .managers import CommentManager, PostManager, TimelineManager
 
 
 class Post(models.Model):
-    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
+    # Both columns are indexed through the composite indexes below.
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts', db_index=False)
     content = models.TextField()
-    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    # Maintained by a database trigger from `content` (see migration 0004).
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
 
     objects = PostManager()
 
     class Meta:
         indexes = [
-            models.Index(fields=['created_at']),
-            models.Index(fields=['author']),
+            # PostList: newest first, optionally by author and date range,
+            # with `id` as the tiebreak of the cursor pagination.
+            models.Index(fields=['-created_at', '-id'], name='post_post_created_id_idx'),
+            models.Index(fields=['author', '-created_at', '-id'], name='post_post_author_created_idx'),
+            GinIndex(fields=['search_vector'], name='post_post_search_gin'),
         ]
 
     def __str__(self):
@@ -23,15 +31,43 @@ class Post(models.Model):
 
 class Comment(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comments')
-    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
+    # Its database constraint is dropped if posts are partitioned (see partitions.py).
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments', db_index=False)
     content = models.TextField()
     created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    # Maintained by a database trigger from `content` (see migration 0004).
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+
+    objects = CommentManager()
 
     class Meta:
         indexes = [
-            models.Index(fields=['post']),
-            models.Index(fields=['created_at']),
+            # A post's comments in date order (CommentList, latest comments).
+            models.Index(fields=['post', '-created_at', '-id'], name='post_comment_post_created_idx'),
+            GinIndex(fields=['search_vector'], name='post_comment_search_gin'),
+        ]
+
+    def __str__(self):
+        return f"Comment by {self.author.username} on {self.created_at}"
+
+class TimelineEntry(models.Model):
+    # Materialized home feed: one row per (reader, post) written when the post
+    # is created, so reading a feed is a range scan on (owner, created_at).
+    # Indexed by the (owner, ...) constraint and feed index below.
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries', db_index=False)
+    # Like Comment.post, loses its database constraint if posts are partitioned.
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    created_at = models.DateTimeField()
+
+    objects = TimelineManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'post'], name='post_timeline_owner_post_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-post'], name='post_timeline_owner_feed_idx'),
         ]
 
     def __str__(self):
-        return f"Comment by {self.author.username} on {self.created_at}"
\ No newline at end of file
+        return f"Post #{self.post_id} in timeline of user #{self.owner_id}"
@@ -0,0 +1,264 @@
+"""
+Monthly range partitioning of the post and comment tables on ``created_at``.
+
+Optional: with settings.CONTENT_PARTITIONING on, migration 0006 converts the
+tables, and ``manage.py partition_content`` converts them later, creates the
+partitions of the coming months ahead of time and detaches (archives or
+drops) the old ones.
+
+Postgres requires the partition key in a partitioned table's primary key and
+in every unique index, so the key of a partitioned table is
+``(id, created_at)``. Ids still come from a single sequence per table and
+stay unique; the ORM keeps using ``id`` alone. Foreign keys can't point to
+``id`` alone either, so converting a table drops the constraints of the
+foreign keys pointing at it (comments' and timeline entries' post);
+deleting through the ORM still cascades. Without partitioning they stay.
+
+Rows outside every monthly partition (e.g. imported with a far-off date) land
+in a ``<table>_default`` partition; ``ensure_partitions`` moves them into
+their month when it creates it.
+"""
+import re
+from datetime import datetime, timezone
+
+PARTITIONED_TABLES = ('post_post', 'post_comment')
+PARTITION_KEY = 'created_at'
+
+_partition_suffix = re.compile(r'_p(\d{4})_(\d{2})$')
+
+
+def month_start(value):
+    value = value.astimezone(timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(start, months):
+    index = start.year * 12 + start.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(table, start):
+    return f'{table}_p{start:%Y_%m}'
+
+
+def is_partitioned(connection, table):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [table])
+        return cursor.fetchone() is not None
+
+
+def monthly_partitions(connection, table):
+    """``[(name, month start)]`` of the attached monthly partitions, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = to_regclass(%s)',
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = []
+    for name in names:
+        match = _partition_suffix.search(name)
+        if match and name == f'{table}{match.group(0)}':
+            partitions.append((name, datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def ensure_partitions(connection, table, first, last):
+    """Creates the missing monthly partitions from ``first`` to ``last`` (inclusive); returns their names."""
+    existing = {start for _, start in monthly_partitions(connection, table)}
+    created = []
+    start = month_start(first)
+    while start <= month_start(last):
+        if start not in existing:
+            created.append(_create_partition(connection, table, start))
+        start = add_months(start, 1)
+    return created
+
+
+def _create_partition(connection, table, start):
+    # Built as a plain table and attached, so rows for this month that were
+    # parked in the default partition can be moved in first.
+    name = partition_name(table, start)
+    bounds = [start, add_months(start, 1)]
+    default = f'{table}_default'
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        if _exists(cursor, default):
+            in_month = f'WHERE {PARTITION_KEY} >= %s AND {PARTITION_KEY} < %s'
+            cursor.execute(f'INSERT INTO {name} SELECT * FROM {default} {in_month}', bounds)
+            cursor.execute(f'DELETE FROM {default} {in_month}', bounds)
+        cursor.execute(f'ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)', bounds)
+    return name
+
+
+def convert(connection, table, now, months_ahead):
+    """
+    Turns ``table`` into a table partitioned by month, with one partition
+    from its oldest row up to ``months_ahead`` months after ``now``. Indexes,
+    triggers and outgoing foreign keys are recreated on the new table;
+    incoming foreign keys are dropped.
+    """
+    old = f'{table}_unpartitioned'
+    with connection.cursor() as cursor:
+        _check_pending_constraints(cursor)
+        _drop_references(cursor, table)
+        definitions = _definitions(cursor, table)
+        cursor.execute(f'SELECT MIN({PARTITION_KEY}), MAX(id) FROM {table}')
+        oldest, max_id = cursor.fetchone()
+
+        cursor.execute(f'ALTER TABLE {table} RENAME TO {old}')
+        cursor.execute(
+            f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS) PARTITION BY RANGE ({PARTITION_KEY})'
+        )
+        _move_id_sequence(cursor, old, table, max_id)
+        cursor.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+    ensure_partitions(connection, table, oldest or now, add_months(month_start(now), months_ahead))
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {table} SELECT * FROM {old}')
+        cursor.execute(f'DROP TABLE {old}')
+        cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, {PARTITION_KEY})')
+        _recreate(cursor, definitions, old, table)
+
+
+def unconvert(connection, table):
+    """Merges a partitioned ``table`` back into a single table."""
+    old = f'{table}_partitioned'
+    with connection.cursor() as cursor:
+        _check_pending_constraints(cursor)
+        definitions = _definitions(cursor, table)
+        cursor.execute(f'ALTER TABLE {table} RENAME TO {old}')
+        cursor.execute(f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS)')
+        _move_id_sequence(cursor, old, table)
+        cursor.execute(f'INSERT INTO {table} SELECT * FROM {old}')
+        cursor.execute(f'DROP TABLE {old}')
+        cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id)')
+        _recreate(cursor, definitions, old, table)
+
+
+def detach_partition(connection, name, table, archive_schema=None):
+    """Detaches a partition and moves it to ``archive_schema``, or drops it when that is None."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {name}')
+        if archive_schema is None:
+            cursor.execute(f'DROP TABLE {name}')
+        else:
+            cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {archive_schema}')
+            cursor.execute(f'ALTER TABLE {name} SET SCHEMA {archive_schema}')
+
+
+def _check_pending_constraints(cursor):
+    # Deferred foreign key checks of rows written earlier in the transaction
+    # would block altering the table.
+    cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+    cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+
+
+def _drop_references(cursor, table):
+    cursor.execute(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint WHERE confrelid = to_regclass(%s) AND contype = 'f'",
+        [table],
+    )
+    for referencing, name in cursor.fetchall():
+        cursor.execute(f'ALTER TABLE {referencing} DROP CONSTRAINT {name}')
+
+
+def _exists(cursor, table):
+    cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [table])
+    return cursor.fetchone()[0]
+
+
+def _definitions(cursor, table):
+    # Everything that has to be recreated on the replacement table: indexes
+    # (except the primary key's), triggers and foreign keys.
+    cursor.execute(
+        'SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s '
+        'AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s))',
+        [table, table],
+    )
+    indexes = [row[0] for row in cursor.fetchall()]
+    cursor.execute(
+        'SELECT pg_get_triggerdef(oid) FROM pg_trigger WHERE tgrelid = to_regclass(%s) AND NOT tgisinternal',
+        [table],
+    )
+    triggers = [row[0] for row in cursor.fetchall()]
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+        [table],
+    )
+    foreign_keys = [f'ALTER TABLE {{table}} ADD CONSTRAINT {name} {definition}' for name, definition in cursor.fetchall()]
+    return indexes + triggers + foreign_keys
+
+
+def _recreate(cursor, definitions, old, table):
+    # The definitions were read before the rename but Postgres spells the
+    # table as it was named then; point them at the new table.
+    target = re.compile(rf'\bON (?:ONLY )?(?:\w+\.)?(?:{table}|{old})\b')
+    for definition in definitions:
+        cursor.execute(target.sub(f'ON {table}', definition).replace('{table}', table))
+
+
+def _move_id_sequence(cursor, old, table, max_id=None):
+    # Partitioned tables can't have identity columns (before Postgres 17), so
+    # ids come from a sequence owned by the new table's column.
+    cursor.execute(
+        "SELECT attidentity FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attname = 'id'", [old]
+    )
+    if cursor.fetchone()[0]:
+        cursor.execute(f'ALTER TABLE {old} ALTER COLUMN id DROP IDENTITY')
+        cursor.execute(f'CREATE SEQUENCE {table}_id_seq OWNED BY {table}.id')
+        if max_id is not None:
+            cursor.execute(f"SELECT setval('{table}_id_seq', %s)", [max_id])
+        cursor.execute(f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{table}_id_seq')")
+    else:
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [old, 'id'])
+        cursor.execute(f'ALTER SEQUENCE {cursor.fetchone()[0]} OWNED BY {table}.id')
+
+
+def archive_before(connection, cutoff, archive_schema=None):
+    """
+    Detaches the monthly partitions of posts and comments that end before
+    ``cutoff``, moving them to ``archive_schema`` (or dropping them), along
+    with what referenced the archived posts: later comments (kept in
+    ``<archive_schema>.post_comment_orphans``) and timeline entries. The
+    counters of the affected users are rebuilt. Returns the detached names.
+    """
+    from apps.user.models import UserStats
+    from utils.cache import COMMENTS_TABLE, POSTS_TABLE, USERS_TABLE, response_cache
+    from .models import TimelineEntry
+
+    detached, authors = [], set()
+    for table in PARTITIONED_TABLES:
+        for name, start in monthly_partitions(connection, table):
+            if add_months(start, 1) <= cutoff:
+                authors |= _distinct(connection, 'author_id', name)
+                detach_partition(connection, name, table, archive_schema)
+                detached.append(name)
+    if not detached:
+        return detached
+
+    orphans = (
+        f'post_comment c WHERE c.{PARTITION_KEY} >= %s '
+        'AND NOT EXISTS (SELECT 1 FROM post_post p WHERE p.id = c.post_id)'
+    )
+    authors |= _distinct(connection, 'c.author_id', orphans, [cutoff])
+    with connection.cursor() as cursor:
+        if archive_schema is not None:
+            cursor.execute(f'CREATE TABLE IF NOT EXISTS {archive_schema}.post_comment_orphans (LIKE post_comment)')
+            cursor.execute(f'INSERT INTO {archive_schema}.post_comment_orphans SELECT c.* FROM {orphans}', [cutoff])
+        cursor.execute(f'DELETE FROM {orphans}', [cutoff])
+    # Timeline entries carry their post's date.
+    TimelineEntry.objects.filter(created_at__lt=cutoff).delete()
+
+    authors = sorted(authors)
+    for start in range(0, len(authors), 1000):
+        UserStats.objects.rebuild(authors[start:start + 1000])
+    response_cache.invalidate(POSTS_TABLE, COMMENTS_TABLE, USERS_TABLE, *[('user', pk) for pk in authors])
+    return detached
+
+
+def _distinct(connection, column, source, params=None):
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT DISTINCT {column} FROM {source}', params)
+        return {row[0] for row in cursor.fetchall()}
@@ -0,0 +1,181 @@
+"""
+Synthetic datasets for benchmarking (``manage.py seed_bench``).
+
+Generates users, a power-law follower graph, posts and comments directly with
+``bulk_create``, so hundreds of thousands of rows load in seconds. Popularity
+and activity follow Zipf-like distributions: a few accounts are followed by
+a large share of users and write most of the posts, and comments concentrate
+on a minority of posts, like on a real social network.
+
+The first user is named after the prefix (``bench`` by default) and is
+staff, so benchmarks can authenticate as it and reach the admin-only
+endpoints. Every user gets the same password.
+"""
+import random
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from apps.user.models import Follow, User, UserStats
+from utils.cache import COMMENTS_TABLE, POSTS_TABLE, USERS_TABLE, response_cache
+from .models import Comment, Post, TimelineEntry
+
+BATCH_SIZE = 5000
+
+WORDS = (
+    'hola mundo café ciudad noche día semana trabajo proyecto equipo música película libro viaje playa '
+    'montaña fútbol partido gol entrenamiento receta cocina cena desayuno amigos familia fiesta cumpleaños '
+    'lluvia sol calor frío invierno verano otoño primavera tren avión coche bicicleta calle barrio mercado '
+    'precio oferta tienda compra venta noticia política economía empresa mercado datos código servidor '
+    'aplicación móvil pantalla foto vídeo canción concierto teatro museo arte historia ciencia espacio '
+    'planeta estrella universidad examen clase profesor alumno idea pregunta respuesta problema solución '
+    'nuevo viejo grande pequeño rápido lento fácil difícil mejor peor bonito increíble terrible genial '
+    'hoy mañana ayer siempre nunca ahora después antes pronto tarde aquí allí mucho poco todo nada'
+).split()
+
+
+def seed(users=1000, posts=10000, comments=50000, follows_per_user=20, days=90, prefix='bench',
+         password='bench', seed=None, fan_out=True, log=None):
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    now = timezone.now()
+
+    user_ids = _create_users(users, prefix, password)
+    log(f"{len(user_ids)} users created.")
+    with transaction.atomic():
+        edges = _create_follows(rng, user_ids, follows_per_user)
+    log(f"{edges} follow edges created.")
+
+    post_rows = _create_posts(rng, user_ids, posts, days, now)
+    log(f"{len(post_rows)} posts created.")
+    comment_count = _create_comments(rng, user_ids, post_rows, comments, now)
+    log(f"{comment_count} comments created.")
+
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        UserStats.objects.rebuild(user_ids[start:start + BATCH_SIZE])
+    log("User counters rebuilt.")
+
+    if fan_out:
+        _fan_out(post_rows, user_ids)
+        log("Follower timelines filled.")
+
+    response_cache.invalidate(USERS_TABLE, POSTS_TABLE, COMMENTS_TABLE)
+    return {
+        'users': len(user_ids),
+        'follows': edges,
+        'posts': len(post_rows),
+        'comments': comment_count,
+    }
+
+
+def zipf_weights(size, exponent):
+    """Cumulative weights of ranks 1..size under a Zipf law, for ``random.choices``."""
+    return list(accumulate(1 / rank ** exponent for rank in range(1, size + 1)))
+
+
+def _create_users(count, prefix, password):
+    # Hashing is deliberately slow, so every user shares one hash.
+    hashed = make_password(password)
+    users = [
+        User(
+            username=prefix if i == 0 else f'{prefix}{i}',
+            email=f'{prefix}{i}@example.com',
+            password=hashed,
+            is_staff=i == 0,
+        )
+        for i in range(count)
+    ]
+    with transaction.atomic():
+        User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+    return [user.pk for user in users]
+
+
+def _create_follows(rng, user_ids, follows_per_user):
+    # Out-degrees are Pareto distributed around ``follows_per_user`` and the
+    # followed accounts are drawn by popularity rank, which gives the graph
+    # its heavy-tailed follower counts.
+    if len(user_ids) < 2 or follows_per_user <= 0:
+        return 0
+    popularity = rng.sample(user_ids, len(user_ids))
+    weights = zipf_weights(len(popularity), 1.1)
+    shape = 2.0
+    scale = follows_per_user * (shape - 1) / shape
+
+    created = 0
+    batch = []
+    for follower_id in user_ids:
+        degree = min((len(user_ids) - 1) // 2, int(scale * rng.paretovariate(shape)))
+        followed = set()
+        while len(followed) < degree:
+            followed.update(rng.choices(popularity, cum_weights=weights, k=degree - len(followed)))
+            followed.discard(follower_id)
+        batch.extend(Follow(followed_id=pk, follower_id=follower_id) for pk in followed)
+        if len(batch) >= BATCH_SIZE:
+            Follow.objects.bulk_create(batch, ignore_conflicts=True)
+            created += len(batch)
+            batch = []
+    Follow.objects.bulk_create(batch, ignore_conflicts=True)
+    return created + len(batch)
+
+
+def _create_posts(rng, user_ids, count, days, now):
+    activity = rng.sample(user_ids, len(user_ids))
+    weights = zipf_weights(len(activity), 1.0)
+    span = timedelta(days=days).total_seconds()
+
+    rows = []
+    for start in range(0, count, BATCH_SIZE):
+        size = min(BATCH_SIZE, count - start)
+        authors = rng.choices(activity, cum_weights=weights, k=size)
+        posts = [
+            Post(author_id=author_id, content=_text(rng, 5, 60), created_at=now - timedelta(seconds=rng.random() * span))
+            for author_id in authors
+        ]
+        with transaction.atomic():
+            Post.objects.bulk_create(posts)
+        rows.extend((post.pk, post.author_id, post.created_at) for post in posts)
+    return rows
+
+
+def _create_comments(rng, user_ids, post_rows, count, now):
+    if not post_rows:
+        return 0
+    activity = rng.sample(user_ids, len(user_ids))
+    user_weights = zipf_weights(len(activity), 1.0)
+    popular_posts = rng.sample(post_rows, len(post_rows))
+    post_weights = zipf_weights(len(popular_posts), 0.8)
+
+    for start in range(0, count, BATCH_SIZE):
+        size = min(BATCH_SIZE, count - start)
+        authors = rng.choices(activity, cum_weights=user_weights, k=size)
+        targets = rng.choices(popular_posts, cum_weights=post_weights, k=size)
+        comments = [
+            Comment(
+                author_id=author_id,
+                post_id=post_id,
+                content=_text(rng, 2, 30),
+                created_at=min(now, created_at + timedelta(seconds=rng.expovariate(1 / 3600))),
+            )
+            for author_id, (post_id, _, created_at) in zip(authors, targets)
+        ]
+        with transaction.atomic():
+            Comment.objects.bulk_create(comments)
+    return count
+
+
+def _fan_out(post_rows, user_ids):
+    for start in range(0, len(post_rows), BATCH_SIZE):
+        posts = [
+            Post(pk=pk, author_id=author_id, created_at=created_at)
+            for pk, author_id, created_at in post_rows[start:start + BATCH_SIZE]
+        ]
+        with transaction.atomic():
+            TimelineEntry.objects.fan_out_many(posts)
+    TimelineEntry.objects.trim(owner_ids=user_ids)
+
+
+def _text(rng, min_words, max_words):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(min_words, max_words))).capitalize() + '.'
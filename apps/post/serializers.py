@@ -1,6 +1,8 @@
+from django.utils import timezone
 from rest_framework import serializers
+from .managers import LATEST_COMMENTS_LIMIT
 from .models import  Comment, Post
-from apps.user.serializers import UserSerializer
+from apps.user.serializers import UserSerializer, UserSummaryRows
 
 
 class PostSerializer(serializers.ModelSerializer):
@@ -12,7 +14,10 @@ class PostSerializer(serializers.ModelSerializer):
         fields = ['id', 'author', 'content', 'created_at', 'comments']
     
     def get_comments(self, obj):
-        comments = obj.comments.order_by('-created_at')[:3]
+        if hasattr(obj, 'latest_comments'):
+            comments = obj.latest_comments
+        else:
+            comments = obj.comments.select_related('author__stats').order_by('-created_at')[:LATEST_COMMENTS_LIMIT]
         return CommentSerializer(comments, many=True).data
     
     def validate_content(self, value):
@@ -34,3 +39,60 @@ class CommentSerializer(serializers.ModelSerializer):
         if not value.strip():
             raise serializers.ValidationError("Comment content cannot be empty")
         return value
+
+
+def format_datetime(value, tz):
+    # DateTimeField.to_representation with the default ISO 8601 format.
+    value = value.astimezone(tz).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+class CommentRows:
+    """
+    Read-only fast path for CommentSerializer's output: ``rows`` turns a
+    queryset into ``values_list`` rows (named, so keyset pagination can read
+    their position) and ``represent`` builds the payloads from them, without
+    model instances or DRF fields.
+    """
+    author = UserSummaryRows('author')
+    columns = ('id', 'post_id', 'content', 'created_at', *author.columns)
+
+    def rows(self, queryset):
+        return queryset.values_list(*self.columns, named=True)
+
+    def represent(self, rows):
+        tz = timezone.get_current_timezone()
+        authors = self.author.represent(rows, offset=4)
+        return [
+            {'id': row[0], 'author': author, 'post': row[1], 'content': row[2], 'created_at': format_datetime(row[3], tz)}
+            for row, author in zip(rows, authors)
+        ]
+
+
+class PostRows:
+    """Same as CommentRows, for PostSerializer; the latest comments of a page take one more query."""
+    author = UserSummaryRows('author')
+    columns = ('id', 'content', 'created_at', *author.columns)
+    comment_rows = CommentRows()
+
+    def rows(self, queryset):
+        return queryset.values_list(*self.columns, named=True)
+
+    def represent(self, rows):
+        rows = list(rows)
+        latest = {row[0]: [] for row in rows}
+        if latest:
+            comments = self.comment_rows.rows(Comment.objects.latest_per_post(latest))
+            for comment in self.comment_rows.represent(list(comments)):
+                latest[comment['post']].append(comment)
+
+        tz = timezone.get_current_timezone()
+        authors = self.author.represent(rows, offset=3)
+        return [
+            {'id': row[0], 'author': author, 'content': row[1], 'created_at': format_datetime(row[2], tz), 'comments': latest[row[0]]}
+            for row, author in zip(rows, authors)
+        ]
+
+
+comment_rows = CommentRows()
+post_rows = PostRows()
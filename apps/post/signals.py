@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from utils.cache import COMMENTS_TABLE, POSTS_TABLE, response_cache
+from .models import Comment, Post
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post(sender, instance, **kwargs):
+    response_cache.invalidate(('post', instance.pk), ('user', instance.author_id), POSTS_TABLE)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment(sender, instance, **kwargs):
+    response_cache.invalidate(('post', instance.post_id), ('user', instance.author_id), COMMENTS_TABLE)
@@ -1,8 +1,29 @@
+from django.conf import settings
 from django.urls import path
-from .views import PostList, PostDetail, CommentList
+from .views import (
+    AsyncCommentList,
+    AsyncPostDetail,
+    AsyncPostList,
+    BulkCommentCreate,
+    BulkPostCreate,
+    CommentList,
+    ContentExport,
+    FeedView,
+    PostDetail,
+    PostList,
+    PostSearch,
+)
+
+if settings.ASYNC_VIEWS:
+    PostList, PostDetail, CommentList = AsyncPostList, AsyncPostDetail, AsyncCommentList
 
 urlpatterns = [
     path('', PostList.as_view(), name='post-list'),
+    path('feed/', FeedView.as_view(), name='post-feed'),
+    path('search/', PostSearch.as_view(), name='post-search'),
+    path('bulk/', BulkPostCreate.as_view(), name='post-bulk'),
+    path('comments/bulk/', BulkCommentCreate.as_view(), name='comment-bulk'),
+    path('export/', ContentExport.as_view(), name='post-export'),
     path('<int:pk>/', PostDetail.as_view(), name='post-detail'),
     path('<int:pk>/comments/', CommentList.as_view(), name='comment-list'),
 ]
\ No newline at end of file
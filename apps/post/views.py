@@ -1,60 +1,78 @@
+import asyncio
 import logging
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
 from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAdminUser
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.core.exceptions import ValidationError
-from datetime import datetime
 
-from utils.pagination import SmallSetPagination
+from utils.cache import (
+    COMMENTS_TABLE,
+    POSTS_TABLE,
+    USERS_TABLE,
+    conditional_response,
+    response_cache,
+    set_validators,
+)
+from utils.compression import compress_stream, compression_levels
+from utils.pagination import (
+    CommentPagination,
+    KeysetPagination,
+    SearchPagination,
+    TimelinePagination,
+    alist,
+    get_paginator,
+    parse_window,
+)
 from utils.permissions import IsAuthenticated
-from .models import Post
-from .serializers import PostSerializer, CommentSerializer
+from utils.views import AsyncAPIView, BulkIngest, aserialize
+from .export import EXPORTS, export_rows, iter_ndjson, parse_listing_filters
+from .managers import LATEST_COMMENTS_LIMIT
+from .models import Comment, Post, TimelineEntry
+from .serializers import CommentSerializer, PostSerializer, comment_rows, post_rows
 
 logger = logging.getLogger(__name__)
 
 class PostList(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scopes = {'GET': 'posts.read', 'POST': 'posts.write'}
 
     def get(self, request):
         try:
-            author_id = request.query_params.get('author_id', None)
-            from_date = request.query_params.get('from_date', None)
-            to_date = request.query_params.get('to_date', None)
-
-            # Validate date format
-            if from_date:
-                try:
-                    from_date = datetime.strptime(from_date, '%Y-%m-%d').date()
-                except ValueError as err:
-                    logger.error(f"{str(err)}")
-                    return Response({'error': 'Invalid from_date format, should be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
-            if to_date:
-                try:
-                    to_date = datetime.strptime(to_date, '%Y-%m-%d').date()
-                except ValueError as err:
-                    logger.error(f"{str(err)}")
-                    return Response({'error': 'Invalid to_date format, should be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
-
-            queryset = Post.objects.select_related('author').order_by('-created_at')
-            if author_id:
-                queryset = queryset.filter(author_id=author_id)
-            if from_date:
-                queryset = queryset.filter(created_at__gte=from_date)
-            if to_date:
-                queryset = queryset.filter(created_at__lte=to_date)
-
-            paginator = SmallSetPagination()
-            page = paginator.paginate_queryset(queryset, request)
-            serializer = PostSerializer(page, many=True)
+            etag, last_modified = response_cache.validators([POSTS_TABLE, COMMENTS_TABLE, USERS_TABLE], request)
+            not_modified = conditional_response(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+
+            try:
+                filters = parse_listing_filters(request.query_params)
+            except ValueError as err:
+                logger.error("%s", err)
+                return Response({'error': str(err)}, status=status.HTTP_400_BAD_REQUEST)
+
+            queryset = Post.objects.filter_listing(**filters).order_by('-created_at')
+
+            paginator = get_paginator(request)
+            page = paginator.paginate_queryset(post_rows.rows(queryset), request)
+            data = post_rows.represent(page)
 
             logger.info("Posts retrieved successfully")
-            return paginator.get_paginated_response(serializer.data)
+            return set_validators(paginator.get_paginated_response(data), etag, last_modified)
+        except NotFound as nf:
+            logger.error("Pagination error: %s", nf)
+            return Response({'error': str(nf)}, status=status.HTTP_404_NOT_FOUND)
         except ValidationError as ve:
-            logger.error(f"Validation error: {str(ve)}")
+            logger.error("Validation error: %s", ve)
             return Response({'error': f'Validation error: {str(ve)}'}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}")
+            logger.error("Unexpected error: %s", e)
             return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def post(self, request):
@@ -64,51 +82,209 @@ class PostList(APIView):
 
             serializer = PostSerializer(data=request.data)
             if serializer.is_valid():
-                serializer.save(author=request.user)  # Asigna el usuario autenticado como author
-                logger.info(f"Post created successfully by user {request.user.id}")
+                with transaction.atomic():
+                    post = serializer.save(author=request.user)  # Asigna el usuario autenticado como author
+                    TimelineEntry.objects.fan_out(post)
+                logger.info("Post created successfully by user %s", request.user.id)
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         except ValidationError as ve:
-            logger.error(f"Validation error: {str(ve)}")
+            logger.error("Validation error: %s", ve)
             return Response({'error': f'Validation error: {str(ve)}'}, status=status.HTTP_400_BAD_REQUEST)
         
         except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}")
+            logger.error("Unexpected error: %s", e)
             return Response({'error': 'Internal server error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class FeedView(APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'feed'
+
+    def get(self, request):
+        try:
+            user = request.user
+            # Authors too big to fan out on write are merged in on read.
+            celebrity_ids = list(
+                user.following.filter(stats__total_followers__gt=settings.FEED_FANOUT_MAX_FOLLOWERS)
+                .values_list('pk', flat=True)
+            )
+
+            if celebrity_ids:
+                paginator = KeysetPagination()
+                timeline = TimelineEntry.objects.filter(owner=user).values('post_id')
+                queryset = Post.objects.with_nested_relations().filter(
+                    Q(pk__in=timeline) | Q(author_id__in=celebrity_ids)
+                )
+                posts = paginator.paginate_queryset(queryset, request)
+            else:
+                paginator = TimelinePagination()
+                entries = paginator.paginate_queryset(TimelineEntry.objects.filter(owner=user), request)
+                posts_by_id = Post.objects.with_nested_relations().in_bulk([entry.post_id for entry in entries])
+                posts = [posts_by_id[entry.post_id] for entry in entries if entry.post_id in posts_by_id]
+
+            serializer = PostSerializer(posts, many=True)
+            logger.info("Feed retrieved successfully")
+            return paginator.get_paginated_response(serializer.data)
+        except NotFound as nf:
+            logger.error("Pagination error: %s", nf)
+            return Response({'error': str(nf)}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error("Unexpected error: %s", e)
+            return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class PostSearch(APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'search'
+
+    def get(self, request):
+        try:
+            terms = request.query_params.get('q', '').strip()
+            if not terms:
+                return Response({'error': 'Missing search query (q)'}, status=status.HTTP_400_BAD_REQUEST)
+
+            search_type = request.query_params.get('type', 'posts')
+            if search_type == 'posts':
+                queryset = Post.objects.with_nested_relations().search(terms)
+                serializer_class = PostSerializer
+            elif search_type == 'comments':
+                queryset = Comment.objects.select_related('author').search(terms)
+                serializer_class = CommentSerializer
+            else:
+                return Response({'error': 'Invalid type, should be posts or comments'}, status=status.HTTP_400_BAD_REQUEST)
+
+            paginator = SearchPagination()
+            page = paginator.paginate_queryset(queryset, request)
+            serializer = serializer_class(page, many=True)
+            logger.info("Search completed successfully")
+            return paginator.get_paginated_response(serializer.data)
+        except NotFound as nf:
+            logger.error("Pagination error: %s", nf)
+            return Response({'error': str(nf)}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error("Unexpected error: %s", e)
+            return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class BulkPostCreate(BulkIngest):
+    kind = 'posts'
+
+
+class BulkCommentCreate(BulkIngest):
+    kind = 'comments'
+
+
+class ContentExport(APIView):
+    permission_classes = [IsAdminUser]
+    throttle_scope = 'export'
+
+    def get(self, request):
+        try:
+            kind = request.query_params.get('type', 'posts')
+            if kind not in EXPORTS:
+                return Response({'error': 'Invalid type, should be posts or comments'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                filters = parse_listing_filters(request.query_params)
+            except ValueError as err:
+                logger.error("%s", err)
+                return Response({'error': str(err)}, status=status.HTTP_400_BAD_REQUEST)
+
+            stream = iter_ndjson(export_rows(kind, **filters))
+            compress = request.query_params.get('compress') == 'gzip'
+            if compress:
+                level = (compression_levels('application/x-ndjson') or {}).get('gzip', 6)
+                stream = compress_stream(stream, 'gzip', level)
+            response = StreamingHttpResponse(stream, content_type='application/x-ndjson')
+            if compress:
+                response['Content-Encoding'] = 'gzip'
+            response['Content-Disposition'] = f'attachment; filename="{kind}.ndjson"'
+            logger.info("Streaming %s export", kind)
+            return response
+        except Exception as e:
+            logger.error("Unexpected error: %s", e)
+            return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class PostDetail(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'posts.read'
 
     def get(self, request, pk):
         try:
-            post = Post.objects.select_related('author').prefetch_related('comments__author').get(pk=pk)
-            serializer = PostSerializer(post)
-            logger.info(f"obteniendo detalles del posts #{pk}")
-            return Response(serializer.data)
+            cache_key = response_cache.payload_key('post-detail', pk)
+            entry = response_cache.get_entry(cache_key)
+            if entry is None:
+                snapshot = response_cache.versions([('post', pk)])
+                # Two queries whatever the number of comments: the post and
+                # its comment preview, with the counters of their authors.
+                post = Post.objects.select_related('author__stats').get(pk=pk)
+                post.latest_comments = list(
+                    Comment.objects.select_related('author__stats').filter(post_id=pk)
+                    .order_by('-created_at')[:LATEST_COMMENTS_LIMIT]
+                )
+                data = PostSerializer(post).data
+                deps = [('post', pk), ('user', data['author']['id'])]
+                deps += [('user', comment['author']['id']) for comment in data['comments']]
+                entry = response_cache.set(cache_key, data, deps, snapshot)
+
+            not_modified = conditional_response(request, entry['etag'], entry['last_modified'])
+            if not_modified is not None:
+                return not_modified
+            logger.info("obteniendo detalles del posts #%s", pk)
+            return set_validators(Response(entry['data']), entry['etag'], entry['last_modified'])
         except Post.DoesNotExist:
-            logger.error(f"Post not found: #{pk}")
+            logger.error("Post not found: #%s", pk)
             return Response({'error': f'Post #{pk} not found'}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}")
+            logger.error("Unexpected error: %s", e)
             return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 class CommentList(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scopes = {'GET': 'comments.read', 'POST': 'comments.write'}
 
     def get(self, request, pk):
         try:
-            post = Post.objects.prefetch_related('comments__author').get(pk=pk)
-            comments = post.comments.all()
-            serializer = CommentSerializer(comments, many=True)
-            return Response(serializer.data)
+            cache_key = response_cache.payload_key('comment-list', pk, request.query_params)
+            entry = response_cache.get_entry(cache_key)
+            if entry is not None:
+                not_modified = conditional_response(request, entry['etag'], entry['last_modified'])
+                if not_modified is not None:
+                    return not_modified
+                return set_validators(Response(entry['data']), entry['etag'], entry['last_modified'])
+            snapshot = response_cache.versions([('post', pk)])
+
+            try:
+                window = parse_window(request.query_params)
+            except ValueError as err:
+                logger.error("%s", err)
+                return Response({'error': str(err)}, status=status.HTTP_400_BAD_REQUEST)
+
+            if not Post.objects.filter(pk=pk).exists():
+                raise Post.DoesNotExist
+            # Always one page, whatever the size of the thread.
+            paginator = get_paginator(request, CommentPagination)
+            comments = Comment.objects.filter(post_id=pk).window(**window)
+            if not isinstance(paginator, KeysetPagination):
+                comments = comments.order_by('created_at', 'id')
+            page = paginator.paginate_queryset(comment_rows.rows(comments), request)
+            comments_data = comment_rows.represent(page)
+            response = paginator.get_paginated_response(comments_data)
+
+            deps = [('post', pk)] + [('user', comment['author']['id']) for comment in comments_data]
+            entry = response_cache.set(cache_key, response.data, deps, snapshot)
+            return set_validators(response, entry['etag'], entry['last_modified'])
         except Post.DoesNotExist:
-            logger.error(f"Post not found: #{pk}")
+            logger.error("Post not found: #%s", pk)
             return Response({'error': f'Post #{pk} not found'}, status=status.HTTP_404_NOT_FOUND)
+        except NotFound as nf:
+            logger.error("Pagination error: %s", nf)
+            return Response({'error': str(nf)}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}")
+            logger.error("Unexpected error: %s", e)
             return Response({'error': f'Internal server error {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def post(self, request, pk):
@@ -119,3 +295,123 @@ class CommentList(APIView):
             serializer.save(author=request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+# Async variants of the read endpoints, served instead of the views above when
+# settings.ASYNC_VIEWS is on (see the urls). Writes are inherited unchanged.
+
+class AsyncPostList(AsyncAPIView, PostList):
+
+    async def get(self, request):
+        try:
+            etag, last_modified = await response_cache.avalidators([POSTS_TABLE, COMMENTS_TABLE, USERS_TABLE], request)
+            not_modified = conditional_response(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+
+            try:
+                filters = parse_listing_filters(request.query_params)
+            except ValueError as err:
+                logger.error("%s", err)
+                return Response({'error': str(err)}, status=status.HTTP_400_BAD_REQUEST)
+
+            queryset = Post.objects.filter_listing(**filters).order_by('-created_at')
+
+            paginator = get_paginator(request)
+            page = await paginator.apaginate_queryset(post_rows.rows(queryset), request)
+            data = await sync_to_async(post_rows.represent)(page)
+
+            logger.info("Posts retrieved successfully")
+            return set_validators(paginator.get_paginated_response(data), etag, last_modified)
+        except NotFound as nf:
+            logger.error("Pagination error: %s", nf)
+            return Response({'error': str(nf)}, status=status.HTTP_404_NOT_FOUND)
+        except ValidationError as ve:
+            logger.error("Validation error: %s", ve)
+            return Response({'error': f'Validation error: {str(ve)}'}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error("Unexpected error: %s", e)
+            return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AsyncPostDetail(AsyncAPIView, PostDetail):
+
+    async def get(self, request, pk):
+        try:
+            cache_key = response_cache.payload_key('post-detail', pk)
+            entry = await response_cache.aget_entry(cache_key)
+            if entry is None:
+                snapshot = await response_cache.aversions([('post', pk)])
+                # The post and its comment preview only depend on pk.
+                post, latest_comments = await asyncio.gather(
+                    Post.objects.select_related('author__stats').aget(pk=pk),
+                    alist(
+                        Comment.objects.select_related('author__stats').filter(post_id=pk)
+                        .order_by('-created_at')[:LATEST_COMMENTS_LIMIT]
+                    ),
+                )
+                post.latest_comments = latest_comments
+                data = await aserialize(PostSerializer, post)
+                deps = [('post', pk), ('user', data['author']['id'])]
+                deps += [('user', comment['author']['id']) for comment in data['comments']]
+                entry = await response_cache.aset(cache_key, data, deps, snapshot)
+
+            not_modified = conditional_response(request, entry['etag'], entry['last_modified'])
+            if not_modified is not None:
+                return not_modified
+            logger.info("obteniendo detalles del posts #%s", pk)
+            return set_validators(Response(entry['data']), entry['etag'], entry['last_modified'])
+        except Post.DoesNotExist:
+            logger.error("Post not found: #%s", pk)
+            return Response({'error': f'Post #{pk} not found'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error("Unexpected error: %s", e)
+            return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AsyncCommentList(AsyncAPIView, CommentList):
+
+    async def get(self, request, pk):
+        try:
+            cache_key = response_cache.payload_key('comment-list', pk, request.query_params)
+            entry = await response_cache.aget_entry(cache_key)
+            if entry is not None:
+                not_modified = conditional_response(request, entry['etag'], entry['last_modified'])
+                if not_modified is not None:
+                    return not_modified
+                return set_validators(Response(entry['data']), entry['etag'], entry['last_modified'])
+            snapshot = await response_cache.aversions([('post', pk)])
+
+            try:
+                window = parse_window(request.query_params)
+            except ValueError as err:
+                logger.error("%s", err)
+                return Response({'error': str(err)}, status=status.HTTP_400_BAD_REQUEST)
+
+            # The existence check and the page only depend on pk.
+            paginator = get_paginator(request, CommentPagination)
+            comments = Comment.objects.filter(post_id=pk).window(**window)
+            if not isinstance(paginator, KeysetPagination):
+                comments = comments.order_by('created_at', 'id')
+            exists, page = await asyncio.gather(
+                Post.objects.filter(pk=pk).aexists(),
+                paginator.apaginate_queryset(comment_rows.rows(comments), request),
+            )
+            if not exists:
+                raise Post.DoesNotExist
+
+            comments_data = await sync_to_async(comment_rows.represent)(page)
+            response = paginator.get_paginated_response(comments_data)
+
+            deps = [('post', pk)] + [('user', comment['author']['id']) for comment in comments_data]
+            entry = await response_cache.aset(cache_key, response.data, deps, snapshot)
+            return set_validators(response, entry['etag'], entry['last_modified'])
+        except Post.DoesNotExist:
+            logger.error("Post not found: #%s", pk)
+            return Response({'error': f'Post #{pk} not found'}, status=status.HTTP_404_NOT_FOUND)
+        except NotFound as nf:
+            logger.error("Pagination error: %s", nf)
+            return Response({'error': str(nf)}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error("Unexpected error: %s", e)
+            return Response({'error': f'Internal server error {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,44 @@
+"""
+Bulk ingestion loader for follow edges (see ``utils.ingest``).
+
+Edges go through ``Follow.objects.follow``, one statement per follower in the
+chunk, which keeps counters, timelines and the cache in step as the API does.
+"""
+from collections import defaultdict
+
+from utils.ingest import existing_ids, positive_int
+from .models import Follow, User
+
+
+def load_follows(chunk, fan_out=True):
+    errors, candidates = [], []
+    for line, row in chunk:
+        row_errors = {}
+        follower_id = positive_int(row, 'follower_id', row_errors)
+        followed_id = positive_int(row, 'followed_id', row_errors)
+        if not row_errors and follower_id == followed_id:
+            row_errors['followed_id'] = ['Cannot follow yourself.']
+        if row_errors:
+            errors.append({'row': line, 'errors': row_errors})
+        else:
+            candidates.append((line, (follower_id, followed_id)))
+
+    users = existing_ids(User, {pk for _, edge in candidates for pk in edge})
+    followed_by = defaultdict(set)
+    for line, (follower_id, followed_id) in candidates:
+        missing = {
+            field: ['User does not exist.']
+            for field, pk in (('follower_id', follower_id), ('followed_id', followed_id))
+            if pk not in users
+        }
+        if missing:
+            errors.append({'row': line, 'errors': missing})
+        else:
+            followed_by[follower_id].add(followed_id)
+
+    # Following is idempotent: edges that already exist are skipped, not errors.
+    created = 0
+    for follower_id, followed_ids in followed_by.items():
+        edges = Follow.objects.follow(follower_id, followed_ids, backfill=fan_out)
+        created += sum(is_new for _, is_new in edges.values())
+    return created, errors
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.user.models import User, UserStats
+from utils.cache import USERS_TABLE, response_cache
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized per-user counters, or check them with --check.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report counters that drifted, without fixing them.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        check = options['check']
+        batch_size = options['batch_size']
+        fields = UserStats.objects.COUNTER_FIELDS
+        processed = drifted = 0
+
+        user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+        last_pk = 0
+        while True:
+            batch = list(user_ids.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1]
+
+            expected = UserStats.objects.compute(batch)
+            stored = {
+                row[0]: dict(zip(fields, row[1:]))
+                for row in UserStats.objects.filter(user_id__in=batch).values_list('user_id', *fields)
+            }
+            stale = [pk for pk, counts in expected.items() if stored.get(pk) != counts]
+            drifted += len(stale)
+            if check:
+                for pk in stale:
+                    self.stdout.write(f"User #{pk}: stored {stored.get(pk)}, expected {expected[pk]}")
+            else:
+                UserStats.objects.rebuild(batch, expected)
+                if stale:
+                    response_cache.invalidate(USERS_TABLE, *[('user', pk) for pk in stale])
+            processed += len(batch)
+
+        if check and drifted:
+            raise CommandError(f"{drifted} of {processed} users have stale counters.")
+        action = 'Checked' if check else 'Rebuilt'
+        self.stdout.write(self.style.SUCCESS(f"{action} counters for {processed} users ({drifted} out of date)."))
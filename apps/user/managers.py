@@ -1,6 +1,10 @@
-from django.db import models
+from django.conf import settings
+from django.db import connections, models, router
 from django.contrib.auth.models import BaseUserManager
 
+from utils.cache import USERS_TABLE, response_cache
+
+
 class UserManager(BaseUserManager):
     def create_user(self, username, email, password=None, **extra_fields):
         if not email:
@@ -26,12 +30,192 @@ class UserManager(BaseUserManager):
         return self.create_user(username, email, password, **extra_fields)
 
     def with_most_followers(self):
-        return self.get_queryset().annotate(
-            num_followers=models.Count('followers')
-        ).order_by('-num_followers')
+        return self.get_queryset().select_related('stats').annotate(
+            num_followers=models.F('stats__total_followers')
+        ).order_by(models.F('num_followers').desc(nulls_last=True))
 
     def most_active(self):
-        return self.get_queryset().annotate(
-            num_posts=models.Count('posts')
-        ).order_by('-num_posts')
+        return self.get_queryset().select_related('stats').annotate(
+            num_posts=models.F('stats__total_posts')
+        ).order_by(models.F('num_posts').desc(nulls_last=True))
+
+    def with_activity_counts(self):
+        # Joins the denormalized counters UserSerializer reports, so a whole
+        # page of users costs a fixed number of queries.
+        return self.get_queryset().select_related('stats')
+
+
+class UserStatsManager(models.Manager):
+    COUNTER_FIELDS = ('total_posts', 'total_comments', 'total_followers', 'total_following')
+
+    def for_user(self, user):
+        try:
+            return user.stats
+        except self.model.DoesNotExist:
+            self.rebuild([user.pk])
+            return self.get(user_id=user.pk)
+
+    def increment(self, user_ids, field, delta=1):
+        user_ids = list(user_ids)
+        updated = self.filter(user_id__in=user_ids).update(**{field: models.F(field) + delta})
+        # Users created before the counters existed have no row yet; their
+        # counters are built from the source tables, which already include
+        # the change being recorded.
+        if updated < len(user_ids) and delta > 0:
+            self.rebuild(user_ids)
+
+    def increment_many(self, deltas, field):
+        # One UPDATE per distinct delta rather than one per user.
+        by_delta = {}
+        for user_id, delta in deltas.items():
+            by_delta.setdefault(delta, []).append(user_id)
+        for delta, user_ids in by_delta.items():
+            self.increment(user_ids, field, delta)
+
+    def compute(self, user_ids):
+        from apps.post.models import Comment, Post
+        from .models import Follow
+
+        sources = (
+            ('total_posts', Post.objects, 'author_id'),
+            ('total_comments', Comment.objects, 'author_id'),
+            ('total_followers', Follow.objects, 'followed_id'),
+            ('total_following', Follow.objects, 'follower_id'),
+        )
+        counts = {pk: dict.fromkeys(self.COUNTER_FIELDS, 0) for pk in user_ids}
+        for field, manager, column in sources:
+            rows = manager.filter(**{f'{column}__in': user_ids}).order_by().values(column).annotate(
+                total=models.Count('pk')
+            ).values_list(column, 'total')
+            for pk, total in rows:
+                counts[pk][field] = total
+        return counts
+
+    def rebuild(self, user_ids, counts=None):
+        if counts is None:
+            counts = self.compute(user_ids)
+        self.bulk_create(
+            [self.model(user_id=pk, **values) for pk, values in counts.items()],
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=self.COUNTER_FIELDS,
+        )
+        return counts
+
+
+class FollowManager(models.Manager):
+    """
+    Follow graph operations. ``follow`` and ``unfollow`` are the write path
+    for follows, one statement each: the edges, both users' counters and the
+    follower's timeline change together through data-modifying CTEs. Edges
+    changed through the ``followers``/``following`` related managers are
+    reconciled afterwards by a signal, with a few more queries.
+    """
+
+    FOLLOW_SQL = '''
+        WITH requested AS (
+            SELECT DISTINCT unnest(%(ids)s::bigint[]) AS id
+        ), targets AS (
+            SELECT u.id, u.username FROM {users} u JOIN requested r ON r.id = u.id WHERE u.id <> %(user)s
+        ), inserted AS (
+            INSERT INTO {follows} ({followed}, {follower})
+            SELECT id, %(user)s FROM targets
+            ON CONFLICT DO NOTHING
+            RETURNING {followed} AS id
+        ), counted_followers AS (
+            UPDATE {stats} s SET total_followers = s.total_followers + 1
+            FROM inserted i WHERE s.user_id = i.id
+            RETURNING s.user_id
+        ), counted_following AS (
+            UPDATE {stats} SET total_following = total_following + (SELECT count(*) FROM inserted)
+            WHERE user_id = %(user)s AND EXISTS (SELECT 1 FROM inserted)
+            RETURNING user_id
+        ), backfilled AS (
+            INSERT INTO {timeline} (owner_id, post_id, created_at)
+            SELECT %(user)s, p.id, p.created_at FROM {posts} p
+            WHERE p.author_id IN (SELECT id FROM inserted)
+            ORDER BY p.created_at DESC
+            LIMIT %(backfill)s
+            ON CONFLICT DO NOTHING
+        )
+        SELECT t.id, t.username, i.id IS NOT NULL,
+               (SELECT count(*) FROM counted_followers), (SELECT count(*) FROM counted_following)
+        FROM targets t LEFT JOIN inserted i ON i.id = t.id
+    '''
+
+    UNFOLLOW_SQL = '''
+        WITH deleted AS (
+            DELETE FROM {follows}
+            WHERE {follower} = %(user)s AND {followed} = ANY(%(ids)s::bigint[])
+            RETURNING {followed} AS id
+        ), counted_followers AS (
+            UPDATE {stats} s SET total_followers = s.total_followers - 1
+            FROM deleted d WHERE s.user_id = d.id
+        ), counted_following AS (
+            UPDATE {stats} SET total_following = total_following - (SELECT count(*) FROM deleted)
+            WHERE user_id = %(user)s AND EXISTS (SELECT 1 FROM deleted)
+        ), unfed AS (
+            DELETE FROM {timeline} t USING {posts} p
+            WHERE t.owner_id = %(user)s AND p.id = t.post_id AND p.author_id IN (SELECT id FROM deleted)
+        )
+        SELECT id FROM deleted
+    '''
+
+    def _execute(self, sql, params):
+        from apps.post.models import Post, TimelineEntry
+        from .models import UserStats
+
+        names = {
+            'users': self.model._meta.get_field('followed').related_model._meta.db_table,
+            'follows': self.model._meta.db_table,
+            'followed': self.model._meta.get_field('followed').column,
+            'follower': self.model._meta.get_field('follower').column,
+            'stats': UserStats._meta.db_table,
+            'timeline': TimelineEntry._meta.db_table,
+            'posts': Post._meta.db_table,
+        }
+        with connections[router.db_for_write(self.model)].cursor() as cursor:
+            cursor.execute(sql.format(**names), params)
+            return cursor.fetchall()
+
+    def follow(self, user_id, user_ids, backfill=True):
+        """
+        Makes ``user_id`` follow ``user_ids``, skipping edges that exist.
+        Returns ``{followed id: (username, created)}`` for the ids that are
+        users other than ``user_id``. With ``backfill=False`` the follower's
+        timeline is left as it is.
+        """
+        from .models import UserStats
+
+        rows = self._execute(self.FOLLOW_SQL, {
+            'user': user_id, 'ids': list(user_ids),
+            'backfill': settings.FEED_TIMELINE_MAX_LENGTH if backfill else 0,
+        })
+        created = [pk for pk, _, is_new, _, _ in rows if is_new]
+        if created:
+            counted_followers, counted_following = rows[0][3:]
+            # Users created before the counters existed have no row yet.
+            if counted_followers < len(created) or not counted_following:
+                UserStats.objects.rebuild([user_id, *created])
+            response_cache.invalidate(USERS_TABLE, *[('user', pk) for pk in (user_id, *created)])
+        return {pk: (username, is_new) for pk, username, is_new, _, _ in rows}
+
+    def unfollow(self, user_id, user_ids):
+        """Removes the edges from ``user_id`` to ``user_ids``; returns the ids that were followed."""
+        deleted = [pk for pk, in self._execute(self.UNFOLLOW_SQL, {'user': user_id, 'ids': list(user_ids)})]
+        if deleted:
+            response_cache.invalidate(USERS_TABLE, *[('user', pk) for pk in (user_id, *deleted)])
+        return deleted
+
+    def relationships(self, user_id, user_ids):
+        """``{id: {'following': bool, 'followed_by': bool}}`` for the ids of ``user_ids`` that are users."""
+        users = self.model._meta.get_field('followed').related_model
+        rows = users.objects.filter(pk__in=user_ids).annotate(
+            is_following=models.Exists(self.filter(follower_id=user_id, followed_id=models.OuterRef('pk'))),
+            is_followed_by=models.Exists(self.filter(followed_id=user_id, follower_id=models.OuterRef('pk'))),
+        ).values_list('pk', 'is_following', 'is_followed_by')
+        return {pk: {'following': following, 'followed_by': followed_by} for pk, following, followed_by in rows}
 
+    def mutual_followers(self, user_id, other_id):
+        """Edges to ``user_id`` from users who also follow ``other_id``."""
+        return self.filter(followed_id=user_id, follower_id__in=self.filter(followed_id=other_id).values('follower_id'))
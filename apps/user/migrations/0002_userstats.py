@@ -0,0 +1,41 @@
+# Generated by Django 4.2.16 on 2026-10-18 08:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0001_initial'),
+        ('post', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_posts', models.IntegerField(default=0)),
+                ('total_comments', models.IntegerField(default=0)),
+                ('total_followers', models.IntegerField(default=0)),
+                ('total_following', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-total_followers'], name='user_userst_total_f_451656_idx'), models.Index(fields=['-total_posts'], name='user_userst_total_p_9088e2_idx')],
+            },
+        ),
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO user_userstats (user_id, total_posts, total_comments, total_followers, total_following)
+                SELECT u.id,
+                       (SELECT COUNT(*) FROM post_post p WHERE p.author_id = u.id),
+                       (SELECT COUNT(*) FROM post_comment c WHERE c.author_id = u.id),
+                       (SELECT COUNT(*) FROM user_user_followers f WHERE f.from_user_id = u.id),
+                       (SELECT COUNT(*) FROM user_user_followers f WHERE f.to_user_id = u.id)
+                FROM user_user u
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
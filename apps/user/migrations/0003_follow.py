@@ -0,0 +1,46 @@
+# Generated by Django 4.2.16 on 2026-10-18 08:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0002_userstats'),
+    ]
+
+    operations = [
+        # User.followers gets an explicit through model mapped onto the table
+        # Django already created for it, so only the state changes here.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='Follow',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('followed', models.ForeignKey(db_column='from_user_id', on_delete=django.db.models.deletion.CASCADE, related_name='follower_edges', to=settings.AUTH_USER_MODEL)),
+                        ('follower', models.ForeignKey(db_column='to_user_id', on_delete=django.db.models.deletion.CASCADE, related_name='following_edges', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'user_user_followers',
+                        'unique_together': {('followed', 'follower')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='user',
+                    name='followers',
+                    field=models.ManyToManyField(blank=True, related_name='following', through='user.Follow', through_fields=('followed', 'follower'), to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['followed', '-id'], name='user_follow_followed_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['follower', '-id'], name='user_follow_follower_id_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0003_follow'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='follow',
+            name='followed',
+            field=models.ForeignKey(db_column='from_user_id', db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='follower_edges', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='follow',
+            name='follower',
+            field=models.ForeignKey(db_column='to_user_id', db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='following_edges', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0004_index_review'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('follower', 'followed'), name='user_follow_follower_followed_uniq'),
+        ),
+    ]
@@ -1,12 +1,72 @@
 from django.contrib.auth.models import AbstractUser, PermissionsMixin
 from django.db import models
-from .managers import UserManager
+from .managers import FollowManager, UserManager, UserStatsManager
 
 
 class User(AbstractUser, PermissionsMixin):
-    followers = models.ManyToManyField('self', symmetrical=False, related_name='following', blank=True)
+    followers = models.ManyToManyField(
+        'self',
+        through='Follow',
+        through_fields=('followed', 'follower'),
+        symmetrical=False,
+        related_name='following',
+        blank=True,
+    )
 
     objects = UserManager() 
 
     def __str__(self):
         return self.username
+
+
+class Follow(models.Model):
+    # Edge `follower -> followed`. Lives on the table Django originally
+    # created for User.followers, hence the column names.
+    # Both columns lead one of the indexes below.
+    followed = models.ForeignKey(
+        User, on_delete=models.CASCADE, db_column='from_user_id', related_name='follower_edges', db_index=False
+    )
+    follower = models.ForeignKey(
+        User, on_delete=models.CASCADE, db_column='to_user_id', related_name='following_edges', db_index=False
+    )
+
+    objects = FollowManager()
+
+    class Meta:
+        db_table = 'user_user_followers'
+        # One unique index per direction: "who of these follow me" and
+        # "which of these do I follow" (Follow.objects.relationships) are
+        # both index-only lookups.
+        unique_together = [('followed', 'follower')]
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'followed'], name='user_follow_follower_followed_uniq'),
+        ]
+        indexes = [
+            # Keyset pagination of /users/<pk>/followers/ and /following/.
+            models.Index(fields=['followed', '-id'], name='user_follow_followed_id_idx'),
+            models.Index(fields=['follower', '-id'], name='user_follow_follower_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"User #{self.follower_id} follows user #{self.followed_id}"
+
+
+class UserStats(models.Model):
+    # Denormalized counters, kept up to date by apps.user.signals and
+    # verifiable/rebuildable with `manage.py rebuild_user_stats`.
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    total_posts = models.IntegerField(default=0)
+    total_comments = models.IntegerField(default=0)
+    total_followers = models.IntegerField(default=0)
+    total_following = models.IntegerField(default=0)
+
+    objects = UserStatsManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-total_followers']),
+            models.Index(fields=['-total_posts']),
+        ]
+
+    def __str__(self):
+        return f"Stats for user #{self.user_id}"
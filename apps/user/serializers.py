@@ -1,8 +1,8 @@
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
 from rest_framework import serializers
-from .models import User
-from apps.post.models import Post, Comment
+from .models import User, UserStats
 
 
 class UserDetailSerializer(serializers.ModelSerializer):
@@ -14,25 +14,25 @@ class UserDetailSerializer(serializers.ModelSerializer):
 class UserSerializer(serializers.ModelSerializer):
     total_posts = serializers.SerializerMethodField()
     total_comments = serializers.SerializerMethodField()
-    followers = UserDetailSerializer(many=True, read_only=True)
-    following = UserDetailSerializer(many=True, read_only=True)
+    total_followers = serializers.SerializerMethodField()
+    total_following = serializers.SerializerMethodField()
     password = serializers.CharField(write_only=True)
 
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'total_posts', 'total_comments', 'followers', 'following', 'password']
+        fields = ['id', 'username', 'email', 'total_posts', 'total_comments', 'total_followers', 'total_following', 'password']
 
     def get_total_posts(self, obj):
-        return Post.objects.filter(author=obj).count()
+        return UserStats.objects.for_user(obj).total_posts
 
     def get_total_comments(self, obj):
-        return Comment.objects.filter(author=obj).count()
+        return UserStats.objects.for_user(obj).total_comments
 
-    def get_followers(self, obj):
-        return UserDetailSerializer(obj.followers.all(), many=True).data
+    def get_total_followers(self, obj):
+        return UserStats.objects.for_user(obj).total_followers
 
-    def get_following(self, obj):
-        return UserDetailSerializer(obj.following.all(), many=True).data
+    def get_total_following(self, obj):
+        return UserStats.objects.for_user(obj).total_following
     
     def validate_email(self, value):
         try:
@@ -56,8 +56,41 @@ class UserSerializer(serializers.ModelSerializer):
         except Exception as e:
             raise serializers.ValidationError({"error": str(e)})
 
-  
+
+
+class UserSummaryRows:
+    """
+    Read-only fast path for UserSerializer's output, built from the columns
+    of ``values_list`` rows (those under ``path`` when users are reached
+    through a relation, e.g. ``'author'``) rather than from model instances.
+    """
+    keys = ('id', 'username', 'email', *UserStats.objects.COUNTER_FIELDS)
+
+    def __init__(self, path=None):
+        prefix = f'{path}__' if path else ''
+        self.columns = (
+            f'{prefix}id', f'{prefix}username', f'{prefix}email',
+            *(f'{prefix}stats__{field}' for field in UserStats.objects.COUNTER_FIELDS),
+        )
+
+    def represent(self, rows, offset=0):
+        """The payload of the user in each row, read from the columns starting at ``offset``."""
+        end = offset + len(self.columns)
+        values = [row[offset:end] for row in rows]
+        # Users without a counters row get one, as UserStats.for_user does.
+        missing = sorted({value[0] for value in values if value[3] is None})
+        counts = UserStats.objects.rebuild(missing) if missing else {}
+        keys = self.keys
+        return [
+            dict(zip(keys, value)) if value[3] is not None
+            else dict(zip(keys, (*value[:3], *counts[value[0]].values())))
+            for value in values
+        ]
+
+
 class FollowSerializer(serializers.Serializer):
+    # Whether the user exists, and whether it is already followed, is left
+    # to Follow.objects.follow, in the same query as the insert.
     follow_id = serializers.IntegerField()
 
     def validate_follow_id(self, value):
@@ -67,17 +100,16 @@ class FollowSerializer(serializers.Serializer):
             raise serializers.ValidationError("Cannot follow yourself.")        
         if value <= 0:
             raise serializers.ValidationError("Invalid follow_id. It must be a positive integer.")        
-        if not User.objects.filter(id=value).exists():
-            raise serializers.ValidationError("User with this follow_id does not exist.")
         
         return value
 
-    def validate(self, data):
-        request = self.context['request']
-        follow_id = data.get('follow_id')
-        user = request.user
-        
-        if user.following.filter(id=follow_id).exists():
-            raise serializers.ValidationError("Not Allowed.")
-        
-        return data
+
+class FollowBatchSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+
+    def validate_ids(self, value):
+        if len(value) > settings.FOLLOW_BATCH_MAX_IDS:
+            raise serializers.ValidationError(f"At most {settings.FOLLOW_BATCH_MAX_IDS} ids.")
+        if self.context['request'].user.id in value:
+            raise serializers.ValidationError("Cannot follow yourself.")
+        return list(dict.fromkeys(value))
@@ -0,0 +1,97 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.db import models
+from django.dispatch import receiver
+
+from utils.authentication import forget_user
+from utils.cache import USERS_TABLE, response_cache
+from .models import User, UserStats
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user_id=instance.pk)
+
+
+@receiver(pre_delete, sender=User)
+def remember_follow_edges(sender, instance, **kwargs):
+    # Deleting a user drops its follow rows without m2m_changed.
+    instance._follow_edge_ids = list(
+        sender.objects.filter(models.Q(followers=instance) | models.Q(following=instance))
+        .values_list('pk', flat=True)
+        .distinct()
+    )
+
+
+@receiver(post_delete, sender=User)
+def recount_follow_edges(sender, instance, **kwargs):
+    user_ids = instance.__dict__.pop('_follow_edge_ids', [])
+    if user_ids:
+        UserStats.objects.rebuild(user_ids)
+        response_cache.invalidate(USERS_TABLE, *[('user', pk) for pk in user_ids])
+
+
+@receiver(post_save, sender='post.Post')
+@receiver(post_save, sender='post.Comment')
+def count_created_content(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        field = 'total_posts' if sender._meta.model_name == 'post' else 'total_comments'
+        UserStats.objects.increment([instance.author_id], field)
+
+
+@receiver(post_delete, sender='post.Post')
+@receiver(post_delete, sender='post.Comment')
+def count_deleted_content(sender, instance, **kwargs):
+    field = 'total_posts' if sender._meta.model_name == 'post' else 'total_comments'
+    UserStats.objects.increment([instance.author_id], field, -1)
+
+
+@receiver(m2m_changed, sender=User.followers.through)
+def reconcile_follows(sender, instance, action, reverse, pk_set, **kwargs):
+    # Follow.objects.follow/unfollow are the write path for follows. Edges
+    # changed through ``followers``/``following`` are reconciled here once
+    # written: counters, timelines and cached responses. ``reverse`` means
+    # the edges were changed through ``following``, i.e. ``instance`` is the
+    # follower.
+    from apps.post.models import TimelineEntry
+
+    if action == 'pre_clear':
+        related = instance.following if reverse else instance.followers
+        instance._cleared_follow_ids = list(related.values_list('pk', flat=True))
+        return
+    if action == 'post_clear':
+        pk_set = instance.__dict__.pop('_cleared_follow_ids', [])
+    if action not in ('post_add', 'post_remove', 'post_clear') or not pk_set:
+        return
+
+    edges = _follow_edges(instance, reverse, pk_set)
+    if action == 'post_add':
+        # pk_set only holds the edges that were inserted.
+        if reverse:
+            followers, followed = [instance.pk], list(pk_set)
+        else:
+            followers, followed = list(pk_set), [instance.pk]
+        UserStats.objects.increment(followed, 'total_followers', len(followers))
+        UserStats.objects.increment(followers, 'total_following', len(followed))
+        for follower, authors in edges.items():
+            TimelineEntry.objects.backfill(follower, authors)
+    else:
+        # pk_set of post_remove also holds edges that did not exist, so recount.
+        UserStats.objects.rebuild([instance.pk, *pk_set])
+        for follower, authors in edges.items():
+            TimelineEntry.objects.unfeed(follower, authors)
+    response_cache.invalidate(USERS_TABLE, *[('user', pk) for pk in (instance.pk, *pk_set)])
+
+
+def _follow_edges(instance, reverse, pks):
+    # {follower id: [followed ids]}
+    if reverse:
+        return {instance.pk: list(pks)}
+    return {pk: [instance.pk] for pk in pks}
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user(sender, instance, **kwargs):
+    response_cache.invalidate(('user', instance.pk), USERS_TABLE)
+    forget_user(instance.pk)
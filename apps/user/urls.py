@@ -1,8 +1,29 @@
+from django.conf import settings
 from django.urls import path
-from .views import FollowUser, UserList, UserDetail
+from .views import (
+    AsyncUserDetail,
+    BulkFollowCreate,
+    FollowBatch,
+    FollowUser,
+    MutualFollowers,
+    UserDetail,
+    UserFollowers,
+    UserFollowing,
+    UserList,
+    UserRelationships,
+)
+
+if settings.ASYNC_VIEWS:
+    UserDetail = AsyncUserDetail
 
 urlpatterns = [
     path('', UserList.as_view(), name='user-list'),
     path('<int:pk>/', UserDetail.as_view(), name='user-detail'),
+    path('<int:pk>/followers/', UserFollowers.as_view(), name='user-followers'),
+    path('<int:pk>/followers/mutual/', MutualFollowers.as_view(), name='user-mutual-followers'),
+    path('<int:pk>/following/', UserFollowing.as_view(), name='user-following'),
+    path('relationships/', UserRelationships.as_view(), name='user-relationships'),
     path('<int:user_id>/follow/<int:follow_id>/', FollowUser.as_view(), name='follow-user'),
+    path('follows/', FollowBatch.as_view(), name='follow-batch'),
+    path('follows/bulk/', BulkFollowCreate.as_view(), name='follow-bulk'),
 ]
\ No newline at end of file
@@ -1,23 +1,35 @@
 import logging
+from django.conf import settings
 from rest_framework import (
     status,
 )
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from utils.pagination import SmallSetPagination
+from utils.cache import (
+    COMMENTS_TABLE,
+    POSTS_TABLE,
+    USERS_TABLE,
+    conditional_response,
+    response_cache,
+    set_validators,
+)
+from utils.pagination import FollowPagination, SmallSetPagination
 from utils.permissions import IsAuthenticated
-from .models import User
+from utils.views import AsyncAPIView, BulkIngest, aserialize
+from .models import Follow, User
 from .serializers import (
+    FollowBatchSerializer,
     FollowSerializer,
+    UserDetailSerializer,
     UserSerializer,
 )
- 
-from apps.user import serializers
 
 logger = logging.getLogger(__name__)
 
 
 class UserList(APIView):
+    throttle_scopes = {'GET': 'users.read', 'POST': 'users.write'}
 
     def get(self, request):
 
@@ -25,14 +37,20 @@ class UserList(APIView):
             return Response({'error': 'Authentication required'}, status=status.HTTP_403_FORBIDDEN)
 
         try:
+            # Listed users embed their post/comment counters.
+            etag, last_modified = response_cache.validators([USERS_TABLE, POSTS_TABLE, COMMENTS_TABLE], request)
+            not_modified = conditional_response(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+
             paginator = SmallSetPagination()
-            users = User.objects.all()
+            users = User.objects.with_activity_counts().order_by('id')
             paginated_users = paginator.paginate_queryset(users, request)
             serializer = UserSerializer(paginated_users, many=True)
             logger.info("Obtención OK de usuarios")
-            return paginator.get_paginated_response(serializer.data)
+            return set_validators(paginator.get_paginated_response(serializer.data), etag, last_modified)
         except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}")
+            logger.error("Unexpected error: %s", e)
             return Response({'error': 'Internal server error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def post(self, request):
@@ -47,48 +65,199 @@ class UserList(APIView):
 
 class UserDetail(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'users.read'
 
     def get(self, request, pk):
         try:
-            user = User.objects.get(pk=pk)
-            serializer = UserSerializer(user)
-            logger.info("sucess getting user %s", user.id)
-            return Response(serializer.data)
+            cache_key = response_cache.payload_key('user-detail', pk)
+            entry = response_cache.get_entry(cache_key)
+            if entry is None:
+                snapshot = response_cache.versions([('user', pk)])
+                user = User.objects.with_activity_counts().get(pk=pk)
+                data = UserSerializer(user).data
+                entry = response_cache.set(cache_key, data, [('user', pk)], snapshot)
+
+            not_modified = conditional_response(request, entry['etag'], entry['last_modified'])
+            if not_modified is not None:
+                return not_modified
+            logger.info("sucess getting user %s", pk)
+            return set_validators(Response(entry['data']), entry['etag'], entry['last_modified'])
         except User.DoesNotExist:
             logger.error("User %s not found", pk)
             return Response({'error': f'User {pk} not found'}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}")
+            logger.error("Unexpected error: %s", e)
             return Response({'error': 'Internal server error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class FollowEdgeList(APIView):
+    """
+    Keyset-paginated list of the users on one side of ``pk``'s follow edges,
+    most recent edge first.
+    """
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'users.read'
+    user_field = None
+    related_field = None
+
+    def get(self, request, pk):
+        try:
+            if not User.objects.filter(pk=pk).exists():
+                logger.error("User %s not found", pk)
+                return Response({'error': f'User {pk} not found'}, status=status.HTTP_404_NOT_FOUND)
+
+            edges = self.get_edges(request, pk).select_related(self.related_field).only(
+                'id', f'{self.user_field}_id', f'{self.related_field}__id', f'{self.related_field}__username'
+            )
+            paginator = FollowPagination()
+            page = paginator.paginate_queryset(edges, request)
+            serializer = UserDetailSerializer([getattr(edge, self.related_field) for edge in page], many=True)
+            return paginator.get_paginated_response(serializer.data)
+        except NotFound as e:
+            return Response({'error': str(e.detail)}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error("Unexpected error: %s", e)
+            return Response({'error': 'Internal server error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def get_edges(self, request, pk):
+        return Follow.objects.filter(**{f'{self.user_field}_id': pk})
+
+
+class UserFollowers(FollowEdgeList):
+    user_field = 'followed'
+    related_field = 'follower'
+
+
+class MutualFollowers(FollowEdgeList):
+    # Followers of ``pk`` who also follow the requesting user.
+    user_field = 'followed'
+    related_field = 'follower'
+
+    def get_edges(self, request, pk):
+        return Follow.objects.mutual_followers(pk, request.user.pk)
+
+
+class UserFollowing(FollowEdgeList):
+    user_field = 'follower'
+    related_field = 'followed'
+
+
 class FollowUser(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'follows.write'
 
     def post(self, request, user_id, follow_id):
         try:
-            logger.info(f"Request to follow user: {user_id} following {follow_id}")
+            logger.info("Request to follow user: %s following %s", user_id, follow_id)
 
             serializer = FollowSerializer(data={'follow_id': follow_id}, context={'request': request})
             serializer.is_valid(raise_exception=True)
             
             follow_id = serializer.validated_data['follow_id']
-            user_to_follow = User.objects.get(id=follow_id)
-            
-            request.user.following.add(user_to_follow)
-            request.user.save()
+            # Idempotent: following a user again is not an error.
+            followed = Follow.objects.follow(request.user.pk, [follow_id])
+            if follow_id not in followed:
+                logger.error("User not found: follow_id=%s", follow_id)
+                return Response({'error': 'User not found.'}, status=status.HTTP_404_NOT_FOUND)
             
-            logger.info(f"User {request.user.id} successfully followed user {follow_id}")
-            return Response({'success': f'Now following user {user_to_follow.username}'}, status=status.HTTP_200_OK)
+            username, _ = followed[follow_id]
+            logger.info("User %s successfully followed user %s", request.user.id, follow_id)
+            return Response({'success': f'Now following user {username}'}, status=status.HTTP_200_OK)
         
-        except serializers.ValidationError as e:
-            logger.error(f"Validation error: {str(e)}")
-            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
-        
-        except User.DoesNotExist:
-            logger.error(f"User not found: follow_id={follow_id}")
-            return Response({'error': 'User not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except ValidationError as e:
+            logger.error("Validation error: %s", e.detail)
+            return Response({'error': e.detail}, status=status.HTTP_400_BAD_REQUEST)
         
         except Exception as e:
-            logger.error(f"Internal server error: {str(e)}")
+            logger.error("Internal server error: %s", e)
             return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def delete(self, request, user_id, follow_id):
+        try:
+            logger.info("Request to unfollow user: %s unfollowing %s", user_id, follow_id)
+            # Idempotent too: unfollowing a user who isn't followed changes nothing.
+            Follow.objects.unfollow(request.user.pk, [follow_id])
+            logger.info("User %s unfollowed user %s", request.user.id, follow_id)
+            return Response({'success': f'No longer following user {follow_id}'}, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error("Internal server error: %s", e)
+            return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class FollowBatch(APIView):
+    """Follows up to FOLLOW_BATCH_MAX_IDS users at once: ``{"ids": [...]}``."""
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'follows.write'
+
+    def post(self, request):
+        try:
+            serializer = FollowBatchSerializer(data=request.data, context={'request': request})
+            if not serializer.is_valid():
+                logger.error("Validation error: %s", serializer.errors)
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+            ids = serializer.validated_data['ids']
+            followed = Follow.objects.follow(request.user.pk, ids)
+            logger.info("User %s followed %s users", request.user.id, len(followed))
+            return Response({
+                'followed': [pk for pk in ids if pk in followed and followed[pk][1]],
+                'already_following': [pk for pk in ids if pk in followed and not followed[pk][1]],
+                'not_found': [pk for pk in ids if pk not in followed],
+            }, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error("Internal server error: %s", e)
+            return Response({'error': 'Internal server error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class UserRelationships(APIView):
+    """Whether the requesting user follows, and is followed by, each user in ``?ids=1,2,3``."""
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'users.read'
+
+    def get(self, request):
+        try:
+            try:
+                ids = [int(pk) for pk in request.query_params.get('ids', '').split(',') if pk]
+            except ValueError:
+                ids = None
+            if not ids or min(ids) < 1 or len(ids) > settings.FOLLOW_BATCH_MAX_IDS:
+                message = f'ids should be 1 to {settings.FOLLOW_BATCH_MAX_IDS} comma-separated user IDs'
+                logger.error("%s", message)
+                return Response({'error': message}, status=status.HTTP_400_BAD_REQUEST)
+
+            relationships = Follow.objects.relationships(request.user.pk, ids)
+            results = [{'id': pk, **relationships[pk]} for pk in dict.fromkeys(ids) if pk in relationships]
+            return Response({'results': results}, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error("Unexpected error: %s", e)
+            return Response({'error': 'Internal server error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class BulkFollowCreate(BulkIngest):
+    kind = 'follows'
+
+
+class AsyncUserDetail(AsyncAPIView, UserDetail):
+    # Served instead of UserDetail when settings.ASYNC_VIEWS is on.
+
+    async def get(self, request, pk):
+        try:
+            cache_key = response_cache.payload_key('user-detail', pk)
+            entry = await response_cache.aget_entry(cache_key)
+            if entry is None:
+                snapshot = await response_cache.aversions([('user', pk)])
+                user = await User.objects.select_related('stats').aget(pk=pk)
+                data = await aserialize(UserSerializer, user)
+                entry = await response_cache.aset(cache_key, data, [('user', pk)], snapshot)
+
+            not_modified = conditional_response(request, entry['etag'], entry['last_modified'])
+            if not_modified is not None:
+                return not_modified
+            logger.info("sucess getting user %s", pk)
+            return set_validators(Response(entry['data']), entry['etag'], entry['last_modified'])
+        except User.DoesNotExist:
+            logger.error("User %s not found", pk)
+            return Response({'error': f'User {pk} not found'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error("Unexpected error: %s", e)
+            return Response({'error': 'Internal server error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
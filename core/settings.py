@@ -52,6 +52,10 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'utils.log.RequestIDMiddleware',
+    'utils.metrics.RequestMetricsMiddleware',
+    'utils.db.ReplicaMiddleware',
+    'utils.compression.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -112,21 +116,124 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT'),
+        # Seconds a connection is reused across requests (0 closes it after
+        # every request). Health checks drop connections the server or a
+        # pooler closed in the meantime instead of failing the next query.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0)),
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
     }
 }
 
 if 'test' in sys.argv:
     DATABASES['default']['NAME'] = os.getenv('DB_TEST_NAME', 'project_docker_two_test') 
 
+# Read replicas (utils/db.py): comma-separated "host[:port][/name]" entries in
+# DB_REPLICAS, added as replica1, replica2, ... with the primary's credentials.
+for index, address in enumerate(filter(None, os.getenv('DB_REPLICAS', '').split(',')), 1):
+    location, _, name = address.strip().partition('/')
+    host, _, port = location.partition(':')
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'NAME': name or DATABASES['default']['NAME'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['utils.db.ReplicaRouter']
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# Safe-method requests under these paths read from a replica
+REPLICA_PATHS = ['/api/']
+# Seconds a replica may be behind before reads fall back to the primary
+REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', 2))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_LAG_CHECK_INTERVAL', 1))
+# Seconds a user's reads stay on the primary after they write
+REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', 5))
+
+# Response compression (utils/compression.py)
+COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True') == 'True'
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+# Preference on equal Accept-Encoding q-values; br and zstd need the brotli
+# and zstandard packages.
+COMPRESSION_ENCODINGS = os.getenv('COMPRESSION_ENCODINGS', 'br,zstd,gzip').split(',')
+# Compressed media types (by prefix) and their level per encoding. HTML is
+# left out: admin pages carry CSRF tokens (BREACH).
+COMPRESSION_LEVELS = {
+    'application/json': {'br': 4, 'zstd': 3, 'gzip': 6},
+    # Streamed exports: favour speed, they are compressed as they are read.
+    'application/x-ndjson': {'br': 1, 'zstd': 1, 'gzip': 1},
+    'text/plain': {'br': 4, 'zstd': 3, 'gzip': 6},
+}
+
+# Cache
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (e.g. django.core.cache.backends.redis.RedisCache) in production.
+# gunicorn.conf.py refuses to start several workers on a local memory cache.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'chaindots'),
+    }
+}
+
+# Serialized payloads of PostDetail, CommentList and UserDetail (utils/cache.py)
+RESPONSE_CACHE_ALIAS = os.getenv('RESPONSE_CACHE_ALIAS', 'default')
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300))
+
+# JSON for the API: 'orjson' (utils/renderers.py, same bytes as DRF's and
+# DRF's own classes when orjson isn't installed) or 'json' (DRF's)
+API_JSON = os.getenv('API_JSON', 'orjson')
+JSON_RENDERERS = {
+    'orjson': ('utils.renderers.ORJSONRenderer', 'utils.renderers.ORJSONParser'),
+    'json': ('rest_framework.renderers.JSONRenderer', 'rest_framework.parsers.JSONParser'),
+}
+
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        JSON_RENDERERS[API_JSON][0],
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        JSON_RENDERERS[API_JSON][1],
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'utils.authentication.JWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_PAGINATION_CLASS': 'utils.pagination.SmallSetPagination',
+    'DEFAULT_THROTTLE_CLASSES': [
+        'utils.throttling.TokenBucketThrottle',
+    ],
+}
+
+# Token-bucket rate limits per view scope and client (utils/throttling.py).
+# THROTTLE_RATES=posts.write=10/min,search=30/min overrides single scopes.
+THROTTLE_ENABLED = os.getenv('THROTTLE_ENABLED', 'True') == 'True'
+# 'memory' (per process) or 'cache' (THROTTLE_CACHE_ALIAS, shared when the
+# cache is, e.g. Redis)
+THROTTLE_STORE = os.getenv('THROTTLE_STORE', 'cache')
+THROTTLE_CACHE_ALIAS = os.getenv('THROTTLE_CACHE_ALIAS', 'default')
+THROTTLE_RATES = {
+    'posts.read': '300/min',
+    'posts.write': '30/min',
+    'comments.read': '300/min',
+    'comments.write': '60/min',
+    'feed': '120/min',
+    'search': '60/min',
+    'users.read': '300/min',
+    'users.write': '20/hour',
+    'follows.write': '60/min',
+    'bulk': '30/min',
+    'export': '10/min',
 }
+THROTTLE_RATES.update(
+    (scope.strip(), rate.strip())
+    for scope, _, rate in (item.partition('=') for item in os.getenv('THROTTLE_RATES', '').split(',') if item)
+)
 
 #Simple JWT
 SIMPLE_JWT = {
@@ -148,6 +255,39 @@ SIMPLE_JWT = {
 
 AUTH_USER_MODEL = 'user.User'
 
+# /metrics (utils/metrics.py): staff users and these client addresses only
+# (REMOTE_ADDR, i.e. the proxy's address when there is one in front)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_ALLOWED_IPS = [address for address in os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if address]
+
+# Requests over either budget are logged by utils.metrics.RequestMetricsMiddleware
+REQUEST_QUERY_BUDGET = int(os.getenv('REQUEST_QUERY_BUDGET', 30))
+REQUEST_LATENCY_BUDGET_MS = int(os.getenv('REQUEST_LATENCY_BUDGET_MS', 500))
+
+# Users resolved from JWTs are cached this long (utils/authentication.py);
+# saving or deleting a user drops its entry.
+AUTH_USER_CACHE_ALIAS = os.getenv('AUTH_USER_CACHE_ALIAS', 'default')
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_CACHE_TIMEOUT', 60))
+
+# Text search configuration used for Post/Comment search vectors
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', 'spanish')
+
+# Serve the async variants of PostList, PostDetail, CommentList and UserDetail
+# (only worth it under ASGI, see gunicorn.conf.py)
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+
+# Home feed (/api/posts/feed/)
+FEED_TIMELINE_MAX_LENGTH = int(os.getenv('FEED_TIMELINE_MAX_LENGTH', 800))
+FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv('FEED_FANOUT_MAX_FOLLOWERS', 10000))
+
+# Most user IDs in one batch follow or relationships lookup
+FOLLOW_BATCH_MAX_IDS = int(os.getenv('FOLLOW_BATCH_MAX_IDS', 100))
+
+# Partition posts and comments by month of created_at (apps/post/partitions.py),
+# keeping partitions created this many months ahead
+CONTENT_PARTITIONING = os.getenv('CONTENT_PARTITIONING', 'False') == 'True'
+CONTENT_PARTITIONS_AHEAD = int(os.getenv('CONTENT_PARTITIONS_AHEAD', 3))
+
 log_level = "INFO"
 
 console_log_level = "INFO"
@@ -156,6 +296,22 @@ LOG_DIR = os.path.join(BASE_DIR, 'logs')
 if not os.path.exists(LOG_DIR):
     os.makedirs(LOG_DIR)
 
+# Loggers write to a queue drained by a background thread (utils.log); set
+# LOG_QUEUE=False to write synchronously from the request thread instead.
+LOGGING_CONFIG = 'utils.log.configure_logging'
+LOG_QUEUE = os.getenv('LOG_QUEUE', 'True') == 'True'
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+# 'json' (one object per line, with the request ID) or 'verbose'
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+# Fraction of INFO records kept per logger, e.g. "apps.post.views=0.1,apps.user.views=0.1"
+LOG_SAMPLE_RATES = {
+    name.strip(): float(rate)
+    for name, _, rate in (item.partition('=') for item in os.getenv('LOG_SAMPLE_RATES', '').split(',') if item)
+}
+
+LOG_FILTERS = ['request_id', 'sampling']
+LOG_HANDLERS = ['queue'] if LOG_QUEUE else ['console', 'file_handler']
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -168,12 +324,25 @@ LOGGING = {
             'format': '{levelname} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'utils.log.JSONFormatter',
+        },
+    },
+    'filters': {
+        'request_id': {
+            '()': 'utils.log.RequestIDFilter',
+        },
+        'sampling': {
+            '()': 'utils.log.SamplingFilter',
+            'rates': LOG_SAMPLE_RATES,
+        },
     },
     'handlers': {
         'console': {
             'level': 'INFO',
             'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
+            'formatter': LOG_FORMAT,
+            'filters': ['request_id'] if LOG_QUEUE else LOG_FILTERS,
         },
         'file_handler': {
             'level': 'INFO',
@@ -182,12 +351,19 @@ LOGGING = {
             'when': 'midnight',
             'interval': 1,
             'backupCount': 7,
-            'formatter': 'verbose',
+            'formatter': LOG_FORMAT,
+            'filters': ['request_id'] if LOG_QUEUE else LOG_FILTERS,
+        },
+        'queue': {
+            '()': 'utils.log.QueueHandler',
+            'handlers': ['console', 'file_handler'],
+            'queue_size': LOG_QUEUE_SIZE,
+            'filters': LOG_FILTERS,
         },
     },
     'loggers': {
         'django': {
-            'handlers': ['console', 'file_handler'],
+            'handlers': LOG_HANDLERS,
             'level': 'INFO',
             'propagate': True,
         },
@@ -197,12 +373,17 @@ LOGGING = {
             'propagate': False,
         },
         'apps.user': {
-            'handlers': ['console', 'file_handler'],
+            'handlers': LOG_HANDLERS,
             'level': 'INFO',
             'propagate': False,
         },
         'apps.post': {
-            'handlers': ['console', 'file_handler'],
+            'handlers': LOG_HANDLERS,
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'utils': {
+            'handlers': LOG_HANDLERS,
             'level': 'INFO',
             'propagate': False,
         },
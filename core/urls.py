@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from utils.metrics import MetricsView
 
 
 urlpatterns = [
@@ -10,5 +11,7 @@ urlpatterns = [
     path('api/users/', include('apps.user.urls')),
     path('api/posts/', include('apps.post.urls')),
 
+    path('metrics', MetricsView.as_view(), name='metrics'),
+
     path('admin/', admin.site.urls),
 ]
@@ -0,0 +1,55 @@
+"""
+Gunicorn settings for the production profile, picked up automatically when
+gunicorn starts from the project root.
+
+Serves ``core.wsgi`` with threaded workers by default. To serve
+``core.asgi`` instead, set::
+
+    GUNICORN_APP=core.asgi:application
+    GUNICORN_WORKER_CLASS=uvicorn_worker.UvicornWorker
+    ASYNC_VIEWS=True
+
+ASGI workers should run with ``DB_CONN_MAX_AGE=0`` (each request's ORM calls
+run in a thread of their own, so persistent connections would pile up) and
+rely on pgbouncer for pooling.
+"""
+import multiprocessing
+import os
+
+wsgi_app = os.getenv('GUNICORN_APP', 'core.wsgi:application')
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers periodically so a slow leak can't grow without bound.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+
+LOCAL_MEMORY_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+def on_starting(server):
+    # Each worker would keep its own response cache and ETag tokens, replica
+    # pins, throttle buckets and JWT user cache, so invalidations and limits
+    # would only reach one of them.
+    if server.cfg.workers < 2:
+        return
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    from django.conf import settings
+
+    local = sorted(alias for alias, cache in settings.CACHES.items() if cache['BACKEND'] == LOCAL_MEMORY_CACHE)
+    if local:
+        raise RuntimeError(
+            'Cache %s is local to each process but gunicorn runs %d workers: point '
+            'CACHE_BACKEND/CACHE_LOCATION at a shared cache (e.g. Redis) or set '
+            'GUNICORN_WORKERS=1.' % (', '.join(local), server.cfg.workers)
+        )
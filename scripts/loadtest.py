@@ -0,0 +1,109 @@
+"""
+Minimal HTTP load generator for comparing serving setups.
+
+Runs ``--concurrency`` client threads against one or more API paths for
+``--duration`` seconds and reports throughput and latency percentiles. Several
+comma-separated concurrency levels run one after the other, to see how a
+server scales. Only uses the standard library, so it can run from any machine
+that reaches the server:
+
+    python scripts/loadtest.py --base-url http://localhost:8001 \\
+        --username admin --password secret --path /api/posts/ --path /api/users/1/ \\
+        --concurrency 1,8,32
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+
+def obtain_token(base_url, username, password):
+    request = urllib.request.Request(
+        f'{base_url}/api/token/',
+        data=json.dumps({'username': username, 'password': password}).encode(),
+        headers={'Content-Type': 'application/json'},
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)['access']
+
+
+def worker(urls, headers, deadline, latencies, statuses, lock):
+    opener = urllib.request.build_opener()
+    i = 0
+    while time.perf_counter() < deadline:
+        url = urls[i % len(urls)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            with opener.open(urllib.request.Request(url, headers=headers)) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except OSError:
+            status = 'error'
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] += 1
+
+
+def run(urls, headers, concurrency, duration):
+    latencies, statuses, lock = [], Counter(), threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=worker, args=(urls, headers, deadline, latencies, statuses, lock))
+        for _ in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - started
+
+
+def report(concurrency, latencies, statuses, elapsed):
+    if not latencies:
+        print(f'{concurrency:>11}  no requests completed')
+        return
+    ordered = sorted(latencies)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+
+    print(f'{concurrency:>11}  {len(latencies):>8}  {len(latencies) / elapsed:>7.1f}  '
+          f'{statistics.mean(latencies) * 1000:>7.1f}  {percentile(0.50):>7.1f}  '
+          f'{percentile(0.95):>7.1f}  {percentile(0.99):>7.1f}  '
+          + ', '.join(f'{status}={count}' for status, count in sorted(statuses.items(), key=str)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--path', action='append', dest='paths', help='API path to request (repeatable).')
+    parser.add_argument('--concurrency', default='16', help='Client threads, or a comma-separated list of levels.')
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--token', help='JWT access token.')
+    parser.add_argument('--username', help='Obtain a token for this user instead of passing --token.')
+    parser.add_argument('--password')
+    args = parser.parse_args()
+
+    base_url = args.base_url.rstrip('/')
+    token = args.token
+    if token is None and args.username:
+        token = obtain_token(base_url, args.username, args.password)
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    urls = [base_url + path for path in (args.paths or ['/api/posts/'])]
+
+    print('concurrency  requests    req/s  mean ms   p50 ms   p95 ms   p99 ms  statuses')
+    for concurrency in [int(level) for level in args.concurrency.split(',')]:
+        report(concurrency, *run(urls, headers, concurrency, args.duration))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import os
+import django
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+from apps.user.models import User
+from apps.post.models import Post, Comment
+from apps.post.views import AsyncCommentList, AsyncPostDetail, AsyncPostList, CommentList, PostDetail, PostList
+from apps.user.views import AsyncUserDetail, UserDetail
+from mixer.backend.django import mixer
+from .conftests import user, post
+
+os.environ['DJANGO_SETTINGS_MODULE'] = 'core.settings'
+django.setup()
+
+@pytest.mark.django_db
+class TestAsyncViews:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, db):
+        caches['default'].clear()
+
+    @pytest.fixture
+    def content(self, user):
+        authors = mixer.cycle(3).blend(User)
+        for author in authors:
+            author.followers.add(user)
+            for post in mixer.cycle(4).blend(Post, author=author):
+                mixer.cycle(5).blend(Comment, author=user, post=post)
+        return authors
+
+    def call(self, view_class, user, path='/', params=None, **kwargs):
+        # Real JWT header, so the async views go through aauthenticate.
+        request = APIRequestFactory().get(path, params, HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        caches['default'].clear()
+        view = view_class.as_view()
+        return async_to_sync(view)(request, **kwargs) if view_class.view_is_async else view(request, **kwargs)
+
+    def test_post_list_matches_sync(self, user, content):
+        for params in ({}, {'page_size': 5, 'page_number': 2}, {'pagination': 'cursor', 'page_size': 5}):
+            sync = self.call(PostList, user, params=params)
+            async_ = self.call(AsyncPostList, user, params=params)
+            assert async_.status_code == status.HTTP_200_OK
+            assert async_.data == sync.data
+
+    def test_post_list_invalid_page(self, user, content):
+        assert self.call(AsyncPostList, user, params={'page_number': 99}).status_code == status.HTTP_404_NOT_FOUND
+        assert self.call(AsyncPostList, user, params={'page_number': 'last'}).data['results']
+
+    def test_post_detail_matches_sync(self, user, content):
+        post = Post.objects.filter(author=content[0]).first()
+        sync = self.call(PostDetail, user, pk=post.pk)
+        async_ = self.call(AsyncPostDetail, user, pk=post.pk)
+        assert async_.status_code == status.HTTP_200_OK
+        assert async_.data == sync.data
+        assert len(async_.data['comments']) == 3
+        assert self.call(AsyncPostDetail, user, pk=0).status_code == status.HTTP_404_NOT_FOUND
+
+    def test_comment_list_matches_sync(self, user, content):
+        post = Post.objects.filter(author=content[0]).first()
+        for params in ({}, {'pagination': 'cursor', 'page_size': 2}):
+            sync = self.call(CommentList, user, params=params, pk=post.pk)
+            async_ = self.call(AsyncCommentList, user, params=params, pk=post.pk)
+            assert async_.data == sync.data
+        assert self.call(AsyncCommentList, user, pk=0).status_code == status.HTTP_404_NOT_FOUND
+
+    def test_user_detail_matches_sync(self, user, content):
+        sync = self.call(UserDetail, user, pk=content[0].pk)
+        async_ = self.call(AsyncUserDetail, user, pk=content[0].pk)
+        assert async_.data == sync.data
+        assert async_['ETag']
+
+    def test_authentication(self, user, post):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION='Bearer bogus')
+        response = async_to_sync(AsyncPostDetail.as_view())(request, pk=post.pk)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+        response = async_to_sync(AsyncPostDetail.as_view())(APIRequestFactory().get('/'), pk=post.pk)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
@@ -0,0 +1,76 @@
+import json
+import os
+from io import StringIO
+import django
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import F
+from apps.post.bench import compare, uncovered_endpoints
+from apps.post.models import Comment, Post, TimelineEntry
+from apps.user.models import Follow, User
+
+os.environ['DJANGO_SETTINGS_MODULE'] = 'core.settings'
+django.setup()
+
+
+@pytest.mark.django_db
+class TestSeedBench:
+
+    def test_seed_creates_the_dataset(self):
+        call_command('seed_bench', users=50, posts=200, comments=500, follows_per_user=5, seed=1, stdout=StringIO())
+
+        assert User.objects.filter(username__startswith='bench').count() == 50
+        assert User.objects.get(username='bench').is_staff
+        assert Post.objects.count() == 200
+        assert Comment.objects.count() == 500
+        assert Follow.objects.exists()
+        assert not Follow.objects.filter(follower_id=F('followed_id')).exists()
+        assert TimelineEntry.objects.exists()
+        # Counters are consistent with the generated rows.
+        call_command('rebuild_user_stats', check=True, stdout=StringIO())
+
+    def test_seed_refuses_an_existing_prefix(self):
+        call_command('seed_bench', users=2, posts=0, comments=0, stdout=StringIO())
+        with pytest.raises(CommandError):
+            call_command('seed_bench', users=2, posts=0, comments=0, stdout=StringIO())
+
+
+@pytest.mark.django_db
+class TestBench:
+
+    def test_every_endpoint_has_a_scenario(self):
+        assert uncovered_endpoints() == []
+
+    def test_bench_saves_and_checks_a_baseline(self, tmp_path):
+        call_command('seed_bench', users=20, posts=50, comments=100, follows_per_user=3, seed=2, stdout=StringIO())
+        path = tmp_path / 'baseline.json'
+        call_command('bench', iterations=2, warmup=0, save=str(path), stdout=StringIO())
+
+        baseline = json.loads(path.read_text())
+        assert baseline['meta']['dataset']['posts'] == 50
+        result = baseline['results']['GET post-list']
+        assert result['iterations'] == 2
+        assert result['queries'] > 0
+        assert result['p50_ms'] <= result['p95_ms'] <= result['p99_ms']
+
+        call_command('bench', iterations=2, warmup=0, only=['user-detail'], baseline=str(path),
+                     min_delta_ms=1000, stdout=StringIO())
+
+        baseline['results']['GET user-detail']['queries'] = 0
+        path.write_text(json.dumps(baseline))
+        with pytest.raises(CommandError, match='regressions'):
+            call_command('bench', iterations=2, warmup=0, only=['user-detail'], baseline=str(path),
+                         min_delta_ms=1000, stdout=StringIO(), stderr=StringIO())
+
+    def test_compare_applies_the_threshold(self):
+        base = {'queries': 3, 'p50_ms': 10.0, 'p95_ms': 20.0}
+        baseline = {'results': {'GET post-list': base}}
+
+        assert compare({'GET post-list': {**base, 'p50_ms': 12.0}}, baseline, threshold=0.25) == []
+        assert compare({'GET post-list': {**base, 'p95_ms': 30.0}}, baseline, threshold=0.25) == [
+            'GET post-list: p95_ms 20.0 -> 30.0'
+        ]
+        # Tiny absolute increases are noise.
+        assert compare({'GET post-list': {**base, 'p50_ms': 11.5}}, baseline, threshold=0.1, min_delta_ms=2) == []
+        assert compare({'GET post-list': {**base, 'queries': 4}}, baseline) == ['GET post-list: 3 -> 4 queries']
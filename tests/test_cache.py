@@ -0,0 +1,143 @@
+import os
+import django
+import pytest
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from apps.user.models import User
+from apps.post.models import Post, Comment
+from mixer.backend.django import mixer
+from django.urls import reverse
+from utils.cache import response_cache
+from .conftests import user, post
+
+os.environ['DJANGO_SETTINGS_MODULE'] = 'core.settings'
+django.setup()
+
+@pytest.mark.django_db
+class TestResponseCache:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, db):
+        caches['default'].clear()
+        response_cache.reset_stats()
+
+    @pytest.fixture
+    def authenticated_client(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+    def test_post_detail_is_cached(self, authenticated_client, post):
+        first = authenticated_client.get(reverse('post-detail', args=[post.id]))
+        second = authenticated_client.get(reverse('post-detail', args=[post.id]))
+        assert first.data == second.data
+        assert response_cache.stats()['misses'] == 1
+        assert response_cache.stats()['hits'] == 1
+
+    def test_invalidation_is_repeated_on_commit(self, django_capture_on_commit_callbacks, post):
+        key = response_cache.payload_key('post-detail', post.id)
+        with django_capture_on_commit_callbacks(execute=True):
+            response_cache.invalidate(('post', post.id))
+            # A reader that saw the pre-commit row, under the new token.
+            response_cache.set(key, {'content': 'old'}, [('post', post.id)])
+            assert response_cache.get(key) == {'content': 'old'}
+        assert response_cache.get(key) is None
+
+    def test_post_detail_after_new_comment(self, authenticated_client, post):
+        authenticated_client.get(reverse('post-detail', args=[post.id]))
+        authenticated_client.post(reverse('comment-list', args=[post.id]), {'content': 'Fresh'})
+
+        response = authenticated_client.get(reverse('post-detail', args=[post.id]))
+        assert [c['content'] for c in response.data['comments']] == ['Fresh']
+        assert response.data['author']['total_comments'] == 1
+        assert response_cache.stats()['evictions'] == 1
+
+    def test_post_detail_after_new_post(self, authenticated_client, post):
+        authenticated_client.get(reverse('post-detail', args=[post.id]))
+        authenticated_client.post(reverse('post-list'), {'content': 'Another one'})
+
+        response = authenticated_client.get(reverse('post-detail', args=[post.id]))
+        assert response.data['author']['total_posts'] == 2
+
+    def test_post_detail_after_comment_author_follows(self, authenticated_client, post):
+        commenter = mixer.blend(User)
+        mixer.blend(Comment, author=commenter, post=post)
+        authenticated_client.get(reverse('post-detail', args=[post.id]))
+
+        client = APIClient()
+        client.force_authenticate(user=commenter)
+        client.post(reverse('follow-user', args=[commenter.id, post.author_id]))
+
+        response = authenticated_client.get(reverse('post-detail', args=[post.id]))
+        assert response.data['comments'][0]['author']['total_following'] == 1
+        assert response.data['author']['total_followers'] == 1
+
+    def test_comment_list_after_new_comment(self, authenticated_client, post):
+        assert authenticated_client.get(reverse('comment-list', args=[post.id])).data['results'] == []
+        authenticated_client.post(reverse('comment-list', args=[post.id]), {'content': 'Fresh'})
+
+        response = authenticated_client.get(reverse('comment-list', args=[post.id]))
+        assert [c['content'] for c in response.data['results']] == ['Fresh']
+
+    def test_comment_list_cache_is_per_query(self, authenticated_client, post):
+        mixer.cycle(3).blend(Comment, post=post)
+        full = authenticated_client.get(reverse('comment-list', args=[post.id]))
+        paged = authenticated_client.get(reverse('comment-list', args=[post.id]), {'pagination': 'cursor', 'page_size': 1})
+        assert len(full.data['results']) == 3
+        assert len(paged.data['results']) == 1
+
+    def test_user_detail_after_follow(self, authenticated_client, user):
+        other = mixer.blend(User)
+        authenticated_client.get(reverse('user-detail', args=[other.id]))
+        authenticated_client.post(reverse('follow-user', args=[user.id, other.id]))
+
+        response = authenticated_client.get(reverse('user-detail', args=[other.id]))
+        assert response.data['total_followers'] == 1
+
+    def test_user_detail_after_user_update(self, authenticated_client, user):
+        authenticated_client.get(reverse('user-detail', args=[user.id]))
+        user.username = 'renamed'
+        user.save()
+
+        response = authenticated_client.get(reverse('user-detail', args=[user.id]))
+        assert response.data['username'] == 'renamed'
+
+    def test_user_detail_after_user_creation(self, authenticated_client):
+        created = APIClient().post(reverse('user-list'), {'username': 'newuser', 'email': 'newuser@example.com', 'password': 'password123'})
+
+        response = authenticated_client.get(reverse('user-detail', args=[created.data['id']]))
+        assert response.data['username'] == 'newuser'
+        assert response.data['total_posts'] == 0
+
+    @pytest.mark.parametrize("url_name", ['post-list', 'post-detail', 'comment-list', 'user-list', 'user-detail'])
+    def test_conditional_get(self, authenticated_client, post, url_name):
+        args = [] if url_name in ('post-list', 'user-list') else [post.author_id if url_name == 'user-detail' else post.id]
+        url = reverse(url_name, args=args)
+
+        response = authenticated_client.get(url)
+        assert response.status_code == 200
+        etag = response['ETag']
+        assert response['Last-Modified']
+
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response.content == b''
+
+        authenticated_client.post(reverse('comment-list', args=[post.id]), {'content': 'Changes everything'})
+        response = authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+
+    def test_conditional_post_list_skips_queries(self, authenticated_client, post):
+        etag = authenticated_client.get(reverse('post-list'))['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            response = authenticated_client.get(reverse('post-list'), HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert len(ctx.captured_queries) == 0
+
+    def test_conditional_post_list_varies_with_filters(self, authenticated_client, post):
+        etag = authenticated_client.get(reverse('post-list'))['ETag']
+        response = authenticated_client.get(reverse('post-list'), {'author_id': post.author_id}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
@@ -0,0 +1,166 @@
+import os
+import zlib
+from io import StringIO
+import django
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from mixer.backend.django import mixer
+from apps.post.bench import compression_results
+from apps.post.models import Post
+from apps.user.models import User
+from utils import compression
+from utils.compression import CompressionMiddleware, choose_encoding, parse_accept_encoding
+from .conftests import user, post
+
+os.environ['DJANGO_SETTINGS_MODULE'] = 'core.settings'
+django.setup()
+
+
+@pytest.fixture(autouse=True)
+def gzip_only(settings):
+    # The same negotiation whether or not brotli and zstandard are installed.
+    settings.COMPRESSION_ENCODINGS = ['gzip']
+
+
+def gunzip(data):
+    return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding('gzip;q=0.5, BR , identity;q=0, zstd;q=x') == {
+        'gzip': 0.5, 'br': 1.0, 'identity': 0.0, 'zstd': 0.0,
+    }
+    assert parse_accept_encoding('') == {}
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip, br', 'br'),
+    ('gzip;q=1, br;q=0.5', 'gzip'),
+    ('*', 'br'),
+    ('*, br;q=0', 'gzip'),
+    ('deflate', None),
+    ('', None),
+])
+def test_choose_encoding(header, expected):
+    assert choose_encoding(header, ['br', 'gzip']) == expected
+
+
+@pytest.mark.parametrize('encoding, module', [('br', 'brotli'), ('zstd', 'zstandard')])
+def test_optional_codecs(encoding, module):
+    pytest.importorskip(module)
+    from apps.post.bench import DECOMPRESSORS
+    codec = compression.CODECS[encoding](3)
+    data = codec.compress(b'{"a": 1}' * 100) + codec.finish(b'[]')
+    assert DECOMPRESSORS[encoding](data) == b'{"a": 1}' * 100 + b'[]'
+
+
+def middleware(response, accept_encoding='gzip', is_async=False):
+    request = RequestFactory().get('/api/posts/', HTTP_ACCEPT_ENCODING=accept_encoding)
+    if is_async:
+        async def get_response(request):
+            return response
+        return async_to_sync(CompressionMiddleware(get_response))(request)
+    return CompressionMiddleware(lambda request: response)(request)
+
+
+class TestMiddleware:
+    body = b'{"results": [' + b','.join(b'{"id": %d, "content": "hola"}' % i for i in range(100)) + b']}'
+
+    def test_compresses_json(self):
+        response = middleware(HttpResponse(self.body, content_type='application/json'))
+        assert response['Content-Encoding'] == 'gzip'
+        assert response['Vary'] == 'Accept-Encoding'
+        assert int(response['Content-Length']) == len(response.content) < len(self.body)
+        assert gunzip(response.content) == self.body
+
+    def test_leaves_responses_as_they_are(self):
+        small = HttpResponse(b'{"ok": true}', content_type='application/json')
+        image = HttpResponse(self.body, content_type='image/png')
+        html = HttpResponse(self.body, content_type='text/html')
+        encoded = HttpResponse(self.body, content_type='application/json', headers={'Content-Encoding': 'br'})
+        no_transform = HttpResponse(self.body, content_type='application/json', headers={'Cache-Control': 'no-transform'})
+        for response in (small, image, html, encoded, no_transform):
+            content = response.content
+            assert middleware(response).content == content
+        assert not middleware(HttpResponse(self.body, content_type='application/json'), 'identity').has_header('Content-Encoding')
+
+    @override_settings(COMPRESSION_LEVELS={'application/json': {'gzip': 1}, 'application/x-ndjson': {'gzip': 9}})
+    def test_levels_per_content_type(self):
+        body = os.urandom(64).hex().encode() * 50
+        fast = middleware(HttpResponse(body, content_type='application/json; charset=utf-8')).content
+        best = middleware(HttpResponse(body, content_type='application/x-ndjson')).content
+        assert fast == compression.compress(body, 'gzip', 1)
+        assert best == compression.compress(body, 'gzip', 9)
+
+    @pytest.mark.parametrize('is_async', [False, True])
+    def test_streaming(self, is_async):
+        chunks = [b'{"id": %d}\n' % i * 50 for i in range(5)]
+        if is_async:
+            async def content():
+                for chunk in chunks:
+                    yield chunk
+        else:
+            content = lambda: iter(chunks)
+        response = middleware(StreamingHttpResponse(content(), content_type='application/x-ndjson'), is_async=is_async)
+        assert response['Content-Encoding'] == 'gzip'
+        assert not response.has_header('Content-Length')
+
+        async def read():
+            return [chunk async for chunk in response.streaming_content]
+
+        parts = async_to_sync(read)() if is_async else list(response.streaming_content)
+        # A flushed block per chunk, so every chunk can be decoded as it arrives.
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        assert [decompressor.decompress(part) for part in parts[:5]] == chunks
+        assert gunzip(b''.join(parts)) == b''.join(chunks)
+
+    @override_settings(COMPRESSION_ENABLED=False)
+    def test_disabled(self):
+        assert not middleware(HttpResponse(self.body, content_type='application/json')).has_header('Content-Encoding')
+
+
+@pytest.mark.django_db
+class TestAPI:
+
+    @pytest.fixture
+    def client(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+    def test_post_list(self, client, user):
+        mixer.cycle(30).blend(Post, author=user, content='Una publicación con algo de texto')
+        plain = client.get(reverse('post-list'))
+        response = client.get(reverse('post-list'), HTTP_ACCEPT_ENCODING='gzip, deflate')
+        assert response['Content-Encoding'] == 'gzip'
+        assert gunzip(response.content) == plain.content
+        assert 'Accept-Encoding' in response['Vary']
+
+        # The weak ETag still validates.
+        assert response['ETag'] == 'W/' + plain['ETag']
+        cached = client.get(reverse('post-list'), HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        assert cached.status_code == 304
+
+    def test_streamed_export(self, post):
+        client = APIClient()
+        client.force_authenticate(user=mixer.blend(User, is_staff=True))
+        mixer.cycle(50).blend(Post, author=post.author)
+        plain = b''.join(client.get(reverse('post-export')).streaming_content)
+        response = client.get(reverse('post-export'), HTTP_ACCEPT_ENCODING='gzip')
+        assert response['Content-Encoding'] == 'gzip'
+        assert gunzip(b''.join(response.streaming_content)) == plain
+
+        # Compressed once when the view already does it.
+        response = client.get(reverse('post-export') + '?compress=gzip', HTTP_ACCEPT_ENCODING='gzip')
+        assert gunzip(b''.join(response.streaming_content)) == plain
+
+    def test_benchmark(self, post):
+        results = compression_results(limit=10, repeat=1)
+        assert all(set(result) == {'identity', 'gzip'} for result in results.values())
+        assert set(results['post-page']['gzip']['total_ms']) == {10, 100}
+        call_command('bench_compression', limit=10, repeat=1, stdout=StringIO())
@@ -0,0 +1,59 @@
+import os
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+import django
+import pytest
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework.renderers import JSONRenderer
+from mixer.backend.django import mixer
+from apps.post.bench import serializer_throughput
+from apps.post.models import Comment, Post
+from apps.post.serializers import CommentSerializer, PostSerializer, comment_rows, post_rows
+from apps.user.models import User, UserStats
+
+os.environ['DJANGO_SETTINGS_MODULE'] = 'core.settings'
+django.setup()
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+@pytest.mark.django_db
+class TestFastSerializers:
+
+    @pytest.fixture(autouse=True)
+    def content(self):
+        users = mixer.cycle(4).blend(User)
+        users[0].followers.add(users[1], users[2])
+        start = datetime(2024, 3, 1, 12, 0, tzinfo=timezone.utc)
+        for index in range(6):
+            post = mixer.blend(Post, author=users[index % 4], content=f'Post {index} "ñ" ☃',
+                               created_at=start + timedelta(hours=index))
+            for number in range(index):
+                mixer.blend(Comment, post=post, author=users[number % 4], content=f'Comment {number}',
+                            created_at=start + timedelta(hours=index, minutes=number, microseconds=number))
+        # A user whose counters row is missing gets it rebuilt, as with UserSerializer.
+        UserStats.objects.filter(user=users[3]).delete()
+
+    @pytest.mark.parametrize('time_zone', ['America/Argentina/Buenos_Aires', 'UTC'])
+    def test_posts_match_post_serializer(self, time_zone):
+        with override_settings(TIME_ZONE=time_zone):
+            fast = post_rows.represent(post_rows.rows(Post.objects.order_by('-created_at')))
+            drf = PostSerializer(Post.objects.with_nested_relations().order_by('-created_at'), many=True).data
+        assert render(fast) == render(drf)
+        assert [len(post['comments']) for post in fast] == [3, 3, 3, 2, 1, 0]
+
+    @pytest.mark.parametrize('time_zone', ['America/Argentina/Buenos_Aires', 'UTC'])
+    def test_comments_match_comment_serializer(self, time_zone):
+        with override_settings(TIME_ZONE=time_zone):
+            fast = comment_rows.represent(comment_rows.rows(Comment.objects.order_by('created_at', 'id')))
+            drf = CommentSerializer(Comment.objects.order_by('created_at', 'id'), many=True).data
+        assert render(fast) == render(drf)
+
+    def test_throughput_report(self):
+        results = serializer_throughput(limit=10, repeat=1)
+        assert set(results) == {('posts', 'drf'), ('posts', 'fast'), ('comments', 'drf'), ('comments', 'fast')}
+        assert all(rows_per_second > 0 for rows_per_second in results.values())
+        call_command('bench_serializers', limit=10, repeat=1, stdout=StringIO())
@@ -0,0 +1,56 @@
+import os
+from datetime import timedelta
+import django
+import pytest
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+from apps.post.models import Comment, Post
+from apps.post.seed import seed
+
+os.environ['DJANGO_SETTINGS_MODULE'] = 'core.settings'
+django.setup()
+
+
+def assert_index_plan(queryset, index_name, ordered=True):
+    plan = queryset.explain(analyze=True)
+    assert index_name in plan, plan
+    assert 'Seq Scan' not in plan, plan
+    if ordered:
+        # The index yields rows already in the requested order.
+        assert 'Sort' not in plan, plan
+
+
+@pytest.mark.django_db
+class TestQueryPlans:
+
+    @pytest.fixture(autouse=True)
+    def dataset(self):
+        seed(users=200, posts=10000, comments=20000, follows_per_user=5, seed=3, fan_out=False)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE post_post, post_comment')
+
+    def test_post_list(self):
+        assert_index_plan(Post.objects.order_by('-created_at')[:20], 'post_post_created_id_idx')
+        assert_index_plan(Post.objects.order_by('-created_at', '-id')[20:40], 'post_post_created_id_idx')
+
+    def test_post_list_by_author_and_date(self):
+        author_id = (
+            Post.objects.values('author_id').annotate(total=Count('pk')).order_by('-total')
+            .values_list('author_id', flat=True).first()
+        )
+        since = timezone.now() - timedelta(days=30)
+        queryset = Post.objects.filter_listing(author_id=author_id, from_date=since).order_by('-created_at')[:20]
+        assert_index_plan(queryset, 'post_post_author_created_idx')
+
+    def test_post_comments(self):
+        post_id = (
+            Comment.objects.values('post_id').annotate(total=Count('pk')).order_by('-total')
+            .values_list('post_id', flat=True).first()
+        )
+        assert_index_plan(Comment.objects.filter(post_id=post_id).order_by('-created_at')[:3], 'post_comment_post_created_idx')
+        # Reading all of them, a bitmap scan plus a sort may be cheaper.
+        assert_index_plan(
+            Comment.objects.filter(post_id=post_id).order_by('created_at', 'id'), 'post_comment_post_created_idx',
+            ordered=False,
+        )
@@ -0,0 +1,102 @@
+import json
+import logging
+import os
+import django
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from utils.log import JSONFormatter, QueueHandler, RequestIDFilter, SamplingFilter
+from .conftests import user, post
+
+os.environ['DJANGO_SETTINGS_MODULE'] = 'core.settings'
+django.setup()
+
+
+class CollectingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def make_record(name='apps.post.views', level=logging.INFO, msg='hello %s', args=('world',), **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class TestLogPipeline:
+
+    def test_json_formatter(self):
+        line = JSONFormatter().format(make_record(request_id='abc', post_id=3))
+        entry = json.loads(line)
+        assert entry['level'] == 'INFO'
+        assert entry['logger'] == 'apps.post.views'
+        assert entry['message'] == 'hello world'
+        assert entry['request_id'] == 'abc'
+        assert entry['post_id'] == 3
+
+    def test_sampling_per_logger(self):
+        sampling = SamplingFilter({'apps.post': 0, 'apps.post.export': 1})
+        assert not sampling.filter(make_record('apps.post.views'))
+        assert sampling.filter(make_record('apps.post.export'))
+        assert sampling.filter(make_record('apps.user.views'))
+        # Warnings and errors are never sampled out.
+        assert sampling.filter(make_record('apps.post.views', level=logging.WARNING))
+
+    def test_queue_handler_delivers_in_the_background(self):
+        collector = CollectingHandler()
+        collector.set_name('test-collector')
+        handler = QueueHandler(handlers=['test-collector'])
+        try:
+            handler.start()
+            handler.handle(make_record())
+            handler.stop()
+        finally:
+            QueueHandler.instances.remove(handler)
+            collector.set_name(None)
+
+        assert len(collector.records) == 1
+        assert collector.records[0].getMessage() == 'hello world'
+
+    def test_full_queue_drops_records(self):
+        handler = QueueHandler(queue_size=1)
+        QueueHandler.instances.remove(handler)
+        handler.handle(make_record())
+        handler.handle(make_record())
+        assert handler.queue.qsize() == 1
+        assert handler.dropped == 1
+
+
+@pytest.mark.django_db
+class TestRequestID:
+
+    @pytest.fixture
+    def collector(self):
+        collector = CollectingHandler()
+        collector.addFilter(RequestIDFilter())
+        logger = logging.getLogger('apps.post.views')
+        logger.addHandler(collector)
+        yield collector
+        logger.removeHandler(collector)
+
+    def test_request_id_is_logged_and_returned(self, user, post, collector):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        response = client.get(reverse('post-detail', args=[post.id]))
+
+        request_id = response['X-Request-ID']
+        assert len(request_id) == 32
+        assert collector.records
+        assert all(record.request_id == request_id for record in collector.records)
+
+    def test_incoming_request_id_is_kept(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        response = client.get(reverse('post-list'), HTTP_X_REQUEST_ID='req-123')
+        assert response['X-Request-ID'] == 'req-123'
+
+        response = client.get(reverse('post-list'), HTTP_X_REQUEST_ID='not valid!')
+        assert response['X-Request-ID'] != 'not valid!'
@@ -0,0 +1,90 @@
+import logging
+import os
+import re
+import django
+import pytest
+from django.core.cache import caches
+from django.test import override_settings
+from rest_framework.test import APIClient
+from apps.post.models import Post
+from apps.user.models import User
+from mixer.backend.django import mixer
+from django.urls import reverse
+from utils.metrics import request_metrics
+from .conftests import user, post
+
+os.environ['DJANGO_SETTINGS_MODULE'] = 'core.settings'
+django.setup()
+
+
+def sample_value(text, name, **labels):
+    label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf'^{re.escape(name)}\{{{re.escape(label_text)}\}} (\S+)$', text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+@pytest.mark.django_db
+class TestRequestMetrics:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, db):
+        caches['default'].clear()
+        request_metrics.reset()
+
+    @pytest.fixture
+    def authenticated_client(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+    def test_metrics_per_view(self, authenticated_client, user):
+        mixer.cycle(3).blend(Post, author=user)
+        authenticated_client.get(reverse('post-list'))
+        authenticated_client.get(reverse('post-list'))
+        authenticated_client.get(reverse('user-detail', args=[0]))
+
+        response = APIClient().get('/metrics')
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+        text = response.content.decode()
+
+        assert sample_value(text, 'http_requests_total', view='post-list', method='GET', status='200') == 2
+        assert sample_value(text, 'http_requests_total', view='user-detail', method='GET', status='404') == 1
+        assert sample_value(text, 'http_request_duration_seconds_count', view='post-list', method='GET') == 2
+        assert sample_value(text, 'http_request_duration_seconds_bucket', view='post-list', method='GET', le='+Inf') == 2
+        assert sample_value(text, 'http_request_db_queries_sum', view='post-list', method='GET') > 0
+        assert sample_value(text, 'http_request_db_duration_seconds_sum', view='post-list', method='GET') > 0
+        assert sample_value(text, 'http_response_render_duration_seconds_count', view='post-list', method='GET') == 2
+        assert sample_value(text, 'http_response_size_bytes_sum', view='post-list', method='GET') > 0
+
+    def test_query_count_matches_the_view(self, authenticated_client, post):
+        authenticated_client.get(reverse('post-detail', args=[post.id]))
+        text = request_metrics.render()
+        # The first PostDetail request misses the cache and queries; the
+        # second is served from it.
+        first = sample_value(text, 'http_request_db_queries_sum', view='post-detail', method='GET')
+        authenticated_client.get(reverse('post-detail', args=[post.id]))
+        text = request_metrics.render()
+        assert first > 0
+        assert sample_value(text, 'http_request_db_queries_sum', view='post-detail', method='GET') == first
+        assert sample_value(text, 'http_request_db_queries_bucket', view='post-detail', method='GET', le='0') == 1
+
+    @override_settings(REQUEST_QUERY_BUDGET=1)
+    def test_over_budget_requests_are_logged(self, authenticated_client, post, caplog):
+        with caplog.at_level(logging.WARNING, logger='utils.metrics'):
+            authenticated_client.get(reverse('post-list'))
+        assert any('Request over budget' in record.getMessage() and '(post-list)' in record.getMessage()
+                   for record in caplog.records)
+
+    def test_access(self, authenticated_client, settings):
+        settings.METRICS_ALLOWED_IPS = ['10.0.0.2']
+        assert APIClient().get('/metrics', REMOTE_ADDR='10.0.0.2').status_code == 200
+        assert APIClient().get('/metrics', REMOTE_ADDR='10.0.0.3').status_code == 401
+        assert authenticated_client.get('/metrics', REMOTE_ADDR='10.0.0.3').status_code == 403
+
+        staff_client = APIClient()
+        staff_client.force_authenticate(user=mixer.blend(User, is_staff=True))
+        assert staff_client.get('/metrics', REMOTE_ADDR='10.0.0.3').status_code == 200
+
+        settings.METRICS_ENABLED = False
+        assert staff_client.get('/metrics').status_code == 404
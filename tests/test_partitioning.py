@@ -0,0 +1,142 @@
+import importlib
+import os
+from datetime import timedelta
+from io import StringIO
+import django
+import pytest
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.post import partitions
+from apps.post.models import Comment, Post, TimelineEntry
+from apps.post.seed import seed
+from apps.user.models import User
+
+os.environ['DJANGO_SETTINGS_MODULE'] = 'core.settings'
+django.setup()
+
+
+def partition_content(*args):
+    call_command('partition_content', *args, stdout=StringIO())
+
+
+def post_foreign_keys():
+    with connection.cursor() as cursor:
+        return {
+            table: any(constraint['foreign_key'] == ('post_post', 'id')
+                       for constraint in connection.introspection.get_constraints(cursor, table).values())
+            for table in ('post_comment', 'post_timelineentry')
+        }
+
+
+@pytest.mark.django_db
+def test_foreign_keys_to_posts_are_kept_without_partitioning():
+    assert post_foreign_keys() == {'post_comment': True, 'post_timelineentry': True}
+
+
+def table_count(table):
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM {table}')
+        return cursor.fetchone()[0]
+
+
+@pytest.mark.django_db
+class TestPartitioning:
+    # DDL is transactional in Postgres: each test's conversion is rolled back.
+
+    @pytest.fixture(autouse=True)
+    def dataset(self):
+        seed(users=50, posts=2000, comments=4000, follows_per_user=3, days=365, seed=5, fan_out=False)
+        self.counts = {table: table_count(table) for table in partitions.PARTITIONED_TABLES}
+        partition_content('--convert', '--ahead', '2')
+
+    def test_rows_are_routed_to_their_month(self):
+        now = timezone.now()
+        for table in partitions.PARTITIONED_TABLES:
+            assert partitions.is_partitioned(connection, table)
+            monthly = partitions.monthly_partitions(connection, table)
+            assert monthly[-1][1] == partitions.add_months(partitions.month_start(now), 2)
+            assert sum(table_count(name) for name, _ in monthly) == self.counts[table]
+            assert table_count(f'{table}_default') == 0
+            with connection.cursor() as cursor:
+                for name, start in monthly:
+                    cursor.execute(f'SELECT MIN(created_at), MAX(created_at) FROM {name}')
+                    oldest, newest = cursor.fetchone()
+                    if oldest is not None:
+                        assert start <= oldest and newest < partitions.add_months(start, 1)
+
+    def test_recent_listing_only_reads_recent_partitions(self):
+        now = timezone.now()
+        plan = Post.objects.filter(created_at__gte=now - timedelta(days=7)).order_by('-created_at')[:20].explain()
+        read = {name for name, _ in partitions.monthly_partitions(connection, 'post_post') if name in plan}
+        recent = {
+            partitions.partition_name('post_post', partitions.month_start(now - timedelta(days=7))),
+            partitions.partition_name('post_post', partitions.month_start(now)),
+        }
+        assert recent & read and read <= recent | {
+            partitions.partition_name('post_post', partitions.add_months(partitions.month_start(now), months))
+            for months in (1, 2)
+        }, plan
+
+    def test_orm_and_api_keep_working(self):
+        author = User.objects.filter(username__startswith='bench').first()
+        post = Post.objects.create(author=author, content='partitioned')
+        comment = Comment.objects.create(post=post, author=author, content='hola')
+        assert post.pk > 0 and comment.pk > 0
+
+        client = APIClient()
+        client.force_authenticate(user=author)
+        response = client.get(reverse('post-detail', args=[post.pk]))
+        assert response.status_code == 200
+
+        author.is_staff = author.is_superuser = True
+        author.save()
+        client.force_login(author)
+        assert client.get(reverse('admin:post_post_changelist')).status_code == 200
+
+        post.delete()
+        assert not Comment.objects.filter(pk=comment.pk).exists()
+
+    def test_maintenance_creates_and_archives_partitions(self):
+        now = timezone.now()
+        partition_content('--ahead', '4')
+        last = partitions.add_months(partitions.month_start(now), 4)
+        assert partitions.monthly_partitions(connection, 'post_post')[-1][1] == last
+
+        cutoff = partitions.add_months(partitions.month_start(now), -3)
+        old_posts = Post.objects.filter(created_at__lt=cutoff).count()
+        assert old_posts
+        partition_content('--retain-months', '3')
+
+        assert not Post.objects.filter(created_at__lt=cutoff).exists()
+        assert not Comment.objects.filter(created_at__lt=cutoff).exists()
+        assert not TimelineEntry.objects.filter(created_at__lt=cutoff).exists()
+        assert not Comment.objects.exclude(post_id__in=Post.objects.values('pk')).exists()
+        assert all(start >= cutoff for _, start in partitions.monthly_partitions(connection, 'post_post'))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM pg_tables WHERE schemaname = 'archive' AND tablename LIKE 'post_post_p%%'"
+            )
+            assert cursor.fetchone()[0] > 0
+        assert table_count('archive.' + partitions.partition_name('post_post', partitions.add_months(cutoff, -1))) > 0
+        call_command('rebuild_user_stats', '--check', stdout=StringIO())
+
+    def test_unconvert_restores_plain_tables(self):
+        for table in partitions.PARTITIONED_TABLES:
+            partitions.unconvert(connection, table)
+            assert not partitions.is_partitioned(connection, table)
+            assert table_count(table) == self.counts[table]
+        author = User.objects.filter(username__startswith='bench').first()
+        post = Post.objects.create(author=author, content='plain again')
+        assert Post.objects.get(pk=post.pk).content == 'plain again'
+
+    def test_migration_reverse_restores_foreign_keys(self):
+        assert post_foreign_keys() == {'post_comment': False, 'post_timelineentry': False}
+        migration = importlib.import_module('apps.post.migrations.0006_partitioning')
+        with connection.schema_editor() as schema_editor:
+            migration.unpartition_tables(apps, schema_editor)
+        assert not any(partitions.is_partitioned(connection, table) for table in partitions.PARTITIONED_TABLES)
+        assert post_foreign_keys() == {'post_comment': True, 'post_timelineentry': True}
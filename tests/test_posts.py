@@ -1,13 +1,19 @@
+import gzip
+import json
 import os
+from io import StringIO
 import django
 import pytest
 from django.conf import settings
 from rest_framework import status
 from rest_framework.test import APIClient
-from apps.user.models import User
-from apps.post.models import Post, Comment
+from apps.user.models import User, UserStats
+from django.core.management import call_command
+from apps.post.models import Post, Comment, TimelineEntry
 from mixer.backend.django import mixer
 from django.urls import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from .conftests import user, post
 
 os.environ['DJANGO_SETTINGS_MODULE'] = 'core.settings'
@@ -95,7 +101,7 @@ class TestPostAPI:
 
         response = authenticated_client.get(f'/api/posts/{post.id}/comments/')
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == 2
+        assert len(response.data['results']) == 2
 
     def test_create_post_view(self, client, user):
         client.force_authenticate(user=user)
@@ -127,4 +133,291 @@ class TestPostAPI:
 
         response = authenticated_client.get(reverse('comment-list', args=[post.id]))
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == 2
+        assert response.data['count'] == 2
+        assert [c['content'] for c in response.data['results']] == ['First comment', 'Second comment']
+
+    def test_get_posts_query_count_is_independent_of_page_size(self, authenticated_client, user):
+        authors = mixer.cycle(5).blend(User)
+        for author in authors:
+            author.followers.add(user)
+            user.followers.add(author)
+            for post in mixer.cycle(10).blend(Post, author=author):
+                mixer.cycle(4).blend(Comment, author=user, post=post)
+
+        def count_queries(page_size):
+            with CaptureQueriesContext(connection) as ctx:
+                response = authenticated_client.get('/api/posts/', {'page_size': page_size})
+            assert response.status_code == status.HTTP_200_OK
+            assert len(response.data['results']) == page_size
+            return len(ctx.captured_queries)
+
+        assert count_queries(5) == count_queries(50)
+
+    def test_get_posts_nested_payload(self, authenticated_client, user):
+        other = mixer.blend(User)
+        other.followers.add(user)
+        post = mixer.blend(Post, author=other)
+        for _ in range(5):
+            mixer.blend(Comment, author=user, post=post)
+
+        response = authenticated_client.get('/api/posts/')
+        result = response.data['results'][0]
+        assert result['author']['total_posts'] == 1
+        assert result['author']['total_comments'] == 0
+        assert result['author']['total_followers'] == 1
+        assert 'followers' not in result['author']
+        assert len(result['comments']) == 3
+        assert result['comments'][0]['author']['total_comments'] == 5
+        assert result['comments'][0]['author']['total_following'] == 1
+
+    def test_get_posts_cursor_pagination(self, authenticated_client, user):
+        posts = mixer.cycle(5).blend(Post, author=user, created_at='2023-10-01T10:00:00Z')
+        expected = sorted((p.id for p in posts), reverse=True)
+
+        seen = []
+        response = authenticated_client.get('/api/posts/', {'pagination': 'cursor', 'page_size': 2})
+        while True:
+            assert response.status_code == status.HTTP_200_OK
+            assert 'count' not in response.data
+            seen.extend(p['id'] for p in response.data['results'])
+            if response.data['next'] is None:
+                break
+            response = authenticated_client.get(response.data['next'])
+
+        assert seen == expected
+
+    def test_get_posts_invalid_cursor(self, authenticated_client):
+        response = authenticated_client.get('/api/posts/', {'cursor': 'forged'})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_get_comments_cursor_pagination(self, authenticated_client, post, user):
+        # Two comments share created_at: ties are broken on id in both modes.
+        for day in (2, 1, 1, 3, 2):
+            mixer.blend(Comment, author=user, post=post, created_at=f'2024-05-0{day}T12:00:00Z')
+        url = reverse('comment-list', args=[post.id])
+        expected = list(Comment.objects.filter(post=post).order_by('created_at', 'id').values_list('id', flat=True))
+
+        response = authenticated_client.get(url)
+        assert [c['id'] for c in response.data['results']] == expected
+
+        seen = []
+        response = authenticated_client.get(url, {'pagination': 'cursor', 'page_size': 2})
+        while True:
+            assert response.status_code == status.HTTP_200_OK
+            assert len(response.data['results']) <= 2
+            seen.extend(c['id'] for c in response.data['results'])
+            if response.data['next'] is None:
+                break
+            response = authenticated_client.get(response.data['next'])
+        assert seen == expected
+
+    def test_post_detail_and_comment_list_query_counts_are_constant(self, authenticated_client, user):
+        def count_queries(comment_count, url_name):
+            post = mixer.blend(Post, author=user)
+            for author in mixer.cycle(comment_count).blend(User):
+                mixer.blend(Comment, author=author, post=post)
+            with CaptureQueriesContext(connection) as ctx:
+                response = authenticated_client.get(reverse(url_name, args=[post.id]))
+            assert response.status_code == status.HTTP_200_OK
+            return len(ctx.captured_queries)
+
+        assert count_queries(3, 'post-detail') == count_queries(30, 'post-detail')
+        assert count_queries(3, 'comment-list') == count_queries(30, 'comment-list')
+
+    def test_get_comments_paginated(self, authenticated_client, post, user):
+        mixer.cycle(25).blend(Comment, author=user, post=post)
+
+        response = authenticated_client.get(reverse('comment-list', args=[post.id]))
+        assert response.data['count'] == 25
+        assert len(response.data['results']) == 20
+        response = authenticated_client.get(response.data['next'])
+        assert len(response.data['results']) == 5
+
+    def test_get_comments_window(self, authenticated_client, post, user):
+        for day in (1, 2, 3, 4):
+            mixer.blend(Comment, author=user, post=post, content=f'day {day}', created_at=f'2024-05-0{day}T12:00:00Z')
+        url = reverse('comment-list', args=[post.id])
+
+        response = authenticated_client.get(url, {'since': '2024-05-02', 'before': '2024-05-04'})
+        assert [c['content'] for c in response.data['results']] == ['day 2', 'day 3']
+        response = authenticated_client.get(url, {'since': '2024-05-03T12:00:00Z', 'pagination': 'cursor'})
+        assert [c['content'] for c in response.data['results']] == ['day 3', 'day 4']
+        response = authenticated_client.get(url, {'before': 'yesterday'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_get_feed(self, authenticated_client, user):
+        followed = mixer.blend(User)
+        stranger = mixer.blend(User)
+        older = mixer.blend(Post, author=followed)
+        authenticated_client.post(f'/api/users/{user.id}/follow/{followed.id}/')
+
+        other_client = APIClient()
+        other_client.force_authenticate(user=followed)
+        newer_id = other_client.post('/api/posts/', {'content': 'For my followers'}).data['id']
+        other_client.force_authenticate(user=stranger)
+        other_client.post('/api/posts/', {'content': 'Nobody follows me'})
+        own_id = authenticated_client.post('/api/posts/', {'content': 'Mine'}).data['id']
+
+        response = authenticated_client.get(reverse('post-feed'))
+        assert response.status_code == status.HTTP_200_OK
+        assert [p['id'] for p in response.data['results']] == [own_id, newer_id, older.id]
+
+    def test_get_feed_fan_out_on_read(self, authenticated_client, user, settings):
+        settings.FEED_FANOUT_MAX_FOLLOWERS = 0
+        followed = mixer.blend(User)
+        user.following.add(followed)
+
+        other_client = APIClient()
+        other_client.force_authenticate(user=followed)
+        post_id = other_client.post('/api/posts/', {'content': 'Too popular to fan out'}).data['id']
+        assert not TimelineEntry.objects.filter(owner=user).exists()
+
+        response = authenticated_client.get(reverse('post-feed'))
+        assert [p['id'] for p in response.data['results']] == [post_id]
+
+    def test_trim_timelines(self, authenticated_client, user):
+        for post in mixer.cycle(5).blend(Post, author=user):
+            TimelineEntry.objects.fan_out(post)
+
+        # Reading the feed never writes; the periodic command trims.
+        with CaptureQueriesContext(connection) as queries:
+            authenticated_client.get(reverse('post-feed'))
+        assert not [q for q in queries.captured_queries if q['sql'].startswith('DELETE')]
+
+        out = StringIO()
+        call_command('trim_timelines', max_length=3, stdout=out)
+        assert 'Removed 2 timeline entries' in out.getvalue()
+        assert TimelineEntry.objects.filter(owner=user).count() == 3
+
+    def test_search_posts(self, authenticated_client, user):
+        mixer.blend(Post, author=user, content='Receta de pan casero')
+        best = mixer.blend(Post, author=user, content='Pan, pan y mas pan')
+        mixer.blend(Post, author=user, content='Nada que ver')
+
+        response = authenticated_client.get(reverse('post-search'), {'q': 'pan'})
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['results']) == 2
+        assert response.data['results'][0]['id'] == best.id
+
+        response = authenticated_client.get(reverse('post-search'), {'q': 'pan', 'page_size': 1})
+        assert len(response.data['results']) == 1
+        response = authenticated_client.get(response.data['next'])
+        assert len(response.data['results']) == 1
+        assert response.data['next'] is None
+
+    def test_search_pagination_with_tied_ranks(self, authenticated_client, user):
+        # Same content, same rank: the pages break the ties on id.
+        posts = mixer.cycle(5).blend(Post, author=user, content='Receta de pan casero')
+        best = mixer.blend(Post, author=user, content='Pan, pan y mas pan')
+
+        seen = []
+        response = authenticated_client.get(reverse('post-search'), {'q': 'pan', 'page_size': 2})
+        while True:
+            seen.extend(p['id'] for p in response.data['results'])
+            if response.data['next'] is None:
+                break
+            response = authenticated_client.get(response.data['next'])
+        assert seen == [best.id] + sorted((p.id for p in posts), reverse=True)
+
+    def test_search_comments(self, authenticated_client, post, user):
+        comment = mixer.blend(Comment, author=user, post=post, content='Excelente receta')
+        mixer.blend(Comment, author=user, post=post, content='Otro tema')
+
+        response = authenticated_client.get(reverse('post-search'), {'q': 'receta', 'type': 'comments'})
+        assert [c['id'] for c in response.data['results']] == [comment.id]
+
+    def test_search_vector_follows_updates(self, post):
+        post.content = 'Contenido actualizado'
+        post.save()
+        assert list(Post.objects.search('actualizado')) == [post]
+
+    def test_search_requires_query(self, authenticated_client):
+        response = authenticated_client.get(reverse('post-search'))
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_bulk_create_posts(self, client, user):
+        admin = mixer.blend(User, is_staff=True)
+        client.force_authenticate(user=admin)
+        rows = [
+            {'author_id': user.id, 'content': 'Imported 1', 'created_at': '2023-10-01T10:00:00Z'},
+            {'author_id': user.id, 'content': ' '},
+            {'author_id': 999999, 'content': 'Unknown author'},
+            {'author_id': user.id, 'content': 'Imported 2'},
+        ]
+
+        response = client.post(reverse('post-bulk'), rows, format='json')
+        assert response.status_code == status.HTTP_207_MULTI_STATUS
+        assert response.data['created'] == 2
+        assert [e['row'] for e in response.data['errors']] == [2, 3]
+        assert Post.objects.filter(author=user).count() == 2
+        assert UserStats.objects.get(pk=user.id).total_posts == 2
+        assert Post.objects.search('imported').count() == 2
+
+    def test_bulk_create_comments(self, client, post, user):
+        admin = mixer.blend(User, is_staff=True)
+        client.force_authenticate(user=admin)
+        rows = [{'author_id': user.id, 'post_id': post.id, 'content': f'Comment {i}'} for i in range(3)]
+        rows.append({'author_id': user.id, 'post_id': 999999, 'content': 'Orphan'})
+
+        response = client.post(reverse('comment-bulk'), rows, format='json')
+        assert response.data['created'] == 3
+        assert response.data['errors'] == [{'row': 4, 'errors': {'post_id': ['Post does not exist.']}}]
+        assert UserStats.objects.get(pk=user.id).total_comments == 3
+
+    def test_bulk_create_requires_admin(self, authenticated_client, user):
+        response = authenticated_client.post(reverse('post-bulk'), [{'author_id': user.id, 'content': 'x'}], format='json')
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_import_content_command(self, tmp_path, user):
+        follower = mixer.blend(User)
+        user.followers.add(follower)
+        path = tmp_path / 'posts.jsonl'
+        path.write_text('\n'.join([
+            json.dumps({'author_id': user.id, 'content': 'From file'}),
+            'not json',
+            json.dumps({'author_id': user.id, 'content': 'Also from file'}),
+        ]))
+        errors = StringIO()
+
+        call_command('import_content', 'posts', str(path), '--chunk-size', '2', stdout=StringIO(), stderr=errors)
+        assert Post.objects.filter(author=user).count() == 2
+        assert TimelineEntry.objects.filter(owner=follower).count() == 2
+        assert json.loads(errors.getvalue()) == {'row': 2, 'errors': {'non_field_errors': ['Invalid row.']}}
+
+    def test_import_content_command_csv(self, tmp_path, user, post):
+        path = tmp_path / 'comments.csv'
+        path.write_text(f'author_id,post_id,content,created_at\n{user.id},{post.id},Hola,\n{user.id},{post.id},Chau,2023-10-01T10:00:00\n')
+
+        call_command('import_content', 'comments', str(path), stdout=StringIO(), stderr=StringIO())
+        assert post.comments.count() == 2
+
+    def test_export_posts(self, client, user, setup_posts):
+        admin = mixer.blend(User, is_staff=True)
+        client.force_authenticate(user=admin)
+
+        response = client.get(reverse('post-export'), {'from_date': '2023-10-02'})
+        assert response.status_code == status.HTTP_200_OK
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        assert [row['content'] for row in rows] == ['Post 2']
+        assert set(rows[0]) == {'id', 'author_id', 'content', 'created_at'}
+
+    def test_export_comments_gzip(self, client, post, user):
+        admin = mixer.blend(User, is_staff=True)
+        client.force_authenticate(user=admin)
+        mixer.cycle(3).blend(Comment, author=user, post=post)
+
+        response = client.get(reverse('post-export'), {'type': 'comments', 'compress': 'gzip'})
+        assert response['Content-Encoding'] == 'gzip'
+        lines = gzip.decompress(b''.join(response.streaming_content)).splitlines()
+        assert [json.loads(line)['post_id'] for line in lines] == [post.id] * 3
+
+    def test_export_invalid_date(self, client):
+        client.force_authenticate(user=mixer.blend(User, is_staff=True))
+        response = client.get(reverse('post-export'), {'to_date': '02/10/2023'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_export_posts_command(self, tmp_path, user, setup_posts):
+        path = tmp_path / 'posts.ndjson.gz'
+        call_command('export_posts', '--author-id', str(user.id), '--gzip', '--output', str(path))
+        rows = [json.loads(line) for line in gzip.decompress(path.read_bytes()).splitlines()]
+        assert sorted(row['content'] for row in rows) == ['Post 1', 'Post 2']
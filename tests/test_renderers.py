@@ -0,0 +1,136 @@
+import io
+import os
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from io import StringIO
+from zoneinfo import ZoneInfo
+import django
+import pytest
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone as django_timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from apps.post.bench import json_throughput
+from utils.renderers import ORJSONParser, ORJSONRenderer
+from .conftests import user, post
+
+os.environ['DJANGO_SETTINGS_MODULE'] = 'core.settings'
+django.setup()
+
+
+@dataclass
+class Point:
+    x: int
+
+
+def payload():
+    moment = datetime(2024, 3, 1, 12, 30, 5, 123456, tzinfo=timezone.utc)
+    return {
+        'utc': moment,
+        'local': moment.astimezone(ZoneInfo('America/Argentina/Buenos_Aires')),
+        'current': django_timezone.localtime(moment),
+        'naive': datetime(2024, 3, 1, 12, 30),
+        'date': date(2024, 3, 1),
+        'time': time(9, 15, 0, 500),
+        'duration': timedelta(minutes=90),
+        'lazy': gettext_lazy('This field is required.'),
+        'decimal': Decimal('12.50'),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'set': {3},
+        'bytes': b'abc',
+        'text': 'ñandú ☃ 😀 "quoted" \\ \n \u2028 \u2029 </script>',
+        'nested': [{'id': 1, 'ok': True, 'none': None}, (1, 2), []],
+        'big': 2 ** 64,
+        'negative': -2 ** 63,
+    }
+
+
+@pytest.mark.parametrize('time_zone', ['America/Argentina/Buenos_Aires', 'UTC'])
+def test_renders_the_same_bytes_as_drf(time_zone):
+    with override_settings(TIME_ZONE=time_zone):
+        data = payload()
+        assert ORJSONRenderer().render(data) == JSONRenderer().render(data)
+
+
+@pytest.mark.parametrize('data', [
+    {'huge': 2 ** 70},
+    {1: 'integer key'},
+    None,
+])
+def test_falls_back_to_drf(data):
+    assert ORJSONRenderer().render(data) == JSONRenderer().render(data)
+
+
+def test_indented_output_falls_back_to_drf():
+    data = {'a': [1, 2]}
+    context = {'indent': 2}
+    expected = JSONRenderer().render(data, 'application/json', context)
+    assert ORJSONRenderer().render(data, 'application/json', context) == expected
+    assert ORJSONRenderer().render(data, 'application/json; indent=4') == JSONRenderer().render(data, 'application/json; indent=4')
+
+
+def test_dataclasses_fail_as_with_drf():
+    with pytest.raises(TypeError):
+        JSONRenderer().render({'point': Point(1)})
+    with pytest.raises(TypeError):
+        ORJSONRenderer().render({'point': Point(1)})
+
+
+def parse(parser, body, encoding='utf-8'):
+    return parser.parse(io.BytesIO(body), parser_context={'encoding': encoding})
+
+
+@pytest.mark.parametrize('body', [
+    b'{"a": [1, 2.5, -3e2, true, null], "b": "\\u00f1 \xc3\xb1", "a": "last"}',
+    b'[18446744073709551616, -9223372036854775809, 12345678901234567890123]',
+    b'  "text"  ',
+])
+def test_parses_the_same_data_as_drf(body):
+    data = parse(ORJSONParser(), body)
+    assert data == parse(JSONParser(), body)
+    assert [type(item) for item in data] == [type(item) for item in parse(JSONParser(), body)]
+
+
+@pytest.mark.parametrize('body', [b'{"a": NaN}', b'{"a": ', b'\xff'])
+def test_parse_errors_match_drf(body):
+    with pytest.raises(ParseError) as expected:
+        parse(JSONParser(), body)
+    with pytest.raises(ParseError) as error:
+        parse(ORJSONParser(), body)
+    assert error.value.detail == expected.value.detail
+
+
+def test_other_encodings():
+    assert parse(ORJSONParser(), '{"a": "ñ"}'.encode('latin-1'), 'latin-1') == {'a': 'ñ'}
+
+
+@pytest.mark.django_db
+class TestAPI:
+
+    @pytest.fixture
+    def client(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+    def test_responses_use_orjson(self, client, user, post):
+        response = client.get(reverse('post-list'))
+        assert isinstance(response.accepted_renderer, ORJSONRenderer)
+        assert response.content == JSONRenderer().render(response.data)
+
+        data = {'content': 'ñandú ☃', 'author': user.id}
+        response = client.post(reverse('post-list'), data, format='json')
+        assert response.status_code == 201
+        assert response.json()['content'] == 'ñandú ☃'
+
+    def test_benchmark(self, post):
+        results = json_throughput(limit=10, repeat=1)
+        assert all(result['same'] for result in results.values())
+        call_command('bench_json', limit=10, repeat=1, stdout=StringIO())
@@ -0,0 +1,102 @@
+import os
+import django
+import pytest
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from apps.post.models import Post
+from utils import db
+from utils.cache import response_cache
+from .conftests import user, post
+
+os.environ['DJANGO_SETTINGS_MODULE'] = 'core.settings'
+django.setup()
+
+# A second connection to the test database stands in for a replica: reads
+# sent to it show up on its own connection.
+if 'replica' not in connections:
+    connections.settings['replica'] = {
+        **connections['default'].settings_dict,
+        'TEST': {**connections['default'].settings_dict['TEST'], 'MIRROR': 'default'},
+    }
+
+
+def reads(capture, table):
+    return [query['sql'] for query in capture.captured_queries if query['sql'].startswith('SELECT') and table in query['sql']]
+
+
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica'])
+class TestReplicaRouting:
+
+    @pytest.fixture(autouse=True)
+    def replicas(self):
+        cache.clear()
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        db.replica_lag.reset()
+        with override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=5):
+            yield
+        db.replica_lag.reset()
+
+    @pytest.fixture
+    def client(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+    def get(self, client, url):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = client.get(url)
+        assert response.status_code == 200
+        return primary, replica
+
+    def test_reads_go_to_the_replica(self, client, post):
+        primary, replica = self.get(client, reverse('post-list'))
+        assert reads(replica, 'post_post')
+        assert not reads(primary, 'post_post')
+
+    def test_reads_outside_requests_use_the_primary(self, post):
+        assert Post.objects.all().db == 'default'
+
+    def test_writes_pin_the_user_to_the_primary(self, client, user, post):
+        response = client.post(reverse('post-list'), {'content': 'nuevo', 'author': user.id}, format='json')
+        assert response.status_code == 201
+        assert cache.get(db.pin_key(user.id))
+
+        primary, replica = self.get(client, reverse('post-list'))
+        assert reads(primary, 'post_post')
+        assert not reads(replica, 'post_post')
+
+        # Once the pin expires, reads are back on the replica.
+        cache.delete(db.pin_key(user.id))
+        primary, replica = self.get(client, reverse('post-list'))
+        assert reads(replica, 'post_post')
+
+    def test_recently_changed_objects_are_read_from_the_primary(self, client, post):
+        response_cache.invalidate(('post', post.id))
+        primary, replica = self.get(client, reverse('post-detail', args=[post.id]))
+        assert reads(primary, 'post_post')
+        assert not reads(replica, 'post_post')
+        # Built from the primary, so it could be cached.
+        primary, replica = self.get(client, reverse('post-detail', args=[post.id]))
+        assert not reads(primary, 'post_post') and not reads(replica, 'post_post')
+
+    def test_lagging_replica_falls_back_to_the_primary(self, client, post, monkeypatch):
+        monkeypatch.setattr(db, 'measure_lag', lambda alias: 30.0)
+        primary, replica = self.get(client, reverse('post-list'))
+        assert reads(primary, 'post_post')
+        assert not replica.captured_queries
+
+    def test_unreachable_replica_falls_back_to_the_primary(self, client, post):
+        with override_settings(DATABASE_REPLICAS=['missing']):
+            connections.settings['missing'] = {**connections['default'].settings_dict, 'PORT': '1'}
+            try:
+                response = client.get(reverse('post-list'))
+            finally:
+                connections['missing'].close()
+                del connections.settings['missing']
+        assert response.status_code == 200
@@ -0,0 +1,144 @@
+import os
+import time
+import django
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from mixer.backend.django import mixer
+from apps.post.views import AsyncPostList, PostList
+from utils import throttling
+from utils.throttling import CacheBucketStore, MemoryBucketStore, TokenBucketThrottle, parse_rate
+from .conftests import user, post
+
+os.environ['DJANGO_SETTINGS_MODULE'] = 'core.settings'
+django.setup()
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1700000000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(throttling, 'time', clock)
+    return clock
+
+
+@pytest.fixture(autouse=True)
+def buckets():
+    caches['default'].clear()
+    throttling.get_store('memory').clear()
+
+
+def test_parse_rate():
+    assert parse_rate('120/min') == (120, 0.5)
+    assert parse_rate('20/hour') == (20, 180.0)
+
+
+@pytest.mark.parametrize('store', [MemoryBucketStore(), CacheBucketStore('default')], ids=['memory', 'cache'])
+def test_token_bucket(store, clock):
+    assert [store.consume('k', 3, 1.0) for _ in range(3)] == [0, 0, 0]
+    assert store.consume('k', 3, 1.0) == pytest.approx(1.0)
+    # Other keys have their own bucket.
+    assert store.consume('other', 3, 1.0) == 0
+
+    clock.now += 1
+    assert store.consume('k', 3, 1.0) == 0
+    assert store.consume('k', 3, 1.0) == pytest.approx(1.0)
+
+    # Refilled up to the capacity, not beyond.
+    clock.now += 60
+    assert [store.consume('k', 3, 1.0) for _ in range(4)][-1] == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize('store', [MemoryBucketStore(), CacheBucketStore('default')], ids=['memory', 'cache'])
+def test_token_bucket_async(store, clock):
+    consume = async_to_sync(store.aconsume)
+    assert [consume('k', 3, 1.0) for _ in range(3)] == [0, 0, 0]
+    assert consume('k', 3, 1.0) == pytest.approx(1.0)
+    # Shares the buckets with consume().
+    assert store.consume('k', 3, 1.0) == pytest.approx(1.0)
+
+    clock.now += 1
+    assert consume('k', 3, 1.0) == 0
+    assert consume('k', 3, 1.0) == pytest.approx(1.0)
+
+
+@pytest.mark.django_db
+class TestThrottledViews:
+
+    @pytest.fixture
+    def client(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+    @override_settings(THROTTLE_RATES={'posts.read': '2/min', 'comments.read': '2/min'})
+    def test_limit_per_user_and_endpoint(self, client, post):
+        assert client.get(reverse('post-list')).status_code == 200
+        assert client.get(reverse('post-detail', args=[post.id])).status_code == 200
+        response = client.get(reverse('post-list'))
+        assert response.status_code == 429
+        assert response['Retry-After'] == '30'
+
+        # Another endpoint, and another user, have their own buckets.
+        assert client.get(reverse('comment-list', args=[post.id])).status_code == 200
+        other = APIClient()
+        other.force_authenticate(user=mixer.blend('user.User'))
+        assert other.get(reverse('post-list')).status_code == 200
+
+    @override_settings(THROTTLE_RATES={'posts.read': '300/min', 'posts.write': '1/min'})
+    def test_limit_per_method(self, client, user):
+        data = {'content': 'hola', 'author': user.id}
+        assert client.post(reverse('post-list'), data, format='json').status_code == 201
+        assert client.post(reverse('post-list'), data, format='json').status_code == 429
+        assert client.get(reverse('post-list')).status_code == 200
+
+    @override_settings(THROTTLE_RATES={'users.write': '1/hour'})
+    def test_anonymous_clients_by_ip(self):
+        client = APIClient()
+        data = {'username': 'ana', 'email': 'ana@example.com', 'password': 'secreta123'}
+        assert client.post(reverse('user-list'), data, format='json').status_code != 429
+        data.update(username='beto', email='beto@example.com')
+        assert client.post(reverse('user-list'), data, format='json').status_code == 429
+        assert client.post(reverse('user-list'), data, format='json', REMOTE_ADDR='10.0.0.2').status_code != 429
+
+    @override_settings(THROTTLE_STORE='cache', THROTTLE_RATES={'posts.read': '2/min'})
+    def test_async_views_await_the_store(self, user, monkeypatch):
+        def blocking(*args):
+            raise AssertionError('blocking cache call on the event loop')
+        monkeypatch.setattr(CacheBucketStore, 'consume', blocking)
+
+        view = AsyncPostList.as_view()
+        statuses = []
+        for _ in range(3):
+            request = APIRequestFactory().get('/api/posts/')
+            force_authenticate(request, user=user)
+            statuses.append(async_to_sync(view)(request).status_code)
+        assert statuses == [200, 200, 429]
+
+    @override_settings(THROTTLE_ENABLED=False, THROTTLE_RATES={'posts.read': '1/min'})
+    def test_disabled(self, client):
+        assert all(client.get(reverse('post-list')).status_code == 200 for _ in range(3))
+
+
+@pytest.mark.parametrize('store', ['memory', 'cache'])
+def test_overhead_under_a_millisecond(store, user):
+    request = APIRequestFactory().get('/api/posts/')
+    request.user = user
+    view = PostList()
+    iterations = 2000
+    with override_settings(THROTTLE_STORE=store, THROTTLE_RATES={'posts.read': f'{iterations * 10}/min'}):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            assert TokenBucketThrottle().allow_request(request, view)
+        elapsed = time.perf_counter() - started
+    assert elapsed / iterations < 0.001
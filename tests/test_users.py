@@ -1,11 +1,20 @@
 import os
+from io import StringIO
 import django
 import pytest
 from django.conf import settings
 from rest_framework import status
 from rest_framework.test import APIClient
-from apps.user.models import User
-from apps.post.models import Post
+from apps.user.models import Follow, User, UserStats
+from apps.post.models import Comment, Post, TimelineEntry
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models.signals import m2m_changed
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from mixer.backend.django import mixer
 from django.urls import reverse
 from .conftests import user
@@ -58,3 +67,305 @@ class TestUserAPI:
         response = client.get(reverse('user-detail', args=[user.id]))
         assert response.status_code == status.HTTP_200_OK
         assert response.data['username'] == user.username
+
+    def test_user_stats_follow_counters(self, client):
+        user1 = mixer.blend(User)
+        user2 = mixer.blend(User)
+        client.force_authenticate(user=user1)
+
+        client.post(f'/api/users/{user1.id}/follow/{user2.id}/')
+        assert UserStats.objects.get(pk=user1.id).total_following == 1
+        assert UserStats.objects.get(pk=user2.id).total_followers == 1
+
+        user1.following.remove(user2)
+        assert UserStats.objects.get(pk=user2.id).total_followers == 0
+        assert UserStats.objects.get(pk=user1.id).total_following == 0
+
+    def test_user_stats_content_counters(self, client):
+        user = mixer.blend(User)
+        post = Post.objects.create(author=user, content='Test post')
+        Comment.objects.create(author=user, post=post, content='Comment')
+        client.force_authenticate(user=user)
+
+        response = client.get(f'/api/users/{user.id}/')
+        assert (response.data['total_posts'], response.data['total_comments']) == (1, 1)
+
+        post.delete()
+        stats = UserStats.objects.get(pk=user.id)
+        assert (stats.total_posts, stats.total_comments) == (0, 0)
+
+    def test_rebuild_user_stats_command(self):
+        user = mixer.blend(User)
+        Post.objects.create(author=user, content='Test post')
+        UserStats.objects.filter(pk=user.id).update(total_posts=10)
+
+        with pytest.raises(CommandError):
+            call_command('rebuild_user_stats', '--check', stdout=StringIO())
+        call_command('rebuild_user_stats', stdout=StringIO())
+        call_command('rebuild_user_stats', '--check', stdout=StringIO())
+        assert UserStats.objects.get(pk=user.id).total_posts == 1
+
+    def test_bulk_create_follows(self, client):
+        admin = mixer.blend(User, is_staff=True)
+        user1, user2, user3 = mixer.cycle(3).blend(User)
+        user1.following.add(user2)
+        post = Post.objects.create(author=user3, content='Antes de seguir')
+        client.force_authenticate(user=admin)
+        rows = [
+            {'follower_id': user1.id, 'followed_id': user2.id},
+            {'follower_id': user1.id, 'followed_id': user3.id},
+            {'follower_id': user3.id, 'followed_id': user3.id},
+            {'follower_id': user2.id, 'followed_id': 'abc'},
+        ]
+
+        response = client.post(reverse('follow-bulk'), rows, format='json')
+        assert response.status_code == status.HTTP_207_MULTI_STATUS
+        assert response.data['created'] == 1
+        assert [e['row'] for e in response.data['errors']] == [3, 4]
+        assert set(user1.following.all()) == {user2, user3}
+        assert UserStats.objects.get(pk=user1.id).total_following == 2
+        assert UserStats.objects.get(pk=user3.id).total_followers == 1
+        # Same timeline backfill as following through the API.
+        assert TimelineEntry.objects.filter(owner=user1, post=post).exists()
+
+    def test_user_followers_pagination(self, client):
+        user = mixer.blend(User)
+        followers = mixer.cycle(5).blend(User)
+        for follower in followers:
+            follower.following.add(user)
+        client.force_authenticate(user=user)
+
+        seen, url = [], reverse('user-followers', args=[user.id])
+        params = {'page_size': 2}
+        while url:
+            response = client.get(url, params)
+            assert response.status_code == status.HTTP_200_OK
+            assert len(response.data['results']) <= 2
+            seen += [u['id'] for u in response.data['results']]
+            url, params = response.data['next'], None
+        assert seen == [f.id for f in reversed(followers)]
+
+        response = client.get(reverse('user-detail', args=[user.id]))
+        assert response.data['total_followers'] == 5
+        assert 'followers' not in response.data
+
+    def test_user_following(self, client):
+        user1, user2, user3 = mixer.cycle(3).blend(User)
+        user1.following.add(user2)
+        user1.following.add(user3)
+        client.force_authenticate(user=user1)
+
+        response = client.get(reverse('user-following', args=[user1.id]))
+        assert [u['id'] for u in response.data['results']] == [user3.id, user2.id]
+        assert client.get(reverse('user-followers', args=[user1.id])).data['results'] == []
+        assert client.get(reverse('user-following', args=[0])).status_code == status.HTTP_404_NOT_FOUND
+        response = client.get(reverse('user-following', args=[user1.id]), {'cursor': 'bogus'})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_user_queries_do_not_grow_with_users(self, client):
+        users = mixer.cycle(3).blend(User)
+        client.force_authenticate(user=users[0])
+
+        def queries(url):
+            caches[settings.RESPONSE_CACHE_ALIAS].clear()
+            with CaptureQueriesContext(connection) as ctx:
+                assert client.get(url).status_code == status.HTTP_200_OK
+            return len(ctx.captured_queries)
+
+        few = queries(reverse('user-list'))
+        mixer.cycle(10).blend(User)
+        assert queries(reverse('user-list')) == few
+        # The user and its counters in one query.
+        assert queries(reverse('user-detail', args=[users[1].id])) == 1
+
+    def test_jwt_user_is_cached(self, client):
+        user = mixer.blend(User, is_active=True)
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        caches['default'].clear()
+        client.get(reverse('user-detail', args=[user.id]))
+
+        # Both the payload and the authenticated user come from the cache.
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(reverse('user-detail', args=[user.id]))
+        assert response.status_code == status.HTTP_200_OK
+        assert len(ctx.captured_queries) == 0
+
+        # Only what requests need is cached, never the password hash.
+        entry = caches['default'].get(f'auth:user:{user.id}')
+        assert entry == {'fields': [user.id, user.username, True, False, False], 'revoke_hash': None}
+        response = client.post(reverse('post-list'), {'content': 'Escrito con el usuario cacheado'})
+        assert response.status_code == status.HTTP_201_CREATED
+        password = user.password
+        user.refresh_from_db()
+        assert user.password == password and user.posts.count() == 1
+
+    def test_jwt_cached_user_checks_revoked_tokens(self, client, monkeypatch):
+        # simplejwt modules keep the api_settings object they imported.
+        monkeypatch.setattr(jwt_settings, 'CHECK_REVOKE_TOKEN', True)
+        user = mixer.blend(User, is_active=True)
+        user.set_password('vieja')
+        user.save()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        caches['default'].clear()
+        assert client.get(reverse('user-detail', args=[user.id])).status_code == status.HTTP_200_OK
+        assert 'vieja' not in str(caches['default'].get(f'auth:user:{user.id}'))
+        assert user.password not in str(caches['default'].get(f'auth:user:{user.id}'))
+        assert client.get(reverse('user-detail', args=[user.id])).status_code == status.HTTP_200_OK
+
+        user.set_password('nueva')
+        user.save()
+        assert client.get(reverse('user-detail', args=[user.id])).status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_jwt_cached_user_is_dropped_on_deactivation(self, client):
+        user = mixer.blend(User, is_active=True)
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        assert client.get(reverse('user-detail', args=[user.id])).status_code == status.HTTP_200_OK
+
+        user.is_active = False
+        user.save()
+        assert client.get(reverse('user-detail', args=[user.id])).status_code == status.HTTP_401_UNAUTHORIZED
+
+        user.delete()
+        assert client.get(reverse('user-list')).status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+class TestFollowGraph:
+
+    @pytest.fixture
+    def users(self):
+        return mixer.cycle(4).blend(User)
+
+    @pytest.fixture
+    def client(self, users):
+        client = APIClient()
+        client.force_authenticate(user=users[0])
+        return client
+
+    def stats(self, user):
+        stats = UserStats.objects.get(pk=user.id)
+        return stats.total_followers, stats.total_following
+
+    def test_follow_in_one_query(self, client, users):
+        me, other = users[:2]
+        post = Post.objects.create(author=other, content='Antes de seguir')
+        url = reverse('follow-user', args=[me.id, other.id])
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.post(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['success'] == f'Now following user {other.username}'
+        assert len(ctx.captured_queries) == 1
+        assert self.stats(me) == (0, 1) and self.stats(other) == (1, 0)
+        assert TimelineEntry.objects.filter(owner=me, post=post).exists()
+
+        # Idempotent.
+        assert client.post(url).status_code == status.HTTP_200_OK
+        assert self.stats(me) == (0, 1) and self.stats(other) == (1, 0)
+
+    def test_follow_errors(self, client, users):
+        assert client.post(reverse('follow-user', args=[users[0].id, 999999])).status_code == status.HTTP_404_NOT_FOUND
+        assert client.post(reverse('follow-user', args=[users[0].id, users[0].id])).status_code == status.HTTP_400_BAD_REQUEST
+        assert not Follow.objects.exists()
+
+    def test_unfollow(self, client, users):
+        me, other, third = users[:3]
+        Post.objects.create(author=other, content='Publicación')
+        own = Post.objects.create(author=me, content='Propia')
+        TimelineEntry.objects.fan_out(own)
+        me.following.add(other, third)
+        assert TimelineEntry.objects.filter(owner=me).count() == 2
+
+        url = reverse('follow-user', args=[me.id, other.id])
+        with CaptureQueriesContext(connection) as ctx:
+            assert client.delete(url).status_code == status.HTTP_200_OK
+        assert len(ctx.captured_queries) == 1
+        assert list(me.following.all()) == [third]
+        assert self.stats(me) == (0, 1) and self.stats(other) == (0, 0)
+        assert list(TimelineEntry.objects.filter(owner=me).values_list('post_id', flat=True)) == [own.id]
+
+        assert client.delete(url).status_code == status.HTTP_200_OK
+        assert self.stats(me) == (0, 1)
+
+    def test_batch_follow(self, client, users):
+        me = users[0]
+        me.following.add(users[1])
+        ids = [users[1].id, users[2].id, 999999, users[3].id, users[2].id]
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.post(reverse('follow-batch'), {'ids': ids}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert len(ctx.captured_queries) == 1
+        assert response.data == {
+            'followed': [users[2].id, users[3].id], 'already_following': [users[1].id], 'not_found': [999999],
+        }
+        assert self.stats(me) == (0, 3)
+        assert [self.stats(user)[0] for user in users[1:]] == [1, 1, 1]
+
+        response = client.post(reverse('follow-batch'), {'ids': [me.id]}, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        with override_settings(FOLLOW_BATCH_MAX_IDS=2):
+            response = client.post(reverse('follow-batch'), {'ids': ids}, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_related_managers_are_reconciled(self, users):
+        me, other, third, fourth = users
+        post = Post.objects.create(author=other, content='Antes de seguir')
+        added = []
+
+        def receiver(action, pk_set, **kwargs):
+            if action == 'post_add':
+                added.append(set(pk_set))
+        m2m_changed.connect(receiver, sender=Follow)
+        try:
+            me.following.add(other, third)
+        finally:
+            m2m_changed.disconnect(receiver, sender=Follow)
+        # Other receivers still see the edges that were added.
+        assert added == [{other.id, third.id}]
+        fourth.followers.add(me, other)
+        assert self.stats(me) == (0, 3) and self.stats(other) == (1, 1) and self.stats(fourth) == (2, 0)
+        assert TimelineEntry.objects.filter(owner=me, post=post).exists()
+
+        me.following.remove(other)
+        assert self.stats(me) == (0, 2) and self.stats(other) == (0, 1)
+        assert not TimelineEntry.objects.filter(owner=me, post=post).exists()
+
+        fourth.followers.clear()
+        assert self.stats(fourth) == (0, 0) and self.stats(me) == (0, 1) and self.stats(other) == (0, 0)
+        me.following.set([other])
+        assert list(me.following.all()) == [other]
+        assert self.stats(me) == (0, 1) and self.stats(third) == (0, 0)
+        call_command('rebuild_user_stats', '--check', stdout=StringIO())
+
+    def test_follow_rebuilds_missing_counters(self, users):
+        me, other = users[:2]
+        UserStats.objects.filter(pk__in=[me.id, other.id]).delete()
+        Follow.objects.follow(me.id, [other.id])
+        assert self.stats(me) == (0, 1) and self.stats(other) == (1, 0)
+
+    def test_relationships(self, client, users):
+        me, other, third, fourth = users
+        me.following.add(other, third)
+        fourth.following.add(me)
+        other.following.add(me)
+        ids = f'{fourth.id},{other.id},999999,{third.id}'
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(f"{reverse('user-relationships')}?ids={ids}")
+        assert len(ctx.captured_queries) == 1
+        assert response.data['results'] == [
+            {'id': fourth.id, 'following': False, 'followed_by': True},
+            {'id': other.id, 'following': True, 'followed_by': True},
+            {'id': third.id, 'following': True, 'followed_by': False},
+        ]
+        for ids in ('', 'a,b', '0'):
+            response = client.get(f"{reverse('user-relationships')}?ids={ids}")
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_mutual_followers(self, client, users):
+        me, other, third, fourth = users
+        for follower in (third, fourth):
+            follower.following.add(other)
+        third.following.add(me)
+        response = client.get(reverse('user-mutual-followers', args=[other.id]))
+        assert response.status_code == status.HTTP_200_OK
+        assert [user['id'] for user in response.data['results']] == [third.id]
+
@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import authentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+# What the request path reads from request.user. The rest of the row (the
+# password hash among it) never goes to the cache; it is loaded on access.
+CACHED_USER_FIELDS = ('id', 'username', 'is_active', 'is_staff', 'is_superuser')
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def forget_user(user_id):
+    """
+    Drops the cached copy of a user, now and again once the current
+    transaction commits, so a request racing with the write can't cache the
+    old row back (e.g. after a password change or a deactivation).
+    """
+    cache = caches[settings.AUTH_USER_CACHE_ALIAS]
+    cache.delete(user_cache_key(user_id))
+    transaction.on_commit(lambda: cache.delete(user_cache_key(user_id)))
+
+
+class JWTAuthentication(authentication.JWTAuthentication):
+    """
+    simplejwt's authentication, resolving the token's user through the cache
+    (AUTH_USER_CACHE_TIMEOUT seconds, dropped by ``forget_user`` whenever the
+    user is saved or deleted) instead of querying it on every request.
+
+    The cache holds CACHED_USER_FIELDS and, with CHECK_REVOKE_TOKEN, the
+    password's revocation hash; cached users are rebuilt from those with
+    the other fields deferred.
+
+    ``aauthenticate`` is the same for AsyncAPIView, on the async cache and ORM.
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        entry = self.cache.get(user_cache_key(user_id))
+        if entry is None:
+            try:
+                user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found') from e
+            entry = self.cache_entry(user)
+            self.cache.set(user_cache_key(user_id), entry, settings.AUTH_USER_CACHE_TIMEOUT)
+        else:
+            user = self.cached_user(entry)
+
+        self.check_user(user, entry, validated_token)
+        return user
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        entry = await self.cache.aget(user_cache_key(user_id))
+        if entry is None:
+            try:
+                user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found') from e
+            entry = self.cache_entry(user)
+            await self.cache.aset(user_cache_key(user_id), entry, settings.AUTH_USER_CACHE_TIMEOUT)
+        else:
+            user = self.cached_user(entry)
+
+        self.check_user(user, entry, validated_token)
+        return user
+
+    def cache_entry(self, user):
+        return {
+            'fields': [getattr(user, field) for field in CACHED_USER_FIELDS],
+            'revoke_hash': get_md5_hash_password(user.password) if api_settings.CHECK_REVOKE_TOKEN else None,
+        }
+
+    def cached_user(self, entry):
+        # from_db() takes the values in concrete field order; the rest stay
+        # deferred, load on access and are not written back by save().
+        values = dict(zip(CACHED_USER_FIELDS, entry['fields']))
+        names = [f.attname for f in self.user_model._meta.concrete_fields if f.attname in values]
+        return self.user_model.from_db(None, names, [values[name] for name in names])
+
+    @property
+    def cache(self):
+        return caches[settings.AUTH_USER_CACHE_ALIAS]
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+    def check_user(self, user, entry, validated_token):
+        # The checks simplejwt's get_user runs once the user is loaded; a
+        # cached user still goes through them.
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != entry['revoke_hash']:
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
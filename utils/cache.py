@@ -0,0 +1,195 @@
+import hashlib
+import threading
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from utils.db import read_from_replica, use_primary
+
+
+class ResponseCache:
+    """
+    Caches serialized payloads keyed by view and object ID.
+
+    Every payload is stored with the version token of each object it embeds
+    (``('post', 1)``, ``('user', 7)``, ...). Writes call ``invalidate`` to
+    replace an object's token, so any payload built from the old state stops
+    validating on the next read. Tokens are random rather than incremental so
+    that a token dropped by the backend can never match an old payload again.
+
+    Tokens also carry the time they were issued, which makes them usable as
+    HTTP validators (``ETag``/``Last-Modified``) without building the payload.
+    """
+
+    def __init__(self, alias=None, timeout=None):
+        self._alias = alias
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(('hits', 'misses', 'evictions', 'invalidations'), 0)
+
+    @property
+    def cache(self):
+        return caches[self._alias or settings.RESPONSE_CACHE_ALIAS]
+
+    @property
+    def timeout(self):
+        return self._timeout if self._timeout is not None else settings.RESPONSE_CACHE_TIMEOUT
+
+    def payload_key(self, name, pk, query_params=None):
+        key = f'rc:p:{name}:{pk}'
+        if query_params:
+            key += ':' + self._digest(self._query_string(query_params))
+        return key
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return entry['data'] if entry is not None else None
+
+    def get_entry(self, key):
+        entry = self.cache.get(key)
+        if entry is None:
+            self._count('misses')
+            return None
+
+        deps = entry['versions']
+        current = self.cache.get_many(list(deps))
+        if any(current.get(version_key) != token for version_key, token in deps.items()):
+            self.cache.delete(key)
+            self._count('evictions')
+            self._count('misses')
+            return None
+
+        self._count('hits')
+        return entry
+
+    def set(self, key, data, deps, snapshot=None):
+        # ``snapshot`` holds versions read before the payload was built, so a
+        # write racing with the build leaves the entry already stale.
+        versions = self.versions(deps)
+        versions.update(snapshot or {})
+        etag, last_modified = self._fingerprint(versions, key)
+        entry = {'data': data, 'versions': versions, 'etag': etag, 'last_modified': last_modified}
+        if not (read_from_replica() and self._recently_changed(versions)):
+            self.cache.set(key, entry, self.timeout)
+        return entry
+
+    def versions(self, deps):
+        version_keys = [self._version_key(kind, pk) for kind, pk in set(deps)]
+        versions = self.cache.get_many(version_keys)
+        for version_key in version_keys:
+            if version_key not in versions:
+                self.cache.add(version_key, self._new_token(), None)
+                versions[version_key] = self.cache.get(version_key)
+        if self._recently_changed(versions):
+            use_primary()
+        return versions
+
+    def validators(self, deps, request):
+        """``(etag, last_modified)`` for a response built from ``deps``."""
+        return self._fingerprint(self.versions(deps), request.path + '?' + self._query_string(request.GET))
+
+    def invalidate(self, *deps):
+        """
+        Replaces the tokens of ``deps`` now and again once the current
+        transaction commits: a request reading the old rows between the two
+        would otherwise cache them under the new token.
+        """
+        self._bump(deps)
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: self._bump(deps))
+
+    def _bump(self, deps):
+        token = self._new_token()
+        self.cache.set_many({self._version_key(kind, pk): token for kind, pk in deps}, None)
+        self._count('invalidations', len(deps))
+
+    # Async views go through the cache backend the same way Django's own
+    # ``BaseCache.a*`` methods do.
+    async def aget_entry(self, key):
+        return await sync_to_async(self.get_entry)(key)
+
+    async def aset(self, key, data, deps, snapshot=None):
+        return await sync_to_async(self.set)(key, data, deps, snapshot)
+
+    async def aversions(self, deps):
+        return await sync_to_async(self.versions)(deps)
+
+    async def avalidators(self, deps, request):
+        return await sync_to_async(self.validators)(deps, request)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def reset_stats(self):
+        with self._lock:
+            for name in self._counters:
+                self._counters[name] = 0
+
+    def _recently_changed(self, versions):
+        # Objects changed within the lag replicas are allowed may not have
+        # reached them yet. Table tokens change with every write and are left
+        # out: lists may trail by up to that lag.
+        horizon = time.time() - settings.REPLICA_MAX_LAG
+        return any(
+            self._issued(token) > horizon
+            for version_key, token in versions.items()
+            if token and not version_key.startswith('rc:v:table:')
+        )
+
+    def _issued(self, token):
+        issued = (token or '').partition(':')[0]
+        return float(issued) if issued.replace('.', '', 1).isdigit() else 0
+
+    def _version_key(self, kind, pk):
+        return f'rc:v:{kind}:{pk}'
+
+    def _new_token(self):
+        return f'{time.time():.6f}:{uuid.uuid4().hex}'
+
+    def _fingerprint(self, versions, scope):
+        etag = self._digest(scope + '|' + '|'.join(f'{k}={versions[k]}' for k in sorted(versions)))
+        last_modified = int(max((self._issued(token) for token in versions.values()), default=0))
+        return etag, last_modified
+
+    def _query_string(self, query_params):
+        return '&'.join(f'{k}={v}' for k, v in sorted(query_params.lists()))
+
+    def _digest(self, value):
+        return hashlib.md5(value.encode()).hexdigest()
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+
+response_cache = ResponseCache()
+
+# Version tokens covering whole tables, for list endpoints.
+POSTS_TABLE = ('table', 'post')
+COMMENTS_TABLE = ('table', 'comment')
+USERS_TABLE = ('table', 'user')
+
+
+def conditional_response(request, etag, last_modified):
+    """
+    Returns a 304 (or 412) response when the request's validators still
+    match, otherwise None.
+    """
+    response = get_conditional_response(request, etag=quote_etag(etag), last_modified=last_modified or None)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = quote_etag(etag)
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
@@ -0,0 +1,196 @@
+"""
+Response compression.
+
+``CompressionMiddleware`` compresses responses with the best encoding the
+client accepts (``Accept-Encoding``, q-values included) among those
+available: brotli (``br``) and zstd when ``brotli``/``zstandard`` are
+installed, and gzip. On equal q-values, settings.COMPRESSION_ENCODINGS
+decides.
+
+Only the media types listed in settings.COMPRESSION_LEVELS are compressed,
+each with its own level per encoding. Responses below COMPRESSION_MIN_SIZE
+bytes, already encoded, marked ``no-transform`` or partial are sent as is.
+
+Streamed responses (sync or async) are compressed chunk by chunk, flushing
+after every chunk so clients get each one as soon as it is sent; they have
+no size to check against the threshold.
+
+Compressed responses get a weak ETag: the representation is no longer the
+same bytes, but ``If-None-Match`` still matches it.
+"""
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class GzipCodec:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk):
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, chunk=b''):
+        return self._compressor.compress(chunk) + self._compressor.flush()
+
+
+class BrotliCodec:
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, chunk):
+        return self._compressor.process(chunk) + self._compressor.flush()
+
+    def finish(self, chunk=b''):
+        return self._compressor.process(chunk) + self._compressor.finish()
+
+
+class ZstdCodec:
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, chunk):
+        return self._compressor.compress(chunk) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self, chunk=b''):
+        return self._compressor.compress(chunk) + self._compressor.flush()
+
+
+CODECS = {'gzip': GzipCodec}
+if brotli is not None:
+    CODECS['br'] = BrotliCodec
+if zstandard is not None:
+    CODECS['zstd'] = ZstdCodec
+
+
+def compress(data, encoding, level):
+    return CODECS[encoding](level).finish(data)
+
+
+def compress_stream(chunks, encoding, level):
+    codec = CODECS[encoding](level)
+    for chunk in chunks:
+        data = codec.compress(chunk)
+        if data:
+            yield data
+    yield codec.finish()
+
+
+async def acompress_stream(chunks, encoding, level):
+    codec = CODECS[encoding](level)
+    async for chunk in chunks:
+        data = codec.compress(chunk)
+        if data:
+            yield data
+    yield codec.finish()
+
+
+def parse_accept_encoding(header):
+    """``'gzip;q=0.5, br'`` -> ``{'gzip': 0.5, 'br': 1.0}``."""
+    accepted = {}
+    for part in header.split(','):
+        coding, *params = part.split(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def choose_encoding(header, encodings):
+    """The first of ``encodings`` with the highest quality in ``header``, or None."""
+    accepted = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compression_levels(content_type):
+    """``{encoding: level}`` for a Content-Type, or None if it isn't compressed."""
+    media_type = content_type.split(';')[0].strip().lower()
+    for prefix, levels in settings.COMPRESSION_LEVELS.items():
+        if media_type.startswith(prefix):
+            return levels
+    return None
+
+
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        if (
+            not settings.COMPRESSION_ENABLED
+            or response.status_code == 206
+            or response.has_header('Content-Encoding')
+            or 'no-transform' in response.get('Cache-Control', '')
+        ):
+            return response
+        levels = compression_levels(response.get('Content-Type', ''))
+        if levels is None:
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        available = [encoding for encoding in settings.COMPRESSION_ENCODINGS if encoding in CODECS and encoding in levels]
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), available)
+        if encoding is None:
+            return response
+        level = levels[encoding]
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_stream(response.streaming_content, encoding, level)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, encoding, level)
+            del response['Content-Length']
+        else:
+            content = compress(response.content, encoding, level)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,209 @@
+"""
+Read replicas.
+
+``ReplicaRouter`` sends reads to one of settings.DATABASE_REPLICAS, but only
+for requests ``ReplicaMiddleware`` lets through: safe methods (GET, HEAD,
+OPTIONS) under settings.REPLICA_PATHS. Writes, other requests, the admin and
+management commands stay on the primary. A request sticks to the replica it
+first read from.
+
+Read-your-writes: a request that writes (or an unsafe request that succeeds)
+pins its user to the primary for REPLICA_PIN_SECONDS, and once a request has
+written, its own later reads go to the primary too.
+
+Lag: each process checks how far behind a replica is at most every
+REPLICA_LAG_CHECK_INTERVAL seconds. Replicas behind by more than
+REPLICA_MAX_LAG seconds, or unreachable, are skipped; when none is left,
+reads go to the primary.
+"""
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.functional import SimpleLazyObject, empty
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Zero when the replica has replayed everything it received, so an idle
+# primary doesn't look like lag.
+LAG_QUERY = (
+    'SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END'
+)
+
+_current = ContextVar('db_routing', default=None)
+
+
+def pin_key(user_id):
+    return f'db:pin:{user_id}'
+
+
+def use_primary():
+    """Sends the rest of the current request's reads to the primary."""
+    routing = _current.get()
+    if routing is not None:
+        routing.allowed = False
+
+
+def read_from_replica():
+    routing = _current.get()
+    return routing is not None and routing.used_replica
+
+
+class RequestRouting:
+    def __init__(self, request, allowed):
+        self.request = request
+        self.allowed = allowed
+        self.alias = None
+        self.pin_checked = False
+        self.used_replica = False
+        self.wrote = False
+
+    def read_alias(self):
+        if not self.allowed or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if not self.pin_checked:
+            # The user is only known once the view has authenticated the
+            # request; reads before that (the JWT's user) can't be the
+            # user's own writes anyway.
+            user_id = request_user_id(self.request)
+            if user_id is not None:
+                self.pin_checked = True
+                if cache.get(pin_key(user_id)):
+                    self.allowed = False
+                    return DEFAULT_DB_ALIAS
+        if self.alias is None:
+            available = replica_lag.available(settings.DATABASE_REPLICAS)
+            if not available:
+                self.allowed = False
+                return DEFAULT_DB_ALIAS
+            self.alias = random.choice(available)
+        self.used_replica = True
+        return self.alias
+
+
+def request_user_id(request):
+    # Without resolving AuthenticationMiddleware's lazy user, which would
+    # query the session.
+    user = vars(request).get('user')
+    if isinstance(user, SimpleLazyObject):
+        user = None if user._wrapped is empty else user._wrapped
+    if user is None or not user.is_authenticated:
+        return None
+    return user.pk
+
+
+class ReplicaLag:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = {}
+
+    def available(self, aliases):
+        return [alias for alias in aliases if self.lag(alias) <= settings.REPLICA_MAX_LAG]
+
+    def lag(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            checked = self._checked.get(alias)
+        if checked is not None and now - checked[0] < settings.REPLICA_LAG_CHECK_INTERVAL:
+            return checked[1]
+        lag = measure_lag(alias)
+        with self._lock:
+            self._checked[alias] = (now, lag)
+        return lag
+
+    def reset(self):
+        with self._lock:
+            self._checked.clear()
+
+
+def measure_lag(alias):
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(LAG_QUERY)
+            return float(cursor.fetchone()[0])
+    except DatabaseError:
+        logger.warning('Replica %s is unreachable', alias, exc_info=True)
+        return float('inf')
+
+
+replica_lag = ReplicaLag()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _current.get()
+        return routing.read_alias() if routing is not None else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        routing = _current.get()
+        if routing is not None:
+            routing.wrote = True
+            routing.allowed = False
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        routing, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, routing, response)
+        return response
+
+    async def __acall__(self, request):
+        routing, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, routing, response)
+        return response
+
+    def start(self, request):
+        allowed = (
+            bool(settings.DATABASE_REPLICAS)
+            and request.method in SAFE_METHODS
+            and request.path.startswith(tuple(settings.REPLICA_PATHS))
+        )
+        routing = RequestRouting(request, allowed)
+        return routing, _current.set(routing)
+
+    def finish(self, request, routing, response):
+        if not settings.DATABASE_REPLICAS:
+            return
+        if routing.wrote or (request.method not in SAFE_METHODS and response.status_code < 400):
+            user_id = request_user_id(request)
+            if user_id is not None:
+                cache.set(pin_key(user_id), True, settings.REPLICA_PIN_SECONDS)
@@ -0,0 +1,102 @@
+"""
+Bulk ingestion of posts, comments and follow edges.
+
+Rows are plain dicts (decoded JSON objects or CSV records) and are processed
+in chunks: every chunk is validated in Python, its referenced user and post
+IDs are resolved with one query per table, and the valid rows are written
+in bulk. Each kind has a loader in its app (``LOADERS``), which takes a chunk
+of ``(line, row)`` pairs and returns ``(created, errors)``.
+
+Every call returns ``{'created': <int>, 'errors': [{'row': <n>, 'errors': {...}}]}``
+where ``row`` is the 1-based position of the offending row in the input.
+"""
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+
+CHUNK_SIZE = 1000
+MAX_API_ROWS = 10000
+
+LOADERS = {
+    'posts': 'apps.post.ingest.load_posts',
+    'comments': 'apps.post.ingest.load_comments',
+    'follows': 'apps.user.ingest.load_follows',
+}
+
+
+def ingest(kind, rows, chunk_size=CHUNK_SIZE, fan_out=True):
+    result = {'created': 0, 'errors': []}
+    for created, errors in iter_ingest(kind, rows, chunk_size, fan_out):
+        result['created'] += created
+        result['errors'] += errors
+    return result
+
+
+def iter_ingest(kind, rows, chunk_size=CHUNK_SIZE, fan_out=True):
+    """Yields ``(created, errors)`` per chunk, consuming ``rows`` lazily."""
+    load_chunk = import_string(LOADERS[kind])
+    numbered = enumerate(rows, start=1)
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            break
+        errors = [
+            {'row': line, 'errors': {'non_field_errors': ['Invalid row.']}}
+            for line, row in chunk if not isinstance(row, dict)
+        ]
+        with transaction.atomic():
+            created, chunk_errors = load_chunk([(line, row) for line, row in chunk if isinstance(row, dict)], fan_out=fan_out)
+        errors += chunk_errors
+        errors.sort(key=lambda error: error['row'])
+        yield created, errors
+
+
+def existing_ids(model, ids):
+    if not ids:
+        return set()
+    return set(model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+
+
+def _field(row, name):
+    value = row.get(name)
+    return None if value == '' else value
+
+
+def positive_int(row, name, errors):
+    value = _field(row, name)
+    if value is None:
+        errors[name] = ['This field is required.']
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        errors[name] = ['A valid integer is required.']
+        return None
+    if value <= 0:
+        errors[name] = ['Must be a positive integer.']
+        return None
+    return value
+
+
+def parse_content(row, errors):
+    value = _field(row, 'content')
+    if not isinstance(value, str) or not value.strip():
+        errors['content'] = ['Content cannot be empty']
+        return None
+    return value
+
+
+def parse_created_at(row, errors):
+    value = _field(row, 'created_at')
+    if value is None:
+        return timezone.now()
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        errors['created_at'] = ['Datetime has wrong format. Use ISO 8601.']
+        return None
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
@@ -0,0 +1,233 @@
+"""
+Non-blocking, structured logging.
+
+``QueueHandler`` only puts records on an in-memory queue; a ``QueueListener``
+thread takes them off and runs the real handlers (console, rotating file), so
+formatting and disk I/O no longer happen inside request latency. When the
+queue is full, records are dropped rather than blocking the request.
+
+``JSONFormatter`` writes one JSON object per line, including the ID of the
+request being served (see ``RequestIDMiddleware``) and any ``extra`` fields.
+``SamplingFilter`` keeps only a fraction of the INFO (and lower) records of
+selected loggers; warnings and errors always pass.
+
+Django calls ``configure_logging`` (settings.LOGGING_CONFIG) with
+settings.LOGGING and it starts the listeners once the handlers exist.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.config
+import logging.handlers
+import os
+import queue
+import random
+import re
+import threading
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+_valid_request_id = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+current_request_id = ContextVar('request_id', default=None)
+
+
+def configure_logging(config):
+    QueueHandler.stop_all()
+    logging.config.dictConfig(config)
+    QueueHandler.start_all()
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a background listener that runs the handlers named in
+    ``handlers`` (other handlers of the same LOGGING config).
+    """
+    instances = []
+    _lock = threading.Lock()
+
+    def __init__(self, handlers=(), queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        self.handler_names = list(handlers)
+        self.listener = None
+        self.dropped = 0
+        with self._lock:
+            self.instances.append(self)
+
+    def prepare(self, record):
+        # Only what can't wait: merge the arguments (they may be mutated
+        # after the call) and drop the traceback, which keeps frames alive.
+        # Formatting is left to the listener's handlers.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        handlers = [_handler_by_name(name) for name in self.handler_names]
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    @classmethod
+    def start_all(cls):
+        with cls._lock:
+            for handler in cls.instances:
+                if handler.listener is None:
+                    handler.start()
+
+    @classmethod
+    def stop_all(cls):
+        # Flushes whatever is still queued. Handlers dropped by a
+        # reconfiguration are forgotten.
+        with cls._lock:
+            for handler in cls.instances:
+                handler.stop()
+            cls.instances.clear()
+
+    @classmethod
+    def restart_all(cls):
+        # A forked child (e.g. gunicorn --preload) inherits the handlers but
+        # not the listener threads (nor a usable lock).
+        cls._lock = threading.Lock()
+        with cls._lock:
+            for handler in cls.instances:
+                handler.listener = None
+        cls.start_all()
+
+
+def _handler_by_name(name):
+    get_handler = getattr(logging, 'getHandlerByName', None)  # Python 3.12+
+    handler = get_handler(name) if get_handler else logging._handlers.get(name)
+    if handler is None:
+        raise ValueError(f"Unknown logging handler '{name}'")
+    return handler
+
+
+atexit.register(QueueHandler.stop_all)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=QueueHandler.restart_all)
+
+
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RequestIDFilter(logging.Filter):
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = current_request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    ``rates`` maps logger names to the fraction of their INFO-and-below
+    records to keep; a logger inherits the rate of its closest configured
+    ancestor and is kept in full when there is none.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = dict(rates or {})
+        self._resolved = {}
+
+    def filter(self, record):
+        if record.levelno > logging.INFO:
+            return True
+        rate = self.rate(record.name)
+        return rate >= 1 or random.random() < rate
+
+    def rate(self, name):
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            prefix = name
+            while prefix:
+                if prefix in self.rates:
+                    rate = float(self.rates[prefix])
+                    break
+                prefix = prefix.rpartition('.')[0]
+            self._resolved[name] = rate
+        return rate
+
+
+class RequestIDMiddleware:
+    """
+    Tags every request with an ID (the incoming X-Request-ID header when it
+    looks sane, a fresh one otherwise), available to log records and echoed
+    back in the response.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        request_id, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request_id.reset(token)
+        response[REQUEST_ID_HEADER] = request_id
+        return response
+
+    async def __acall__(self, request):
+        request_id, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request_id.reset(token)
+        response[REQUEST_ID_HEADER] = request_id
+        return response
+
+    def start(self, request):
+        request_id = request.headers.get(REQUEST_ID_HEADER, '')
+        if not _valid_request_id.match(request_id):
+            request_id = uuid.uuid4().hex
+        request.id = request_id
+        return request_id, current_request_id.set(request_id)
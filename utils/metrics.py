@@ -0,0 +1,264 @@
+"""
+Per-endpoint request metrics, kept in process and exported in the Prometheus
+text format at ``/metrics``.
+
+RequestMetricsMiddleware attributes every request to its resolved URL name
+(``post-list``, ``user-detail``, ...) and records its wall time, the number
+and total time of its database queries, the time spent rendering the
+response body and the body size. Requests over REQUEST_QUERY_BUDGET queries
+or REQUEST_LATENCY_BUDGET_MS milliseconds are logged.
+
+Queries are counted by an ``execute_wrapper`` installed on every database
+connection, reporting to the request that is current in the calling context,
+so the ORM calls async views make from their executor thread are counted too.
+
+The endpoint is off with METRICS_ENABLED = False; otherwise only staff users
+and clients from METRICS_ALLOWED_IPS can read it.
+
+The numbers are per process and are not aggregated: under gunicorn each
+worker keeps its own, and a scrape returns those of whichever worker answers
+it.
+"""
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+from rest_framework.views import APIView
+
+from utils.permissions import CanReadMetrics
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets, labels):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labels = labels
+        self._series = {}
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series.setdefault(labels, {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series['buckets'][i] += 1
+        series['sum'] += value
+        series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, series in sorted(self._series.items()):
+            pairs = list(zip(self.labels, labels))
+            for bound, count in zip(self.buckets, series['buckets']):
+                lines.append(f'{self.name}_bucket{_labels(pairs, le=_number(bound))} {count}')
+            lines.append(f'{self.name}_bucket{_labels(pairs, le="+Inf")} {series["count"]}')
+            lines.append(f'{self.name}_sum{_labels(pairs)} {_number(series["sum"])}')
+            lines.append(f'{self.name}_count{_labels(pairs)} {series["count"]}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._series = {}
+
+    def inc(self, labels, amount=1):
+        self._series[labels] = self._series.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self._series.items()):
+            lines.append(f'{self.name}{_labels(zip(self.labels, labels))} {_number(value)}')
+        return lines
+
+
+class RequestMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = Counter('http_requests_total', 'Requests served.', ('view', 'method', 'status'))
+            self.latency = Histogram(
+                'http_request_duration_seconds', 'Wall time of a request.', LATENCY_BUCKETS, ('view', 'method')
+            )
+            self.db_queries = Histogram(
+                'http_request_db_queries', 'Database queries run by a request.', QUERY_COUNT_BUCKETS, ('view', 'method')
+            )
+            self.db_time = Histogram(
+                'http_request_db_duration_seconds', 'Time a request spent in database queries.', LATENCY_BUCKETS,
+                ('view', 'method'),
+            )
+            self.render_time = Histogram(
+                'http_response_render_duration_seconds', 'Time spent rendering the response body.', LATENCY_BUCKETS,
+                ('view', 'method'),
+            )
+            self.response_size = Histogram(
+                'http_response_size_bytes', 'Size of the response body.', SIZE_BUCKETS, ('view', 'method')
+            )
+
+    def record(self, sample):
+        labels = (sample.view, sample.method)
+        with self._lock:
+            self.requests.inc((sample.view, sample.method, str(sample.status)))
+            self.latency.observe(labels, sample.duration)
+            self.db_queries.observe(labels, sample.queries)
+            self.db_time.observe(labels, sample.db_time)
+            if sample.render_time is not None:
+                self.render_time.observe(labels, sample.render_time)
+            if sample.size is not None:
+                self.response_size.observe(labels, sample.size)
+
+    def render(self):
+        with self._lock:
+            metrics = (self.requests, self.latency, self.db_queries, self.db_time, self.render_time, self.response_size)
+            return '\n'.join(line for metric in metrics for line in metric.render()) + '\n'
+
+
+request_metrics = RequestMetrics()
+
+
+class RequestSample:
+    __slots__ = ('view', 'method', 'status', 'started', 'duration', 'queries', 'db_time', 'render_time', 'size')
+
+    def __init__(self, method):
+        self.view = None
+        self.method = method
+        self.status = None
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = None
+        self.size = None
+
+
+_current_sample = ContextVar('request_metrics_sample', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    sample = _current_sample.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample.queries += 1
+        sample.db_time += time.perf_counter() - started
+
+
+def install_query_recorder(connection, **kwargs):
+    # First in the list, so ``with connection.execute_wrapper(...)`` blocks
+    # opened by other code still pop their own wrapper.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+connection_created.connect(install_query_recorder)
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        sample, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_sample.reset(token)
+        self.finish(request, response, sample)
+        return response
+
+    async def __acall__(self, request):
+        sample, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_sample.reset(token)
+        self.finish(request, response, sample)
+        return response
+
+    def start(self, request):
+        # Connections opened before this module was loaded never saw
+        # connection_created.
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+        sample = RequestSample(request.method)
+        return sample, _current_sample.set(sample)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; time that step.
+        sample = _current_sample.get()
+        if sample is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                sample.render_time = time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, sample):
+        sample.duration = time.perf_counter() - sample.started
+        match = getattr(request, 'resolver_match', None)
+        sample.view = (match.view_name if match else None) or 'unmatched'
+        sample.status = response.status_code
+        if not response.streaming:
+            sample.size = len(response.content)
+        request_metrics.record(sample)
+
+        latency_ms = sample.duration * 1000
+        if sample.queries > settings.REQUEST_QUERY_BUDGET or latency_ms > settings.REQUEST_LATENCY_BUDGET_MS:
+            logger.warning(
+                "Request over budget: %s %s (%s) took %.1f ms, %d queries in %.1f ms",
+                request.method, request.get_full_path(), sample.view, latency_ms, sample.queries,
+                sample.db_time * 1000,
+            )
+
+
+class MetricsView(APIView):
+    permission_classes = [CanReadMetrics]
+
+    def get(self, request):
+        if not settings.METRICS_ENABLED:
+            raise Http404
+        return HttpResponse(request_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _labels(pairs, **extra):
+    items = [*pairs, *extra.items()]
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in items) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -1,4 +1,14 @@
-from rest_framework.pagination import PageNumberPagination
+import asyncio
+from datetime import datetime, time
+
+from django.core import signing
+from django.core.paginator import InvalidPage, Page
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class SmallSetPagination(PageNumberPagination):
@@ -6,3 +16,217 @@ class SmallSetPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 100
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # Same contract as paginate_queryset, for async views: the COUNT(*)
+        # and the page itself are independent, so they are queried together.
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        page_number = request.query_params.get(self.page_query_param) or 1
+        try:
+            number = int(page_number)
+        except (TypeError, ValueError):
+            number = None
+        if number is not None and number > 0:
+            bottom = (number - 1) * page_size
+            paginator.count, rows = await asyncio.gather(
+                queryset.acount(), alist(queryset[bottom:bottom + page_size])
+            )
+        else:
+            # 'last' (or an invalid number, rejected below) needs the count first.
+            paginator.count = await queryset.acount()
+            rows = None
+
+        try:
+            number = paginator.validate_number(self.get_page_number(request, paginator))
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        if rows is None:
+            bottom = (number - 1) * page_size
+            rows = await alist(queryset[bottom:bottom + page_size])
+
+        self.page = Page(rows, number, paginator)
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return rows
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over ``(position_field, tiebreak_field)``, by default
+    ``(created_at, id)``, newest first (oldest first with ``descending = False``).
+
+    Every page is a range scan on the ``created_at`` index that starts right
+    after the last row of the previous page, so there is no ``COUNT(*)`` and
+    no ``OFFSET``. Cursors are signed, so clients can't forge positions.
+    """
+    cursor_query_param = 'cursor'
+    page_size = SmallSetPagination.page_size
+    page_size_query_param = SmallSetPagination.page_size_query_param
+    max_page_size = SmallSetPagination.max_page_size
+    position_field = 'created_at'
+    tiebreak_field = 'id'
+    descending = True
+    invalid_cursor_message = 'Invalid cursor'
+    salt = 'utils.pagination.KeysetPagination'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request)
+        return self.finish_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request)
+        return self.finish_page(await alist(queryset))
+
+    def page_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        direction = '-' if self.descending else ''
+        queryset = queryset.order_by(f'{direction}{self.position_field}', f'{direction}{self.tiebreak_field}')
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            value, pk = position
+            # field <= X (>= X ascending) keeps the index range condition, the
+            # exclude breaks ties on the tiebreak field for rows sharing the
+            # same value.
+            before, after = ('lte', 'gte') if self.descending else ('gte', 'lte')
+            queryset = queryset.filter(**{f'{self.position_field}__{before}': value}).exclude(
+                **{self.position_field: value, f'{self.tiebreak_field}__{after}': pk}
+            )
+
+        return queryset[:self.page_size + 1]
+
+    def finish_page(self, results):
+        self.has_next = len(results) > self.page_size
+        results = results[:self.page_size]
+        self.next_position = (
+            (getattr(results[-1], self.position_field), getattr(results[-1], self.tiebreak_field))
+            if self.has_next else None
+        )
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def encode_cursor(self, position):
+        value, pk = position
+        return signing.dumps([self.encode_position(value), pk], salt=self.salt)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk = signing.loads(encoded, salt=self.salt)
+            value = self.decode_position(value)
+            pk = int(pk)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+    def encode_position(self, value):
+        return value.isoformat()
+
+    def decode_position(self, value):
+        return parse_datetime(value)
+
+
+class TimelinePagination(KeysetPagination):
+    # Timeline entries are keyed on the post they point to, so cursors are
+    # interchangeable with the ones KeysetPagination emits for posts.
+    tiebreak_field = 'post_id'
+
+
+class CommentPagination(KeysetPagination):
+    # Threads read oldest first, as with page numbers.
+    descending = False
+    salt = 'utils.pagination.CommentPagination'
+
+
+class SearchPagination(KeysetPagination):
+    # Search results are ordered by relevance, which is a float computed for
+    # the query at hand (see ContentQuerySet.search).
+    position_field = 'rank'
+    salt = 'utils.pagination.SearchPagination'
+
+    def encode_position(self, value):
+        return value
+
+    def decode_position(self, value):
+        return float(value)
+
+
+class FollowPagination(KeysetPagination):
+    # Follow edges have no timestamp; the primary key already orders them by
+    # insertion and is covered by the (user, -id) indexes on the edge table.
+    position_field = 'id'
+    salt = 'utils.pagination.FollowPagination'
+
+    def encode_position(self, value):
+        return value
+
+    def decode_position(self, value):
+        return int(value)
+
+
+def get_paginator(request, keyset_class=KeysetPagination):
+    """
+    Page-number pagination stays the default; clients opt into keyset
+    pagination with ``?pagination=cursor`` (or by following a ``next`` link).
+    """
+    if request.query_params.get('pagination') == 'cursor' or keyset_class.cursor_query_param in request.query_params:
+        return keyset_class()
+    return SmallSetPagination()
+
+
+def parse_window(params):
+    """
+    Reads the ``since``/``before`` bounds of a time window (ISO 8601 dates or
+    datetimes) from a QueryDict, raising ValueError with a client-facing
+    message.
+    """
+    window = {}
+    for name in ('since', 'before'):
+        value = params.get(name) or None
+        if value is not None:
+            try:
+                parsed = parse_datetime(value)
+                if parsed is None and parse_date(value) is not None:
+                    parsed = datetime.combine(parse_date(value), time())
+            except ValueError:
+                parsed = None
+            if parsed is None:
+                raise ValueError(f'Invalid {name} format, should be an ISO 8601 date or datetime')
+            value = timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+        window[name] = value
+    return window
+
+
+async def alist(queryset):
+    # list(queryset) for async code; prefetches run as part of the fetch.
+    return [obj async for obj in queryset]
@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import permissions
 
 class IsPostAuthorOrReadOnly(permissions.BasePermission):
@@ -8,4 +9,11 @@ class IsPostAuthorOrReadOnly(permissions.BasePermission):
 
 class IsAuthenticated(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user and request.user.is_authenticated
\ No newline at end of file
+        return request.user and request.user.is_authenticated
+
+class CanReadMetrics(permissions.BasePermission):
+    # Staff users, or scrapers connecting from METRICS_ALLOWED_IPS.
+    def has_permission(self, request, view):
+        if request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS:
+            return True
+        return bool(request.user and request.user.is_staff)
@@ -0,0 +1,81 @@
+"""
+orjson-backed JSON renderer and parser for DRF.
+
+Both produce the same bytes and values as DRF's ``JSONRenderer`` and
+``JSONParser`` and fall back to them for whatever orjson would handle
+differently:
+
+- Datetimes, dates and times, lazy translation strings, decimals, sets,
+  querysets and dataclasses go through DRF's ``JSONEncoder.default``, so
+  datetimes keep the offset they were given (``Z`` for UTC) and decimals are
+  written as floats.
+- Requests for indented output, ``UNICODE_JSON = False`` or
+  ``COMPACT_JSON = False``, integers beyond 64 bits and non-string keys are
+  rendered by ``JSONRenderer``.
+- Bodies that are not UTF-8, that orjson rejects, or that hold integers
+  orjson would read as floats are parsed by ``JSONParser``.
+
+The one difference left is floats: orjson writes exponents without the
+``+`` or leading zero (``1e16`` for ``1e+16``, the same number), and NaN or
+infinity as ``null`` instead of failing. The API has no float fields.
+
+Without orjson installed both classes behave exactly as DRF's.
+"""
+import io
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Nineteen digits in a row may be an integer beyond orjson's 64 bits (which
+# it reads as a float). Mapping every digit to 0 and searching is much
+# faster than a regular expression.
+ZERO_DIGITS = bytes.maketrans(b'123456789', b'000000000')
+LONG_INTEGER = b'0' * 19
+UTF8 = {'utf-8', 'utf8'}
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (
+            orjson is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same escaping as JSONRenderer, for JavaScript.
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class ORJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower() not in UTF8:
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        if LONG_INTEGER not in body.translate(ZERO_DIGITS):
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                pass
+        # Also for the error message clients get from JSONParser.
+        return super().parse(io.BytesIO(body), media_type, parser_context)
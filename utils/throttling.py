@@ -0,0 +1,187 @@
+"""
+Token-bucket rate limiting for DRF views.
+
+``TokenBucketThrottle`` (a default throttle class) limits each client (the
+user ID when authenticated, the IP otherwise) per endpoint. Views name their
+endpoint in ``throttle_scope``, or per method in ``throttle_scopes``; the
+rate of each scope comes from settings.THROTTLE_RATES, and views without a
+scope are not limited.
+
+A rate of ``'120/min'`` is a bucket of 120 tokens refilled at 2 per second:
+bursts of up to 120 requests, 2 per second sustained. Throttled requests get
+a 429 with a ``Retry-After`` header.
+
+Buckets are kept in the GCRA form: one "theoretical arrival time" (TAT) per
+key, which is when the bucket will be full again. A request costs one
+emission interval (period / limit) and is allowed while the TAT stays within
+the bucket's capacity from now.
+
+- ``MemoryBucketStore``: per process, under a lock.
+- ``CacheBucketStore``: in a Django cache shared by all processes, with one
+  atomic ``incr`` per allowed request (Redis and Memcached increment
+  atomically). Resetting an idle bucket is a plain ``set``, so clients racing
+  on a full bucket may each get one extra request. Keys live for ten periods
+  (refreshed when a client is throttled), so a client that never quite hits
+  the limit may get one extra burst every ten periods.
+
+Async views (``AsyncAPIView``) call ``aallow_request``, which goes through
+the store's ``aconsume`` so the cache round trips don't block the event loop.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'sec': 1, 'second': 1, 'm': 60, 'min': 60, 'minute': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def parse_rate(rate):
+    """``'120/min'`` -> ``(capacity, seconds per token)``."""
+    limit, _, period = rate.partition('/')
+    limit = int(limit)
+    return limit, PERIODS[period] / limit
+
+
+class MemoryBucketStore:
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def consume(self, key, capacity, interval):
+        """Takes a token; returns 0 if there was one, otherwise the seconds until there is."""
+        now = time.time()
+        with self._lock:
+            tat = max(self._buckets.get(key, now), now) + interval
+            wait = tat - now - capacity * interval
+            if wait > 0:
+                return wait
+            if key not in self._buckets and len(self._buckets) >= self.max_keys:
+                self._prune(now)
+            self._buckets[key] = tat
+            return 0
+
+    async def aconsume(self, key, capacity, interval):
+        # No I/O, and the lock is only held for a few dict operations.
+        return self.consume(key, capacity, interval)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def _prune(self, now):
+        # Full buckets are the same as missing ones.
+        self._buckets = {key: tat for key, tat in self._buckets.items() if tat > now}
+
+
+class CacheBucketStore:
+    # TATs are stored as integer microseconds, for incr.
+    SCALE = 1000000
+
+    def __init__(self, alias=None):
+        self._alias = alias
+
+    @property
+    def cache(self):
+        return caches[self._alias or settings.THROTTLE_CACHE_ALIAS]
+
+    def consume(self, key, capacity, interval):
+        now = int(time.time() * self.SCALE)
+        step = max(int(interval * self.SCALE), 1)
+        timeout = max(int(capacity * interval * 10), 60)
+        try:
+            tat = self.cache.incr(key, step)
+        except ValueError:
+            # A missing key; ``add`` loses to a concurrent request that
+            # created it, which then counts for both.
+            if self.cache.add(key, now + step, timeout):
+                return 0
+            tat = self.cache.incr(key, step)
+
+        if tat - step < now:
+            # The bucket had refilled completely.
+            self.cache.set(key, now + step, timeout)
+            return 0
+        wait = tat - now - capacity * step
+        if wait > 0:
+            self.cache.decr(key, step)
+            # Keep a throttled client's bucket from expiring while it is
+            # still being hit.
+            self.cache.touch(key, timeout)
+            return wait / self.SCALE
+        return 0
+
+    async def aconsume(self, key, capacity, interval):
+        # consume(), on the async cache API.
+        now = int(time.time() * self.SCALE)
+        step = max(int(interval * self.SCALE), 1)
+        timeout = max(int(capacity * interval * 10), 60)
+        try:
+            tat = await self.cache.aincr(key, step)
+        except ValueError:
+            if await self.cache.aadd(key, now + step, timeout):
+                return 0
+            tat = await self.cache.aincr(key, step)
+
+        if tat - step < now:
+            await self.cache.aset(key, now + step, timeout)
+            return 0
+        wait = tat - now - capacity * step
+        if wait > 0:
+            await self.cache.adecr(key, step)
+            await self.cache.atouch(key, timeout)
+            return wait / self.SCALE
+        return 0
+
+
+STORES = {'memory': MemoryBucketStore, 'cache': CacheBucketStore}
+_stores = {}
+
+
+def get_store(name=None):
+    name = name or settings.THROTTLE_STORE
+    if name not in _stores:
+        _stores[name] = STORES[name]()
+    return _stores[name]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_scope(self, request, view):
+        scopes = getattr(view, 'throttle_scopes', None) or {}
+        return scopes.get(request.method, getattr(view, 'throttle_scope', None))
+
+    def get_bucket(self, request, view):
+        """``(key, capacity, interval)`` of the request's bucket, or None if it isn't limited."""
+        if not settings.THROTTLE_ENABLED:
+            return None
+        scope = self.get_scope(request, view)
+        rate = settings.THROTTLE_RATES.get(scope) if scope else None
+        if rate is None:
+            return None
+
+        capacity, interval = parse_rate(rate)
+        user = request.user
+        ident = f'user:{user.pk}' if user and user.is_authenticated else f'ip:{self.get_ident(request)}'
+        return f'throttle:{scope}:{ident}', capacity, interval
+
+    def allow_request(self, request, view):
+        bucket = self.get_bucket(request, view)
+        if bucket is None:
+            return True
+        self.wait_seconds = get_store().consume(*bucket)
+        return not self.wait_seconds
+
+    async def aallow_request(self, request, view):
+        bucket = self.get_bucket(request, view)
+        if bucket is None:
+            return True
+        self.wait_seconds = await get_store().aconsume(*bucket)
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
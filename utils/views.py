@@ -0,0 +1,129 @@
+import asyncio
+import logging
+
+from asgiref.sync import sync_to_async
+from rest_framework import exceptions, status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .ingest import MAX_API_ROWS, ingest
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are coroutines, meant to be served through ASGI.
+
+    Authenticators with an ``aauthenticate`` coroutine and throttles with an
+    ``aallow_request`` one are awaited (the others run through
+    ``sync_to_async``); the rest of ``initial()`` (permissions, content
+    negotiation) doesn't do I/O and runs on the event loop. Handlers that are
+    still synchronous, e.g. writes inherited from a sync view, run through
+    ``sync_to_async``.
+    """
+    view_is_async = True
+
+    def dispatch(self, request, *args, **kwargs):
+        return self.adispatch(request, *args, **kwargs)
+
+    async def adispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            if asyncio.iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request, *args, **kwargs):
+        # APIView.initial, awaiting authentication and throttling.
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+
+        neg = self.perform_content_negotiation(request)
+        request.accepted_renderer, request.accepted_media_type = neg
+
+        version, scheme = self.determine_version(request, *args, **kwargs)
+        request.version, request.versioning_scheme = version, scheme
+
+        await self.aperform_authentication(request)
+        self.check_permissions(request)
+        await self.acheck_throttles(request)
+
+    async def aperform_authentication(self, request):
+        # Request._authenticate, awaiting the authenticators.
+        for authenticator in request.authenticators:
+            try:
+                if hasattr(authenticator, 'aauthenticate'):
+                    user_auth_tuple = await authenticator.aauthenticate(request)
+                else:
+                    user_auth_tuple = await sync_to_async(authenticator.authenticate)(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+
+        request._not_authenticated()
+
+    async def acheck_throttles(self, request):
+        # APIView.check_throttles, awaiting the throttles.
+        throttle_durations = []
+        for throttle in self.get_throttles():
+            if hasattr(throttle, 'aallow_request'):
+                allowed = await throttle.aallow_request(request, self)
+            else:
+                allowed = await sync_to_async(throttle.allow_request)(request, self)
+            if not allowed:
+                throttle_durations.append(throttle.wait())
+
+        if throttle_durations:
+            durations = [duration for duration in throttle_durations if duration is not None]
+            self.throttled(request, max(durations, default=None))
+
+
+async def aserialize(serializer_class, instance, **kwargs):
+    # Serializers can still reach the ORM lazily (e.g. UserStats.for_user
+    # rebuilding a missing row), which Django only allows off the event loop.
+    return await sync_to_async(lambda: serializer_class(instance, **kwargs).data)()
+
+
+class BulkIngest(APIView):
+    permission_classes = [IsAdminUser]
+    throttle_scope = 'bulk'
+    kind = None
+
+    def post(self, request):
+        try:
+            rows = request.data
+            if not isinstance(rows, list):
+                return Response({'error': 'Expected a list of rows'}, status=status.HTTP_400_BAD_REQUEST)
+            if len(rows) > MAX_API_ROWS:
+                return Response({'error': f'At most {MAX_API_ROWS} rows per request'}, status=status.HTTP_400_BAD_REQUEST)
+
+            result = ingest(self.kind, rows)
+            logger.info("Bulk %s: %s created, %s rejected", self.kind, result['created'], len(result['errors']))
+            return Response(result, status=status.HTTP_207_MULTI_STATUS if result['errors'] else status.HTTP_201_CREATED)
+        except Exception as e:
+            logger.error("Unexpected error: %s", e)
+            return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)